@@ -0,0 +1,254 @@
+from datetime import date
+
+from storage import transaction_month
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+GROUP_FIELDS = ("wallet", "transaction_type", "category", "month")
+
+
+class LedgerColumns:
+    """The ledger as parallel columns, in FinanceManager.transactions order.
+
+    wallet holds codes into wallet_names, category holds registry Category
+    ids and month holds year * 12 + month - 1. The columns are numpy arrays
+    when the engine uses numpy and lists otherwise.
+    """
+
+    __slots__ = ("amount", "ordinal", "month", "wallet", "category", "expense", "wallet_names")
+
+    def __init__(self, transactions, ordinals, amounts, as_arrays):
+        wallet_codes = {}
+        months = {}
+        wallet, category, month, expense = [], [], [], []
+        for transaction in transactions:
+            wallet.append(wallet_codes.setdefault(transaction.wallet_name, len(wallet_codes)))
+            category.append(transaction.category_ref.id)
+            code = months.get(transaction.date)
+            if code is None:
+                year, number = transaction_month(transaction).split("-")
+                code = months[transaction.date] = int(year) * 12 + int(number) - 1
+            month.append(code)
+            expense.append(transaction.transaction_type == "expense")
+        self.wallet_names = list(wallet_codes)
+        if as_arrays:
+            self.amount = numpy.array(amounts, dtype=numpy.float64)
+            self.ordinal = numpy.array(ordinals, dtype=numpy.int64)
+            self.month = numpy.array(month, dtype=numpy.int64)
+            self.wallet = numpy.array(wallet, dtype=numpy.int64)
+            self.category = numpy.array(category, dtype=numpy.int64)
+            self.expense = numpy.array(expense, dtype=bool)
+        else:
+            self.amount = amounts
+            self.ordinal = ordinals
+            self.month = month
+            self.wallet = wallet
+            self.category = category
+            self.expense = expense
+
+
+def month_name(code):
+    return f"{code // 12:04d}-{code % 12 + 1:02d}"
+
+
+def _percentile(ordered, percent):
+    """Linear interpolation between closest ranks, as numpy.percentile does by default."""
+    position = (len(ordered) - 1) * percent / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+class AnalyticsEngine:
+    """Vectorized reports over a FinanceManager's ledger.
+
+    The ledger is exported once into LedgerColumns and reused until the
+    manager's revision changes. With numpy every report is a handful of
+    array operations; without it (or with use_numpy=False) the same reports
+    are computed by plain loops over the columns. With base_currency the
+    amounts are converted through manager.rates when the columns are built.
+    """
+
+    def __init__(self, manager, base_currency=None, use_numpy=None):
+        self.manager = manager
+        self.base_currency = base_currency
+        self.use_numpy = numpy is not None if use_numpy is None else use_numpy
+        if self.use_numpy and numpy is None:
+            raise ImportError("use_numpy=True needs numpy, which is not installed.")
+        self._columns = None
+        self._revision = None
+
+    def columns(self):
+        manager = self.manager
+        revision = (manager.revision, manager.rates)
+        if self._columns is None or self._revision != revision:
+            transactions = manager.transactions
+            if self.base_currency:
+                if manager.rates is None:
+                    raise ValueError("No exchange rates are loaded.")
+                amounts = manager.rates.convert_all(transactions, self.base_currency)
+            else:
+                amounts = [t.amount for t in transactions]
+            ordinals = [key[0] for key in manager.index.by_date]
+            self._columns = LedgerColumns(transactions, ordinals, amounts, self.use_numpy)
+            self._revision = revision
+        return self._columns
+
+    def group_sum(self, by=("category",), transaction_type=None):
+        """{(value of each field in by): total amount}, sorted by group.
+
+        Fields come from GROUP_FIELDS.
+        """
+        unknown = set(by) - set(GROUP_FIELDS)
+        if unknown:
+            raise ValueError(f"Cannot group by {', '.join(sorted(unknown))}.")
+        columns = self.columns()
+        codes = [self._field_codes(columns, field) for field in by]
+        if self.use_numpy:
+            keep = self._type_mask(columns, transaction_type)
+            if not keep.any():
+                return {}
+            stacked = numpy.stack([code[keep] for code in codes])
+            groups, inverse = numpy.unique(stacked, axis=1, return_inverse=True)
+            totals = numpy.bincount(inverse.reshape(-1), weights=columns.amount[keep])
+            sums = {tuple(group): total for group, total in zip(groups.T.tolist(), totals.tolist())}
+        else:
+            sums = {}
+            keep = self._type_mask(columns, transaction_type)
+            for position, amount in enumerate(columns.amount):
+                if keep is None or keep[position]:
+                    key = tuple(code[position] for code in codes)
+                    sums[key] = sums.get(key, 0.0) + amount
+        labels = [self._field_label(columns, field) for field in by]
+        named = {
+            tuple(label(code) for label, code in zip(labels, key)): total
+            for key, total in sums.items()
+        }
+        return dict(sorted(named.items()))
+
+    def rolling_spend(self, days=7, wallet=None):
+        """[(date, expenses over the days ending on it)] for every day from the first
+        expense to the last."""
+        columns = self.columns()
+        if self.use_numpy:
+            keep = columns.expense
+            if wallet is not None:
+                keep = keep & (columns.wallet == self._wallet_code(columns, wallet))
+            if not keep.any():
+                return []
+            ordinals = columns.ordinal[keep]
+            first = int(ordinals.min())
+            daily = numpy.bincount(ordinals - first, weights=columns.amount[keep])
+            running = numpy.concatenate(([0.0], numpy.cumsum(daily)))
+            ends = numpy.arange(1, len(daily) + 1)
+            totals = (running[ends] - running[numpy.maximum(ends - days, 0)]).tolist()
+        else:
+            code = None if wallet is None else self._wallet_code(columns, wallet)
+            by_day = {}
+            for position, ordinal in enumerate(columns.ordinal):
+                if columns.expense[position] and (code is None or columns.wallet[position] == code):
+                    by_day[ordinal] = by_day.get(ordinal, 0.0) + columns.amount[position]
+            if not by_day:
+                return []
+            first = min(by_day)
+            daily = [by_day.get(day, 0.0) for day in range(first, max(by_day) + 1)]
+            totals, running = [], 0.0
+            for position, amount in enumerate(daily):
+                running += amount
+                if position >= days:
+                    running -= daily[position - days]
+                totals.append(running)
+        return [
+            (date.fromordinal(first + offset).isoformat(), total)
+            for offset, total in enumerate(totals)
+        ]
+
+    def monthly_burn(self, wallet=None):
+        """{YYYY-MM: expenses minus income} in month order."""
+        columns = self.columns()
+        if self.use_numpy:
+            keep = numpy.ones(len(columns.amount), dtype=bool)
+            if wallet is not None:
+                keep = columns.wallet == self._wallet_code(columns, wallet)
+            signed = numpy.where(columns.expense, columns.amount, -columns.amount)[keep]
+            months, inverse = numpy.unique(columns.month[keep], return_inverse=True)
+            totals = numpy.bincount(inverse.reshape(-1), weights=signed, minlength=len(months))
+            burn = dict(zip(months.tolist(), totals.tolist()))
+        else:
+            code = None if wallet is None else self._wallet_code(columns, wallet)
+            burn = {}
+            for position, amount in enumerate(columns.amount):
+                if code is None or columns.wallet[position] == code:
+                    month = columns.month[position]
+                    signed = amount if columns.expense[position] else -amount
+                    burn[month] = burn.get(month, 0.0) + signed
+        return {month_name(month): total for month, total in sorted(burn.items())}
+
+    def category_percentiles(self, percentiles=(50, 90, 99), transaction_type="expense"):
+        """{category: {percentile: amount}} over the amounts of each category."""
+        columns = self.columns()
+        names = self.manager.categories.by_id
+        keep = self._type_mask(columns, transaction_type)
+        if self.use_numpy:
+            amounts = columns.amount if keep is None else columns.amount[keep]
+            categories = columns.category if keep is None else columns.category[keep]
+            order = numpy.lexsort((amounts, categories))
+            amounts, categories = amounts[order], categories[order]
+            codes, starts = numpy.unique(categories, return_index=True)
+            ends = numpy.append(starts[1:], len(categories))
+            groups = {
+                code: numpy.percentile(amounts[start:end], percentiles).tolist()
+                for code, start, end in zip(codes.tolist(), starts.tolist(), ends.tolist())
+            }
+        else:
+            by_category = {}
+            for position, amount in enumerate(columns.amount):
+                if keep is None or keep[position]:
+                    by_category.setdefault(columns.category[position], []).append(amount)
+            groups = {}
+            for code, amounts in by_category.items():
+                amounts.sort()
+                groups[code] = [_percentile(amounts, percent) for percent in percentiles]
+        return {
+            names[code].name: dict(zip(percentiles, values))
+            for code, values in sorted(groups.items(), key=lambda item: names[item[0]].name)
+        }
+
+    def _type_mask(self, columns, transaction_type):
+        if transaction_type is None:
+            return numpy.ones(len(columns.amount), dtype=bool) if self.use_numpy else None
+        if transaction_type not in ("expense", "income"):
+            raise ValueError(f"Unknown transaction type {transaction_type!r}.")
+        if self.use_numpy:
+            return columns.expense if transaction_type == "expense" else ~columns.expense
+        wanted = transaction_type == "expense"
+        return [flag == wanted for flag in columns.expense]
+
+    @staticmethod
+    def _field_codes(columns, field):
+        return {
+            "wallet": columns.wallet,
+            "transaction_type": columns.expense,
+            "category": columns.category,
+            "month": columns.month,
+        }[field]
+
+    def _field_label(self, columns, field):
+        if field == "wallet":
+            return columns.wallet_names.__getitem__
+        if field == "transaction_type":
+            return lambda expense: "expense" if expense else "income"
+        if field == "category":
+            return lambda code: self.manager.categories.by_id[code].name
+        return month_name
+
+    def _wallet_code(self, columns, wallet):
+        if wallet in columns.wallet_names:
+            return columns.wallet_names.index(wallet)
+        if wallet in self.manager.wallets:
+            # A wallet without transactions matches nothing.
+            return -1
+        raise ValueError(f"There is no wallet {wallet!r}.")
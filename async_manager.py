@@ -0,0 +1,196 @@
+import asyncio
+
+from reports import summarize
+
+
+class AsyncFinanceManager:
+    """An asyncio front for a FinanceManager shared by many callers.
+
+    Mutations are queued to a single writer task. It takes whatever is
+    queued, waits up to max_delay seconds for more (up to max_batch calls),
+    applies the whole group inside one batch and persists it with a single
+    flush, run in an executor so the event loop keeps serving. Concurrent
+    storage must flush under the lock it takes for the batch, so there the
+    whole group runs in the executor. Each caller's await returns once its
+    group is on disk, or raises its own error.
+
+    Reads run directly against the manager's in-memory state and never wait
+    for I/O; they see applied changes even while their flush is running.
+    """
+
+    def __init__(self, manager, max_delay=0.005, max_batch=1000):
+        self.manager = manager
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.flushes = 0
+        self.flushed_calls = 0
+        self._queue = None
+        self._writer = None
+
+    async def start(self):
+        if self._writer is None:
+            self._queue = asyncio.Queue()
+            self._writer = asyncio.create_task(self._write_loop())
+        return self
+
+    async def close(self):
+        """Finish every queued mutation, then stop the writer."""
+        if self._writer is not None:
+            await self._queue.join()
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _submit(self, method, *args, **kwargs):
+        if self._writer is None:
+            raise RuntimeError("AsyncFinanceManager.start() has not been awaited.")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((method, args, kwargs, future))
+        return await future
+
+    async def _write_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            group = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(group) < self.max_batch:
+                if not self._queue.empty():
+                    group.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    group.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._write_group(group)
+            finally:
+                for _ in group:
+                    self._queue.task_done()
+
+    async def _write_group(self, group):
+        loop = asyncio.get_running_loop()
+        try:
+            if self.manager.storage.concurrent:
+                results = await loop.run_in_executor(None, self._apply_group, group, False)
+            else:
+                results = self._apply_group(group, True)
+                await loop.run_in_executor(None, self.manager.flush)
+        except Exception as error:
+            # The manager has already reloaded from disk, dropping the group.
+            results = [(future, None, error) for _, _, _, future in group]
+        self.flushes += 1
+        self.flushed_calls += len(group)
+        for future, result, error in results:
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def _apply_group(self, group, defer_flush):
+        results = []
+        with self.manager.batch(defer_flush=defer_flush):
+            for method, args, kwargs, future in group:
+                try:
+                    results.append((future, method(*args, **kwargs), None))
+                except Exception as error:
+                    results.append((future, None, error))
+        return results
+
+    # Mutations
+
+    async def add_wallet(self, name, initial_balance=0.0, currency="USD"):
+        await self._submit(self.manager.add_wallet, name, initial_balance, currency)
+
+    async def add_transaction(
+        self,
+        wallet_name,
+        transaction_type,
+        category,
+        amount,
+        currency,
+        date=None,
+        tags=None,
+    ):
+        """Add one transaction and return its id; invalid rows raise ValueError."""
+        row = (wallet_name, transaction_type, category, amount, currency, date, tags)
+        return await self._submit(self._add_transaction, row)
+
+    def _add_transaction(self, row):
+        self.manager.add_transactions([row])
+        return self.manager.transaction_id_counter - 1
+
+    async def edit_transaction(self, transaction_id, **updates):
+        await self._submit(self.manager.edit_transaction, transaction_id, **updates)
+
+    async def delete_transaction(self, transaction_id):
+        await self._submit(self.manager.delete_transaction, transaction_id)
+
+    async def set_default_wallet(self, name):
+        await self._submit(self.manager.set_default_wallet, name)
+
+    async def add_custom_category(self, transaction_type, category_name, tags=[]):
+        await self._submit(
+            self.manager.add_custom_category, transaction_type, category_name, tags
+        )
+
+    async def edit_custom_category(self, transaction_type, old_category_name, new_category_name):
+        await self._submit(
+            self.manager.edit_custom_category,
+            transaction_type,
+            old_category_name,
+            new_category_name,
+        )
+
+    async def delete_custom_category(self, transaction_type, category_name, reassign_to=None):
+        await self._submit(
+            self.manager.delete_custom_category, transaction_type, category_name, reassign_to
+        )
+
+    async def set_budget(self, wallet_name, category, month, limit, thresholds=(1.0,)):
+        await self._submit(
+            self.manager.set_budget, wallet_name, category, month, limit, thresholds
+        )
+
+    async def delete_budget(self, wallet_name, category, month):
+        return await self._submit(self.manager.delete_budget, wallet_name, category, month)
+
+    # Reads
+
+    def get_balance(self, wallet_name, as_of=None):
+        return self.manager.get_balance(wallet_name, as_of)
+
+    def get_transaction(self, transaction_id):
+        return self.manager.get_transaction(transaction_id)
+
+    def query_transactions(self, *args, **kwargs):
+        return self.manager.query_transactions(*args, **kwargs)
+
+    def search_transactions(self, query, **filters):
+        return self.manager.search_transactions(query, **filters)
+
+    def list_categories(self, transaction_type):
+        return self.manager.list_categories(transaction_type)
+
+    def summarize(
+        self,
+        group_by=("category", "month"),
+        start=None,
+        end=None,
+        wallet=None,
+        base_currency=None,
+    ):
+        return summarize(self.manager, group_by, start, end, wallet, base_currency)
@@ -0,0 +1,78 @@
+from collections import defaultdict
+
+from indexes import date_ordinal
+
+
+def signed_amount(transaction):
+    return transaction.amount if transaction.transaction_type == "income" else -transaction.amount
+
+
+class RunningTotals:
+    """Net amount per day for one wallet, with O(log D) prefix sums.
+
+    Days are stored as offsets from a base ordinal in a Fenwick tree; the
+    tree is rebuilt whenever a day falls outside it, with a span's worth of
+    room on both sides, so days arriving newest-first rebuild it only each
+    time the span of days doubles.
+    """
+
+    MIN_CAPACITY = 64
+
+    def __init__(self):
+        self.daily = {}
+        self._base = None
+        self._tree = [0.0]
+
+    def add(self, day, amount):
+        self.daily[day] = self.daily.get(day, 0.0) + amount
+        if self._base is None or not self._base <= day < self._base + len(self._tree) - 1:
+            self._rebuild()
+            return
+        position = day - self._base + 1
+        while position < len(self._tree):
+            self._tree[position] += amount
+            position += position & -position
+
+    def total_as_of(self, day):
+        """Sum of the net amounts of every day up to and including day."""
+        if self._base is None or day < self._base:
+            return 0.0
+        position = min(day - self._base + 1, len(self._tree) - 1)
+        total = 0.0
+        while position:
+            total += self._tree[position]
+            position -= position & -position
+        return total
+
+    def _rebuild(self):
+        first, last = min(self.daily), max(self.daily)
+        span = last - first + 1
+        capacity = max(self.MIN_CAPACITY, 3 * span)
+        self._base = first - (capacity - span) // 2
+        self._tree = [0.0] * (capacity + 1)
+        for day, amount in self.daily.items():
+            self._tree[day - self._base + 1] += amount
+        for position in range(1, capacity + 1):
+            parent = position + (position & -position)
+            if parent <= capacity:
+                self._tree[parent] += self._tree[position]
+
+
+class Balances:
+    """Per-wallet running totals kept in step with the ledger."""
+
+    def __init__(self):
+        self.totals = defaultdict(RunningTotals)
+
+    def add(self, transaction, sign=1):
+        amount = sign * signed_amount(transaction)
+        self.add_daily(transaction.wallet_name, date_ordinal(transaction.date), amount)
+        return amount
+
+    def add_daily(self, wallet_name, day, amount):
+        """Add the net amount of a wallet's transactions on one day ordinal."""
+        self.totals[wallet_name].add(day, amount)
+
+    def net_as_of(self, wallet_name, day):
+        totals = self.totals.get(wallet_name)
+        return totals.total_as_of(day) if totals else 0.0
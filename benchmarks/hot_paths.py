@@ -0,0 +1,180 @@
+"""Time the FinanceManager hot paths on synthetic ledgers.
+
+Run from the repository root:
+
+    python -m benchmarks.hot_paths run --sizes 10000 100000 --output new.json
+    python -m benchmarks.hot_paths compare old.json new.json --threshold 0.2
+
+run prints (or writes) JSON results; compare exits with status 1 when an
+operation got slower than the baseline by more than the threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.memory import synthetic_rows
+from finance_manager import FinanceManager, Transaction, Wallet
+from serializers import get_serializer
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+WALLETS = ("Cash", "Card", "Savings")
+CUSTOM_CATEGORY = "snacks"
+
+
+def write_ledger(path, size, format=None):
+    """Write a ledger of size transactions; every tenth expense is a custom category."""
+    transactions = []
+    for row in synthetic_rows(size):
+        transaction = Transaction(*row)
+        if transaction.transaction_type == "expense" and transaction.id % 10 == 0:
+            transaction.category = CUSTOM_CATEGORY
+            transaction.tags = ["sweet"]
+        transactions.append(transaction)
+    available_tags = FinanceManager._default_available_tags()
+    available_tags["expense"][CUSTOM_CATEGORY] = ["sweet"]
+    data = {
+        "wallets": {name: Wallet(name, 1000.0).to_dict() for name in WALLETS},
+        "custom_categories": {"expense": [CUSTOM_CATEGORY], "income": []},
+        "default_wallet": WALLETS[0],
+        "available_tags": available_tags,
+        "transaction_id_counter": size + 1,
+    }
+    with open(path, "wb") as file:
+        get_serializer(format).dump(data, transactions, file)
+
+
+def timed(function, repeat=1):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def benchmark_size(size, repeat, journal, format):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "finance_data.json")
+        write_ledger(path, size, format)
+        results = {}
+
+        started = time.perf_counter()
+        manager = FinanceManager(data_file=path, journal=journal, format=format)
+        results["load_from_file"] = time.perf_counter() - started
+        # A window of roughly 500 transactions in the middle of the ledger.
+        middle = len(manager.transactions) // 2
+        window = (
+            manager.transactions[middle].date,
+            manager.transactions[min(middle + 500, len(manager.transactions) - 1)].date,
+        )
+        date = window[0]
+
+        results["save_to_file"] = timed(manager.save_to_file)
+        results["add_transaction"] = timed(
+            lambda: manager.add_transaction(
+                "Cash", "expense", "food", 9.99, "USD", date, ["groceries"]
+            ),
+            repeat,
+        )
+        edit_ids = iter(range(1, size + 1, max(1, size // repeat)))
+        results["edit_transaction"] = timed(
+            lambda: manager.edit_transaction(next(edit_ids), amount=1.0, date=date),
+            repeat,
+        )
+        delete_ids = iter(range(2, size + 1, max(1, size // repeat)))
+        results["delete_transaction"] = timed(
+            lambda: manager.delete_transaction(next(delete_ids)), repeat
+        )
+        results["list_transactions"] = timed(manager.list_transactions, repeat)
+        results["list_transactions_window"] = timed(
+            lambda: manager.list_transactions(start_date=window[0], end_date=window[1]),
+            repeat,
+        )
+        results["list_transactions_wallet_window"] = timed(
+            lambda: manager.list_transactions("Cash", window[0], window[1]), repeat
+        )
+        results["search_expenses_by_tag"] = timed(
+            lambda: manager.search_expenses_by_tag("organic"), repeat
+        )
+        results["edit_custom_category"] = timed(
+            lambda: manager.edit_custom_category("expense", CUSTOM_CATEGORY, "treats")
+        )
+        return results
+
+
+def run(args):
+    results = {
+        "python": platform.python_version(),
+        "journal": args.journal,
+        "format": args.format,
+        "results": {},
+    }
+    for size in args.sizes:
+        print(f"benchmarking {size} transactions...", file=sys.stderr)
+        results["results"][str(size)] = benchmark_size(
+            size, args.repeat, args.journal, args.format
+        )
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+def compare(args):
+    with open(args.baseline) as file:
+        baseline = json.load(file)["results"]
+    with open(args.current) as file:
+        current = json.load(file)["results"]
+    regressions = 0
+    for size, operations in current.items():
+        for operation, seconds in operations.items():
+            before = baseline.get(size, {}).get(operation)
+            if before is None:
+                continue
+            change = (seconds - before) / before if before else 0.0
+            flag = "SLOWER" if change > args.threshold else ""
+            regressions += bool(flag)
+            print(
+                f"{size:>8} {operation:<32} {before:10.6f}s -> {seconds:10.6f}s "
+                f"{change:+7.1%} {flag}"
+            )
+    return 1 if regressions else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Benchmark and emit JSON results")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    run_parser.add_argument("--repeat", type=int, default=5, help="Calls per mutation/query")
+    run_parser.add_argument("--journal", action="store_true", help="Use journaled storage")
+    run_parser.add_argument("--format", help="Snapshot serializer format")
+    run_parser.add_argument("--output", help="Write results here instead of stdout")
+
+    compare_parser = commands.add_parser("compare", help="Flag slowdowns between two runs")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument(
+        "--threshold", type=float, default=0.2, help="Allowed slowdown, e.g. 0.2 for 20%%"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "compare":
+        return compare(args)
+    run(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""Compare the memory held by Transaction objects and a TransactionStore.
+
+Run from the repository root:
+
+    python -m benchmarks.memory --rows 1000000
+"""
+import argparse
+import gc
+import random
+import tracemalloc
+from datetime import date, timedelta
+
+from finance_manager import FinanceManager, Transaction
+from transaction_store import TransactionStore
+
+
+def synthetic_rows(count, seed=0):
+    rng = random.Random(seed)
+    wallets = ["Cash", "Card", "Savings"]
+    start = date(2020, 1, 1)
+    categories = FinanceManager.PREDEFINED_CATEGORIES
+    tags = FinanceManager._default_available_tags()
+    for id in range(1, count + 1):
+        transaction_type = rng.choice(("expense", "income"))
+        category = rng.choice(categories[transaction_type])
+        yield (
+            id,
+            rng.choice(wallets),
+            transaction_type,
+            category,
+            round(rng.uniform(1, 500), 2),
+            "USD",
+            (start + timedelta(days=id // 50)).isoformat(),
+            [rng.choice(tags[transaction_type][category])],
+        )
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    object_bytes, transactions = measure(
+        lambda: [Transaction(*row) for row in synthetic_rows(args.rows)]
+    )
+    store_bytes, _ = measure(lambda: TransactionStore(transactions))
+    del transactions
+
+    print(f"rows: {args.rows}")
+    print(f"Transaction objects: {object_bytes / args.rows:8.1f} bytes/row")
+    print(f"TransactionStore:    {store_bytes / args.rows:8.1f} bytes/row")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Compare snapshot write/read throughput of every serializer format.
+
+Run from the repository root:
+
+    python -m benchmarks.serializers --rows 200000
+"""
+import argparse
+import io
+import time
+
+from benchmarks.memory import synthetic_rows
+from finance_manager import FinanceManager, Transaction
+from serializers import SERIALIZERS, get_serializer, orjson, serializer_for
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    transactions = [Transaction(*row) for row in synthetic_rows(args.rows)]
+    data = {
+        "wallets": {},
+        "custom_categories": {"expense": [], "income": []},
+        "default_wallet": None,
+        "available_tags": FinanceManager._default_available_tags(),
+        "transaction_id_counter": args.rows + 1,
+    }
+
+    print(f"rows: {args.rows}")
+    print(f"{'format':<8} {'size MB':>8} {'write s':>8} {'rows/s':>10} {'read s':>8} {'rows/s':>10}")
+    for name in SERIALIZERS:
+        if name == "orjson" and orjson is None:
+            continue
+        file = io.BytesIO()
+        started = time.perf_counter()
+        get_serializer(name).dump(data, transactions, file)
+        write_seconds = time.perf_counter() - started
+
+        size = len(file.getvalue())
+        file = io.BufferedReader(io.BytesIO(file.getvalue()))
+        started = time.perf_counter()
+        for _ in serializer_for(file).load(file, {}):
+            pass
+        read_seconds = time.perf_counter() - started
+
+        print(
+            f"{name:<8} {size / 1e6:>8.1f} {write_seconds:>8.2f} "
+            f"{args.rows / write_seconds:>10.0f} {read_seconds:>8.2f} {args.rows / read_seconds:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
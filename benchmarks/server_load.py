@@ -0,0 +1,94 @@
+"""Drive a local finance_server with concurrent clients.
+
+Run from the repository root:
+
+    python -m benchmarks.server_load --clients 20 --requests 500 --max_delay 0.005
+
+Starts the server in-process on a free port over a fresh ledger in a
+temporary directory, then has every client keep --window add_transaction
+calls in flight until it has made --requests of them. Prints throughput,
+latency percentiles and how many writes each flush grouped.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from async_manager import AsyncFinanceManager
+from finance_manager import FinanceManager
+from finance_server import FinanceClient, serve
+
+
+async def run_client(port, requests, window, latencies):
+    client = await FinanceClient.connect(port=port)
+    semaphore = asyncio.Semaphore(window)
+
+    async def add(number):
+        async with semaphore:
+            started = time.perf_counter()
+            await client.call(
+                "add_transaction",
+                "Cash",
+                "expense",
+                "food",
+                1.0 + number % 100,
+                "USD",
+                "2024-01-01",
+                ["groceries"],
+            )
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(add(number) for number in range(requests)))
+    await client.close()
+
+
+async def load_test(args, data_file):
+    manager = FinanceManager(data_file=data_file, journal=args.journal, format=args.format)
+    manager.add_wallet("Cash", 0.0, "USD")
+    async with AsyncFinanceManager(manager, args.max_delay, args.max_batch) as async_manager:
+        server = await serve(async_manager, port=0)
+        port = server.sockets[0].getsockname()[1]
+        latencies = []
+        started = time.perf_counter()
+        async with server:
+            await asyncio.gather(
+                *(
+                    run_client(port, args.requests, args.window, latencies)
+                    for _ in range(args.clients)
+                )
+            )
+        elapsed = time.perf_counter() - started
+    total = args.clients * args.requests
+    reloaded = FinanceManager(data_file=data_file, journal=args.journal)
+    latencies.sort()
+    print(f"requests:        {total} from {args.clients} clients")
+    print(f"persisted:       {len(reloaded.transactions)}")
+    print(f"throughput:      {total / elapsed:,.0f} writes/s")
+    print(f"latency p50:     {statistics.median(latencies) * 1000:.2f} ms")
+    print(f"latency p99:     {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms")
+    print(f"flushes:         {async_manager.flushes}")
+    print(f"writes/flush:    {async_manager.flushed_calls / async_manager.flushes:.1f}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=500, help="Writes per client")
+    parser.add_argument("--window", type=int, default=8, help="Writes in flight per client")
+    parser.add_argument("--max_delay", type=float, default=0.005)
+    parser.add_argument("--max_batch", type=int, default=1000)
+    parser.add_argument("--journal", action="store_true", help="Use journaled storage")
+    parser.add_argument("--format", help="Snapshot serializer format")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(load_test(args, os.path.join(directory, "finance_data.json")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+from storage import transaction_month
+
+
+class Budget:
+    """A spending limit for one wallet, expense category and YYYY-MM month.
+
+    thresholds are fractions of the limit (1.0 is the limit itself); spent
+    is kept up to date by Budgets and is not persisted.
+    """
+
+    __slots__ = ("wallet_name", "category_ref", "month", "limit", "thresholds", "spent")
+
+    def __init__(self, wallet_name, category_ref, month, limit, thresholds=(1.0,)):
+        self.wallet_name = wallet_name
+        self.category_ref = category_ref
+        self.month = month
+        self.limit = limit
+        self.thresholds = tuple(sorted(thresholds))
+        self.spent = 0.0
+
+    @property
+    def category(self):
+        return self.category_ref.name
+
+    @property
+    def key(self):
+        return (self.wallet_name, self.category_ref, self.month)
+
+    def to_dict(self):
+        return {
+            "wallet_name": self.wallet_name,
+            "category": self.category,
+            "month": self.month,
+            "limit": self.limit,
+            "thresholds": list(self.thresholds),
+        }
+
+
+class Budgets:
+    """Budgets by (wallet, Category, month), each with a running spend counter.
+
+    add() and remove() move a counter in O(1) per transaction; keying on the
+    registry Category means a category rename needs no update at all. The
+    counters a change touched remember their value from before it, and
+    notify() calls every listener with (budget, threshold) for each
+    threshold the change carried them across, upwards.
+    """
+
+    def __init__(self):
+        self.by_key = {}
+        self.listeners = []
+        self._before = {}
+
+    def __iter__(self):
+        return iter(self.by_key.values())
+
+    def __len__(self):
+        return len(self.by_key)
+
+    def get(self, wallet_name, category_ref, month):
+        return self.by_key.get((wallet_name, category_ref, month))
+
+    def set(self, budget, aggregates):
+        """Add or replace a budget, counting what was already spent from the cube."""
+        budget.spent = sum(
+            cell[0]
+            for key, cell in aggregates.cells.items()
+            if key[:4] == (budget.wallet_name, "expense", budget.category_ref, budget.month)
+        )
+        self.by_key[budget.key] = budget
+
+    def delete(self, wallet_name, category_ref, month):
+        self.by_key.pop((wallet_name, category_ref, month), None)
+
+    def clear(self):
+        self.by_key.clear()
+        self._before.clear()
+
+    def add(self, transaction, sign=1):
+        if transaction.transaction_type != "expense" or not self.by_key:
+            return
+        key = (transaction.wallet_name, transaction.category_ref, transaction_month(transaction))
+        budget = self.by_key.get(key)
+        if budget is not None:
+            self._before.setdefault(key, budget.spent)
+            budget.spent += sign * transaction.amount
+
+    def remove(self, transaction):
+        self.add(transaction, sign=-1)
+
+    def notify(self):
+        before, self._before = self._before, {}
+        for key, spent in before.items():
+            budget = self.by_key.get(key)
+            if budget is None:
+                continue
+            for threshold in budget.thresholds:
+                if spent < threshold * budget.limit <= budget.spent:
+                    for listener in self.listeners:
+                        listener(budget, threshold)
+
+    def discard_changes(self):
+        """Forget the touched counters without notifying, e.g. after a replay."""
+        self._before.clear()
@@ -0,0 +1,89 @@
+class Category:
+    """One category of one transaction type, with an id that never changes."""
+
+    __slots__ = ("id", "transaction_type", "name", "predefined", "deleted")
+
+    def __init__(self, id, transaction_type, name, predefined=False, deleted=False):
+        self.id = id
+        self.transaction_type = transaction_type
+        self.name = name
+        self.predefined = predefined
+        self.deleted = deleted
+
+    def __repr__(self):
+        return f"Category({self.id}, {self.transaction_type!r}, {self.name!r})"
+
+
+class CategoryRegistry:
+    """Every category a ledger knows about, by stable integer id.
+
+    Tracked transactions point at their Category, and the index and the
+    aggregate cube are keyed by it, so a rename only touches the registry.
+    Deleted categories keep their entry so the transactions still filed
+    under them can be found; so do names that are not registered at all,
+    e.g. those deleted in an earlier session.
+    """
+
+    def __init__(self, predefined, custom=None):
+        self.by_id = []
+        self.active = {}
+        self.ordered = {}
+        self.retired = {}
+        for transaction_type, names in predefined.items():
+            self.active[transaction_type] = {}
+            self.ordered[transaction_type] = []
+            for name in names:
+                self.add(transaction_type, name, predefined=True)
+        for transaction_type, names in (custom or {}).items():
+            for name in names:
+                self.add(transaction_type, name)
+
+    def add(self, transaction_type, name, predefined=False):
+        category = self.retired.pop((transaction_type, name), None)
+        if category is None:
+            category = Category(len(self.by_id), transaction_type, name, predefined)
+            self.by_id.append(category)
+        category.deleted = False
+        self.active[transaction_type][name] = category
+        self.ordered[transaction_type].append(category)
+        return category
+
+    def get(self, transaction_type, name):
+        """The active category called name, or None."""
+        return self.active.get(transaction_type, {}).get(name)
+
+    def is_custom(self, transaction_type, name):
+        category = self.get(transaction_type, name)
+        return category is not None and not category.predefined
+
+    def resolve(self, transaction_type, name):
+        """The category a transaction of this type and name belongs to."""
+        category = self.get(transaction_type, name)
+        if category is None:
+            category = self.retired.get((transaction_type, name))
+            if category is None:
+                category = Category(len(self.by_id), transaction_type, name, deleted=True)
+                self.by_id.append(category)
+                self.retired[(transaction_type, name)] = category
+        return category
+
+    def rename(self, transaction_type, old_name, new_name):
+        names = self.active[transaction_type]
+        category = names.pop(old_name)
+        category.name = new_name
+        names[new_name] = category
+        return category
+
+    def delete(self, transaction_type, name):
+        category = self.active[transaction_type].pop(name)
+        self.ordered[transaction_type].remove(category)
+        category.deleted = True
+        self.retired[(transaction_type, name)] = category
+        return category
+
+    def names(self, transaction_type, custom_only=False):
+        return [
+            category.name
+            for category in self.ordered[transaction_type]
+            if not (custom_only and category.predefined)
+        ]
@@ -1,12 +1,22 @@
 import argparse
+import cProfile
 import os
 import random
 from collections import OrderedDict
+from itertools import islice
 
 from finance_manager import FinanceManager
+from instrumentation import ENV_VAR
+from rates import format_amount
+from reports import summarize
+from serializers import SERIALIZERS
+from statement_import import StatementImporter, load_rules
+from storage import migrate
 
 
 class FinanceCLI:
+    PAGE_SIZE = 20
+
     def __init__(self, manager):
         self.manager = manager
         self.actions = OrderedDict(
@@ -22,20 +32,73 @@ class FinanceCLI:
                 ("9", self.add_custom_category),
                 ("10", self.edit_custom_category),
                 ("11", self.delete_custom_category),
-                ("12", self.exit),
+                ("12", self.summary_report),
+                ("13", self.set_budget),
+                ("14", self.show_budgets),
+                ("15", self.delete_budget),
+                ("16", self.show_stats),
+                ("17", self.exit),
             ]
         )
+        manager.on_budget_alert(self.budget_alert)
 
-    def parse_args(self):
+    @staticmethod
+    def parse_args(argv=None):
+        """Command-line options; needs no manager, so nothing is loaded before --lazy is seen."""
         parser = argparse.ArgumentParser(
             description="Interactive CLI for Finance Manager"
         )
         parser.add_argument(
             "--data_file",
-            help="Path to the data file",
+            help="Path to the data file, or a directory (e.g. ledger/) for one file per month",
             default=os.getenv("FINANCE_MANAGER_DATA_FILE", "finance_data.json"),
         )
-        return parser.parse_args()
+        parser.add_argument(
+            "--journal",
+            help="Append changes to a journal instead of rewriting the data file",
+            action="store_true",
+        )
+        parser.add_argument(
+            "--format",
+            help="Snapshot format to write: pretty, compact, orjson or binary",
+            choices=sorted(SERIALIZERS),
+        )
+        parser.add_argument(
+            "--lazy",
+            help="Show the menu while the transaction history is still loading",
+            action="store_true",
+        )
+        parser.add_argument(
+            "--concurrent",
+            help="Lock the data file so several sessions can share it safely",
+            action="store_true",
+        )
+        parser.add_argument(
+            "--rates_file",
+            help="CSV or JSON file of exchange rates for reports in one base currency",
+        )
+        parser.add_argument(
+            "--profile",
+            help="Run the session under cProfile and write the profile to this file",
+        )
+        parser.add_argument(
+            "--migrate_to",
+            help="Copy the data file into a new file (e.g. finance_data.db for SQLite) and exit",
+        )
+        commands = parser.add_subparsers(dest="command")
+        statements = commands.add_parser(
+            "import", help="Import CSV or OFX bank statements instead of starting the menu"
+        )
+        statements.add_argument("statements", nargs="+", help="CSV, .ofx or .xml statement files")
+        statements.add_argument("--wallet", help="Wallet for rows without a wallet column")
+        statements.add_argument(
+            "--rules", help="CSV of pattern,category[,transaction_type] rules for the categories"
+        )
+        statements.add_argument(
+            "--date_format", help="strptime format of non-ISO dates", default="%Y-%m-%d"
+        )
+        statements.add_argument("--currency", help="Currency for rows without a currency column")
+        return parser.parse_args(argv)
 
     def main_menu(self):
         print("\nAvailable Commands:")
@@ -48,6 +111,9 @@ class FinanceCLI:
             choice = self.main_menu()
             action = self.actions.get(choice)
             if action:
+                self.manager.wait_until_loaded()
+                # Show what other sessions sharing the data file have changed.
+                self.manager.refresh()
                 action()
             else:
                 print("Invalid option. Please try again.")
@@ -69,7 +135,7 @@ class FinanceCLI:
             f"\nDefault tags for ⤵\nTransaction type - {transaction_type}\nCategory - {category}: {', '.join(default_tags)}"
         )
         tags_input = input("Tags (comma-separated, leave blank for defaults): ").strip()
-        return tags_input.split(",") if tags_input else random.choice(default_tags)
+        return tags_input.split(",") if tags_input else [random.choice(default_tags)]
 
     def set_default_wallet(self):
         """Set Default Wallet"""
@@ -101,10 +167,8 @@ class FinanceCLI:
     def edit_transaction(self):
         """Edit Transaction"""
         transaction_id = int(input("Transaction ID to edit: "))
-        transaction = [t for t in self.manager.transactions if t.id == transaction_id]
-        if transaction:
-            transaction_data = transaction[0]
-
+        transaction_data = self.manager.get_transaction(transaction_id)
+        if transaction_data:
             transaction_type = (
                 input("New Type (expense/income, leave blank to skip): ").lower()
                 or transaction_data.transaction_type
@@ -133,7 +197,10 @@ class FinanceCLI:
             if tags is not None:
                 updates["tags"] = tags
 
-            self.manager.edit_transaction(transaction_id, **updates)
+            try:
+                self.manager.edit_transaction(transaction_id, **updates)
+            except ValueError as error:
+                print(error)
         else:
             print("Transaction not found")
 
@@ -151,27 +218,78 @@ class FinanceCLI:
         start_date = start_date if start_date else None
         end_date = end_date if end_date else None
 
-        self.manager.list_transactions(
-            wallet_name=wallet_name, start_date=start_date, end_date=end_date
-        )
+        self.print_transactions(wallet_name, start_date, end_date)
 
     def list_all_transactions(self):
         """List All Transactions with optional date filtering."""
-        self.manager.list_transactions()
+        self.print_transactions()
+
+    def ask_base_currency(self):
+        if self.manager.rates is None:
+            return None
+        return input("Report in currency (leave blank for original currencies): ").upper() or None
+
+    def print_transactions(self, wallet_name=None, start_date=None, end_date=None):
+        """Print transactions by day, PAGE_SIZE at a time."""
+        base_currency = self.ask_base_currency()
+        try:
+            transactions = self.manager.query_transactions(wallet_name, start_date, end_date)
+            pending = list(islice(transactions, self.PAGE_SIZE + 1))
+            if not pending:
+                print("No transactions found.")
+            shown_date = None
+            while pending:
+                page, pending = pending[: self.PAGE_SIZE], pending[self.PAGE_SIZE :]
+                for transaction, (amount, currency) in zip(
+                    page, self.amounts(page, base_currency)
+                ):
+                    if transaction.date != shown_date:
+                        shown_date = transaction.date
+                        day = self.manager.query_transactions(wallet_name, shown_date, shown_date)
+                        print(f"Date: {shown_date}, Total Amount: {self.total(day, base_currency)}")
+                    print(
+                        f"  - Wallet: {transaction.wallet_name}, Category: {transaction.category}, "
+                        f"Amount: {format_amount(amount, currency)}"
+                    )
+                if not pending or input("Press Enter for more, q to stop: ").lower() == "q":
+                    break
+                pending += islice(transactions, self.PAGE_SIZE)
+        except ValueError as e:
+            print(e)
+
+    def amounts(self, transactions, base_currency):
+        """(amount, currency) per transaction, converted when base_currency is set."""
+        if base_currency:
+            amounts = self.manager.rates.convert_all(transactions, base_currency)
+            return [(amount, base_currency) for amount in amounts]
+        return [(t.amount, t.currency) for t in transactions]
+
+    def total(self, transactions, base_currency):
+        transactions = list(transactions)
+        totals = {}
+        for amount, currency in self.amounts(transactions, base_currency):
+            totals[currency] = totals.get(currency, 0.0) + amount
+        return " + ".join(format_amount(total, currency) for currency, total in totals.items())
 
     def search_expenses_by_tag(self):
         """Search Expenses By Tag"""
-        tag = input("Enter tag to search for: ")
-        results = self.manager.search_expenses_by_tag(tag)
+        query = input(
+            "Enter tag query (e.g. groceries AND NOT organic, movie* OR \"live music\"): "
+        )
+        try:
+            results = self.manager.search_transactions(query, transaction_type="expense")
+        except ValueError as e:
+            print(e)
+            return
         if results:
-            print(f"\nExpenses matching tag '{tag}':")
-            for i, transaction in enumerate(results, 1):
+            print(f"\nExpenses matching '{query}':")
+            for transaction in results:
                 print(
-                    f"Date: {transaction['date']} | Category: {transaction['category']} "
-                    f"| Amount: {transaction['amount']} {transaction['currency']} | Tags: {', '.join(transaction['tags'])}"
+                    f"Date: {transaction.date} | Category: {transaction.category} "
+                    f"| Amount: {transaction.amount} {transaction.currency} | Tags: {', '.join(transaction.tags)}"
                 )
         else:
-            print(f"No expenses found with tag '{tag}'.")
+            print(f"No expenses found matching '{query}'.")
 
     def add_custom_category(self):
         """Add Custom Category"""
@@ -201,7 +319,90 @@ class FinanceCLI:
             "\nEnter transaction type (expense/income) to detect category: "
         )
         category_name = input("Enter custom category name to delete: ")
-        self.manager.delete_custom_category(transaction_type, category_name)
+        reassign_to = (
+            input("Move its transactions to category (leave blank to keep them flagged): ")
+            or None
+        )
+        self.manager.delete_custom_category(transaction_type, category_name, reassign_to)
+
+    def summary_report(self):
+        """Summary Report"""
+        group_by = input(
+            "Group by (comma-separated from wallet, transaction_type, category, month, "
+            "currency; "
+            "default category,month): "
+        ).strip()
+        start = input("Start Month (YYYY-MM, optional): ") or None
+        end = input("End Month (YYYY-MM, optional): ") or None
+        wallet_name = input("Wallet Name (optional): ") or None
+        base_currency = self.ask_base_currency()
+        group_by = [field.strip() for field in group_by.split(",")] if group_by else ["category", "month"]
+
+        try:
+            rows = summarize(self.manager, group_by, start, end, wallet_name, base_currency)
+        except ValueError as e:
+            print(e)
+            return
+        if not rows:
+            print("No transactions in this range.")
+        for row in rows:
+            group = " | ".join(str(row[field]) for field in group_by)
+            print(
+                f"{group}: Total {row['total']:.2f} | Count {row['count']} "
+                f"| Min {row['min']:.2f} | Max {row['max']:.2f}"
+            )
+
+    def set_budget(self):
+        """Set Budget"""
+        wallet_name = (
+            input("Wallet Name (leave blank for default): ")
+            or self.manager.get_default_wallet_name()
+        )
+        category = input(f"Expense category {self.manager.list_categories('expense')}: ")
+        month = input("Month (YYYY-MM): ")
+        limit = float(input("Limit: "))
+        thresholds = input("Warn at percentages of the limit (comma-separated, default 100): ")
+        thresholds = [float(t) / 100 for t in thresholds.split(",")] if thresholds.strip() else [1.0]
+        try:
+            self.manager.set_budget(wallet_name, category, month, limit, thresholds)
+        except ValueError as e:
+            print(e)
+
+    def show_budgets(self):
+        """Show Budgets"""
+        budgets = self.manager.list_budgets()
+        if not budgets:
+            print("No budgets set.")
+        for budget in budgets:
+            print(
+                f"{budget.month} | {budget.wallet_name} | {budget.category}: "
+                f"Spent {budget.spent:.2f} of {budget.limit:.2f} "
+                f"({budget.spent / budget.limit:.0%})"
+            )
+
+    def delete_budget(self):
+        """Delete Budget"""
+        wallet_name = input("Wallet Name: ")
+        category = input("Expense category: ")
+        month = input("Month (YYYY-MM): ")
+        try:
+            if not self.manager.delete_budget(wallet_name, category, month):
+                print("There is no such budget.")
+        except ValueError as e:
+            print(e)
+
+    def budget_alert(self, budget, threshold):
+        print(
+            f"Budget alert: {budget.wallet_name} spent {budget.spent:.2f} on {budget.category} "
+            f"in {budget.month}, {threshold:.0%} of its {budget.limit:.2f} limit reached."
+        )
+
+    def show_stats(self):
+        """Show Performance Stats"""
+        if self.manager.stats is None:
+            print(f"Instrumentation is off; set {ENV_VAR}=1 to record method timings.")
+        else:
+            print(self.manager.stats.report())
 
     def exit(self):
         """Exit"""
@@ -209,7 +410,52 @@ class FinanceCLI:
         exit()
 
 
+def import_statements(
+    manager, paths, wallet=None, rules=None, date_format="%Y-%m-%d", currency=None
+):
+    importer = StatementImporter(
+        manager, wallet, load_rules(rules) if rules else (), date_format, currency
+    )
+    report = importer.run(paths)
+    for source, reason in report.errors:
+        print(f"Rejected {source}: {reason}")
+    if report.rejected > len(report.errors):
+        print(f"... and {report.rejected - len(report.errors)} more rejected rows.")
+    print(
+        f"Imported {report.imported} of {report.read} rows "
+        f"({report.duplicates} duplicates, {report.rejected} rejected) "
+        f"in {report.seconds:.2f}s, {report.rows_per_second:.0f} rows/s."
+    )
+    return report
+
+
 if __name__ == "__main__":
-    args = FinanceCLI(FinanceManager()).parse_args()
-    cli = FinanceCLI(FinanceManager(data_file=args.data_file))
-    cli.run()
+    args = FinanceCLI.parse_args()
+    manager = FinanceManager(
+        data_file=args.data_file,
+        journal=args.journal,
+        lazy=args.lazy,
+        format=args.format,
+        concurrent=args.concurrent,
+    )
+    if args.rates_file:
+        manager.load_rates(args.rates_file)
+    if args.command == "import":
+        manager.wait_until_loaded()
+        import_statements(
+            manager, args.statements, args.wallet, args.rules, args.date_format, args.currency
+        )
+    elif args.migrate_to:
+        manager.wait_until_loaded()
+        migrate(manager, args.migrate_to, format=args.format)
+        print(f"Migrated {args.data_file} to {args.migrate_to}.")
+    elif args.profile:
+        profiler = cProfile.Profile()
+        try:
+            profiler.runcall(FinanceCLI(manager).run)
+        finally:
+            profiler.dump_stats(args.profile)
+            print(f"Profile written to {args.profile}.")
+    else:
+        cli = FinanceCLI(manager)
+        cli.run()
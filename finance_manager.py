@@ -1,19 +1,55 @@
-import json
-from collections import defaultdict
+import sys
+import threading
+from contextlib import contextmanager
 from datetime import datetime
+from functools import wraps
+from itertools import islice
+
+from balances import Balances
+from budgets import Budget, Budgets
+from categories import CategoryRegistry
+from indexes import TransactionIndex, date_key, date_ordinal, iso_date
+from instrumentation import instrument, stats_enabled
+from rates import RateTable
+from reports import AggregateCube, cube_key, normalize_month
+from storage import open_storage, transaction_month
+from tag_query import TagQuery
 
 
 class Wallet:
-    def __init__(self, name, balance=0.0, currency="USD"):
-        self.name = name
-        self.balance = round(balance, 4)
-        self.currency = currency
+    __slots__ = ("name", "initial_balance", "balance", "currency")
+
+    def __init__(self, name, balance=0.0, currency="USD", initial_balance=None):
+        self.name = sys.intern(name)
+        # balance follows the wallet's transactions; a saved wallet is rebuilt
+        # from its initial balance as the ledger is loaded.
+        self.initial_balance = round(balance if initial_balance is None else initial_balance, 4)
+        self.balance = self.initial_balance
+        self.currency = sys.intern(currency)
 
     def to_dict(self):
-        return {"name": self.name, "balance": self.balance, "currency": self.currency}
+        return {
+            "name": self.name,
+            "balance": round(self.balance, 4),
+            "currency": self.currency,
+            "initial_balance": self.initial_balance,
+        }
 
 
 class Transaction:
+    # Ledgers hold millions of these, so skip the per-instance __dict__ and
+    # share the few distinct wallet/category/currency/tag/date strings.
+    __slots__ = (
+        "id",
+        "wallet_name",
+        "transaction_type",
+        "category_ref",
+        "amount",
+        "currency",
+        "date",
+        "tags",
+    )
+
     def __init__(
         self,
         id,
@@ -26,13 +62,28 @@ class Transaction:
         tags=None,
     ):
         self.id = id
-        self.wallet_name = wallet_name
-        self.transaction_type = transaction_type
+        self.wallet_name = sys.intern(wallet_name)
+        self.transaction_type = sys.intern(transaction_type)
         self.category = category
         self.amount = float(amount)
-        self.currency = currency
-        self.date = date or datetime.now().strftime("%Y-%m-%d")
-        self.tags = tags or []
+        self.currency = sys.intern(currency)
+        self.date = sys.intern(date or datetime.now().strftime("%Y-%m-%d"))
+        self.tags = [sys.intern(tag) for tag in tags] if tags else []
+
+    @property
+    def category(self):
+        category = self.category_ref
+        return category if category.__class__ is str else category.name
+
+    @category.setter
+    def category(self, name):
+        # A plain name until the FinanceManager tracking this transaction
+        # points it at the registry Category, which renames then update.
+        self.category_ref = sys.intern(name)
+
+    @classmethod
+    def from_dict(cls, info):
+        return cls(id=info["id"], **info["transaction_data"])
 
     def to_dict(self):
         return {
@@ -49,6 +100,22 @@ class Transaction:
         }
 
 
+def synchronized(method):
+    """Run a mutating method under the storage lock, on top of the latest data.
+
+    With concurrent storage the method only validates and builds its change
+    once every change other processes committed has been applied, so ids
+    and checks never come from a stale view.
+    """
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._synchronized():
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
 class FinanceManager:
     PREDEFINED_CATEGORIES = {
         "expense": [
@@ -62,15 +129,73 @@ class FinanceManager:
         ],
         "income": ["salary", "investment income"],
     }
+    TRANSACTION_FIELDS = (
+        "wallet_name",
+        "transaction_type",
+        "category",
+        "amount",
+        "currency",
+        "date",
+        "tags",
+    )
 
-    def __init__(self, data_file="finance_data.json"):
+    def __init__(
+        self,
+        data_file="finance_data.json",
+        journal=False,
+        journal_max_bytes=None,
+        storage=None,
+        lazy=False,
+        format=None,
+        concurrent=False,
+        rates=None,
+    ):
         self.data_file = data_file
+        self.rates = rates
+        self.storage = storage or open_storage(
+            data_file,
+            journal=journal,
+            journal_max_bytes=journal_max_bytes,
+            format=format,
+            concurrent=concurrent,
+        )
+        self._batch_depth = 0
+        self._pending_records = []
+        self._staged = False
         self.wallets = {}
-        self.transactions = []
-        self.custom_categories = {"expense": [], "income": []}
+        # Storages with rows_on_disk leave these unread until something needs
+        # every row, e.g. a tag query; until then queries go to the storage.
+        self._rows_loaded = True
+        self._transactions = []
+        self._index = TransactionIndex()
+        self.balances = Balances()
+        self.aggregates = AggregateCube(self._cell_transactions)
+        self.budgets = Budgets()
+        self.categories = CategoryRegistry(self.PREDEFINED_CATEGORIES)
         self.default_wallet = None
-        self.transaction_id_counter = len(self.transactions) + 1
-        self.available_tags = {
+        self.transaction_id_counter = 1
+        self.available_tags = self._default_available_tags()
+        # What changed since the last load or save, for storages that only
+        # rewrite what is dirty: months of transactions and metadata tables.
+        self.dirty_segments = set()
+        self.dirty_tables = set()
+        # Bumped on every load and applied change, so caches can tell they are stale.
+        self.revision = 0
+        self._loaded = threading.Event()
+        self._load_error = None
+        self.stats = None
+        if stats_enabled():
+            instrument(self)
+        if lazy:
+            # Let callers get going while the history is read; wait_until_loaded()
+            # must be called before the ledger is used.
+            threading.Thread(target=self._load_in_background, daemon=True).start()
+        else:
+            self.load_from_file()
+
+    @staticmethod
+    def _default_available_tags():
+        return {
             "expense": {
                 "food": ["groceries", "organic"],
                 "clothing": ["casual wear", "formal wear"],
@@ -85,13 +210,14 @@ class FinanceManager:
                 "investment income": ["stocks", "bonds"],
             },
         }
-        self.load_from_file()
 
+    @synchronized
     def add_wallet(self, name, initial_balance=0.0, currency="USD"):
         if name not in self.wallets:
-            self.wallets[name] = Wallet(name, initial_balance, currency)
-        self.save_to_file()
+            wallet = Wallet(name, initial_balance, currency)
+            self._commit({"op": "add_wallet", "wallet": wallet.to_dict()})
 
+    @synchronized
     def add_transaction(
         self,
         wallet_name,
@@ -103,11 +229,7 @@ class FinanceManager:
         tags=None,
     ):
         if wallet_name in self.wallets:
-            valid_categories = (
-                self.PREDEFINED_CATEGORIES[transaction_type]
-                + self.custom_categories[transaction_type]
-            )
-            if category in valid_categories:
+            if self.categories.get(transaction_type, category) is not None:
                 transaction = Transaction(
                     self.transaction_id_counter,
                     wallet_name,
@@ -115,187 +237,756 @@ class FinanceManager:
                     category,
                     amount,
                     currency,
-                    date,
+                    # Stored zero-padded, so dates sort and slice into months as text.
+                    date and iso_date(date),
                     tags,
                 )
-                self.transactions.append(transaction)
-                self.transaction_id_counter += 1
-                self.save_to_file()
+                self._commit(
+                    {"op": "add_transaction", "transaction": transaction.to_dict()}
+                )
 
+    @synchronized
+    def add_transactions(self, rows):
+        """Validate and insert many transactions, persisting them once.
 
+        Each row is a dict of add_transaction keyword arguments or a tuple of
+        its positional arguments. Nothing is inserted if any row is invalid.
+        """
+        rows = [
+            row if isinstance(row, dict) else dict(zip(self.TRANSACTION_FIELDS, row))
+            for row in rows
+        ]
+        for index, row in enumerate(rows):
+            error = self._transaction_error(**row)
+            if error:
+                raise ValueError(f"Row {index}: {error}")
+        with self.batch():
+            for row in rows:
+                self.add_transaction(**row)
+        return len(rows)
+
+    def _transaction_error(
+        self,
+        wallet_name,
+        transaction_type,
+        category,
+        amount,
+        currency,
+        date=None,
+        tags=None,
+    ):
+        if wallet_name not in self.wallets:
+            return f"wallet '{wallet_name}' does not exist"
+        if transaction_type not in self.PREDEFINED_CATEGORIES:
+            return f"unknown transaction type '{transaction_type}'"
+        if self.categories.get(transaction_type, category) is None:
+            return f"category '{category}' not found in {transaction_type} categories"
+        try:
+            float(amount)
+        except (TypeError, ValueError):
+            return f"invalid amount {amount!r}"
+        if date:
+            try:
+                datetime.strptime(date, "%Y-%m-%d")
+            except (TypeError, ValueError):
+                return f"invalid date {date!r}"
+        return None
+
+    @contextmanager
+    def batch(self, defer_flush=False):
+        """Group mutations into one atomic persist.
+
+        Changes made inside the block are written once when the outermost
+        batch exits. If it exits with an exception, the in-memory state is
+        reloaded from disk so none of the batched changes survive.
+
+        With defer_flush the changes stay buffered after the block until
+        flush() is called, e.g. from another thread. Concurrent storage only
+        holds its lock for the block, so it does not allow this.
+        """
+        if defer_flush and self.storage.concurrent:
+            raise ValueError("Concurrent storage cannot defer a batch's flush.")
+        with self._synchronized():
+            self._batch_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    self._pending_records = []
+                    self._staged = False
+                    self.storage.rollback()
+                    self.load_from_file()
+                raise
+            self._batch_depth -= 1
+            if not self._batch_depth and not defer_flush:
+                self._flush_pending()
+
+    def flush(self):
+        """Persist the changes of a batch(defer_flush=True)."""
+        self._flush_pending()
+
+    @contextmanager
+    def _synchronized(self):
+        if not self.storage.concurrent or self._batch_depth:
+            yield
+            return
+        with self.storage.locked():
+            self.refresh()
+            yield
+
+    def refresh(self):
+        """Catch up with changes other processes committed to the data file.
+
+        Applies just the new journal records when it can, and reloads
+        everything when the snapshot was rewritten.
+        """
+        with self.storage.locked(shared=True):
+            records = self.storage.poll()
+            if records is None:
+                self.load_from_file()
+            else:
+                for record in records:
+                    self._apply(record)
+                self.budgets.discard_changes()
+
+
+    @synchronized
     def add_custom_category(self, transaction_type, category_name, tags=[]):
-        if (
-            category_name not in self.custom_categories[transaction_type]
-            and category_name not in self.PREDEFINED_CATEGORIES[transaction_type]
-        ):
-            self.custom_categories[transaction_type].append(category_name)
+        if self.categories.get(transaction_type, category_name) is None:
+            if transaction_type not in self.available_tags:
+                raise ValueError("Transaction type or category does not exist.")
             tags = tags.split(",") if isinstance(tags, str) else tags
-            self.update_available_tags(transaction_type, category_name, tags)
-            self.save_to_file()
+            self._commit(
+                {
+                    "op": "add_custom_category",
+                    "transaction_type": transaction_type,
+                    "category": category_name,
+                    "tags": list(tags),
+                }
+            )
 
 
+    @synchronized
     def edit_custom_category(self, transaction_type, old_category_name, new_category_name):
-        if old_category_name in self.custom_categories[transaction_type]:
-            index = self.custom_categories[transaction_type].index(old_category_name)
-            self.custom_categories[transaction_type][index] = new_category_name
-            
-            for transaction in self.transactions:
-                if transaction.category == old_category_name and transaction.transaction_type == transaction_type:
-                    transaction.category = new_category_name
-
-            if old_category_name in self.available_tags[transaction_type]:
-                old_tags = self.available_tags[transaction_type][old_category_name]
-                del self.available_tags[transaction_type][old_category_name]
-                self.available_tags[transaction_type][new_category_name] = old_tags
-
-            self.save_to_file()
+        if self.categories.is_custom(transaction_type, old_category_name):
+            if self.categories.get(transaction_type, new_category_name) is not None:
+                raise ValueError(
+                    f"Category '{new_category_name}' already exists in {transaction_type} categories."
+                )
+            self._commit(
+                {
+                    "op": "edit_custom_category",
+                    "transaction_type": transaction_type,
+                    "old_category": old_category_name,
+                    "new_category": new_category_name,
+                }
+            )
         else:
             raise ValueError(f"Category '{old_category_name}' not found in {transaction_type} categories.")
 
 
-    def delete_custom_category(self, transaction_type, category_name):
-        if category_name in self.custom_categories[transaction_type]:
-            self.custom_categories[transaction_type].remove(category_name)
-
-            if category_name in self.available_tags[transaction_type]:
-                del self.available_tags[transaction_type][category_name]
+    @synchronized
+    def delete_custom_category(self, transaction_type, category_name, reassign_to=None):
+        """Delete a custom category, moving its transactions to reassign_to if given.
 
-            self.save_to_file()
+        Without reassign_to the transactions keep the old name and are listed
+        by orphaned_transactions().
+        """
+        if self.categories.is_custom(transaction_type, category_name):
+            record = {
+                "op": "delete_custom_category",
+                "transaction_type": transaction_type,
+                "category": category_name,
+            }
+            if reassign_to is not None:
+                if (
+                    reassign_to == category_name
+                    or self.categories.get(transaction_type, reassign_to) is None
+                ):
+                    raise ValueError(
+                        f"Category '{reassign_to}' not found in {transaction_type} categories."
+                    )
+                record["reassign_to"] = reassign_to
+            self._commit(record)
         else:
             raise ValueError(f"Category '{category_name}' not found in {transaction_type} categories.")
 
+    def orphaned_transactions(self, transaction_type=None):
+        """Transactions filed under a deleted or unknown category, in id order."""
+        ids = set()
+        for (retired_type, _), category in self.categories.retired.items():
+            if transaction_type in (None, retired_type):
+                ids |= self.index.by_category.get(category, set())
+        return [self.index.by_id[transaction_id] for transaction_id in sorted(ids)]
 
-    def save_to_file(self):
+    @property
+    def custom_categories(self):
+        return {
+            transaction_type: self.categories.names(transaction_type, custom_only=True)
+            for transaction_type in self.PREDEFINED_CATEGORIES
+        }
+
+
+    @property
+    def transactions(self):
+        """Every transaction, in date order."""
+        if not self._rows_loaded:
+            self._load_rows()
+        return self._transactions
+
+    @property
+    def index(self):
+        if not self._rows_loaded:
+            self._load_rows()
+        return self._index
+
+    @property
+    def transaction_count(self):
+        if self._rows_loaded:
+            return len(self._transactions)
+        return sum(cell[1] for cell in self.aggregates.cells.values())
+
+    def to_dict(self, include_transactions=True):
+        # Transactions go last so a streaming reader sees the small fields first.
         data = {
             "wallets": {name: wallet.to_dict() for name, wallet in self.wallets.items()},
-            "transactions": [transaction.to_dict() for transaction in self.transactions],
             "custom_categories": self.custom_categories,
             "default_wallet": self.default_wallet,
-            "available_tags": self.available_tags
+            "available_tags": self.available_tags,
+            "budgets": [budget.to_dict() for budget in self.budgets],
+            "transaction_id_counter": self.transaction_id_counter,
         }
-        with open(self.data_file, "w") as file:
-            json.dump(data, file, indent=4)
+        if include_transactions:
+            data["transactions"] = [transaction.to_dict() for transaction in self.transactions]
+        return data
+
+    @synchronized
+    def save_to_file(self):
+        self.storage.save(self)
+
+    def compact(self):
+        """Fold the journal into a fresh snapshot."""
+        self.save_to_file()
 
     def load_from_file(self):
+        with self.storage.locked(shared=True):
+            self._load()
+
+    def _load(self):
+        data, records = self.storage.load()
+        # Transactions may stream in first; the rest of data is read afterwards.
+        transactions = [Transaction.from_dict(info) for info in data.get("transactions", [])]
+        self.wallets = {name: Wallet(**info) for name, info in data.get("wallets", {}).items()}
+        self.categories = CategoryRegistry(
+            self.PREDEFINED_CATEGORIES, data.get("custom_categories")
+        )
+        self.default_wallet = data.get("default_wallet")
+        self.available_tags = data.get("available_tags") or self._default_available_tags()
+        self.transaction_id_counter = data.get(
+            "transaction_id_counter",
+            max((t.id for t in transactions), default=0) + 1,
+        )
+        self.balances = Balances()
+        self.aggregates = AggregateCube(self._cell_transactions)
+        if self.storage.rows_on_disk:
+            self._load_summaries(data)
+        else:
+            self._index_rows(transactions)
+            for transaction in transactions:
+                self._adjust_balance(transaction)
+                self.aggregates.add(transaction)
+        self.budgets.clear()
+        for info in data.get("budgets", []):
+            self._apply_set_budget({"budget": info})
+        self.dirty_segments.clear()
+        self.dirty_tables.clear()
+        self.revision += 1
+        for record in records:
+            self._apply(record)
+        self.budgets.discard_changes()
+        self._loaded.set()
+
+    def _index_rows(self, transactions):
+        transactions.sort(key=date_key)
+        resolve = self.categories.resolve
+        for transaction in transactions:
+            transaction.category_ref = resolve(transaction.transaction_type, transaction.category)
+        self._transactions = transactions
+        self._index = TransactionIndex(transactions)
+        self._rows_loaded = True
+
+    def _load_summaries(self, data):
+        """Balances and the cube from the grouped rows of a rows_on_disk storage."""
+        self._rows_loaded = False
+        self._transactions = self._index = None
+        for wallet_name, day, amount in data["daily"]:
+            self.balances.add_daily(wallet_name, date_ordinal(day), amount)
+            wallet = self.wallets.get(wallet_name)
+            if wallet is not None:
+                wallet.balance += amount
+        resolve = self.categories.resolve
+        for wallet_name, transaction_type, category, month, currency, *cell in data["cells"]:
+            category = resolve(transaction_type, category)
+            self.aggregates.add_cell(
+                (wallet_name, transaction_type, category, month, currency), *cell
+            )
+
+    def _load_rows(self):
+        rows = self.storage.select_transactions()
+        self._index_rows([Transaction.from_dict(info) for info in rows])
+
+    def _stored(self, info):
+        """A Transaction for a row read from a rows_on_disk storage."""
+        transaction = Transaction.from_dict(info)
+        transaction.category_ref = self.categories.resolve(
+            transaction.transaction_type, transaction.category
+        )
+        return transaction
+
+    def _load_in_background(self):
         try:
-            with open(self.data_file, "r") as file:
-                data = json.load(file)
-                self.wallets = {name: Wallet(**info) for name, info in data.get("wallets", {}).items()}
-                self.transactions = [
-                    Transaction(
-                        id=info['id'],
-                        wallet_name=info['transaction_data']['wallet_name'],
-                        transaction_type=info['transaction_data']['transaction_type'],
-                        category=info['transaction_data']['category'],
-                        amount=float(info['transaction_data']['amount']),
-                        currency=info['transaction_data']['currency'],
-                        date=info['transaction_data']['date'],
-                        tags=info['transaction_data']['tags']
-                    ) for info in data.get("transactions", [])
-                ]
-                self.custom_categories = data.get("custom_categories", {})
-                self.default_wallet = data.get("default_wallet")
-                self.available_tags = data.get("available_tags", self.available_tags)
-        except (FileNotFoundError, json.JSONDecodeError):
-            self.wallets = {}
-            self.transactions = []
-            self.custom_categories = {"expense": [], "income": []}
-            self.default_wallet = None
-            self.available_tags = {
-                "expense": {
-                    "food": ["groceries", "organic"],
-                    "clothing": ["casual wear", "formal wear"],
-                    "transportation": ["commute", "long-distance"],
-                    "entertainment": ["movies", "live music"],
-                    "health": ["pharmacy", "wellness"],
-                    "education": ["textbooks", "courses"],
-                    "charity": ["donations", "community support"],
-                },
-                "income": {
-                    "salary": ["regular salary", "overtime"],
-                    "investment income": ["stocks", "bonds"],
-                },
-            }
+            self.load_from_file()
+        except BaseException as error:
+            self._load_error = error
+            self._loaded.set()
+
+    def wait_until_loaded(self):
+        """Block until a lazy load has finished, re-raising any load error."""
+        self._loaded.wait()
+        if self._load_error is not None:
+            raise self._load_error
+
+    def _commit(self, record):
+        self._apply(record)
+        if not self._batch_depth:
+            self._persist([record])
+        elif self.storage.stage(self, [record]):
+            self._staged = True
+        else:
+            self._pending_records.append(record)
+        self.budgets.notify()
 
+    def _flush_pending(self):
+        records, self._pending_records = self._pending_records, []
+        if records or self._staged:
+            self._staged = False
+            self._persist(records)
 
+    def _persist(self, records):
+        """Commit applied records, reloading from disk if the storage fails.
 
+        Storage may snapshot the whole manager, so records are applied
+        first; a failed commit must not leave them in memory.
+        """
+        try:
+            self.storage.commit(self, records)
+        except BaseException:
+            self.storage.rollback()
+            self.load_from_file()
+            raise
+
+    def _apply(self, record):
+        getattr(self, "_apply_" + record["op"])(record)
+        self.revision += 1
+
+    def _apply_batch(self, record):
+        for batched_record in record["records"]:
+            self._apply(batched_record)
+
+    def _apply_add_wallet(self, record):
+        wallet = Wallet(**record["wallet"])
+        self.wallets[wallet.name] = wallet
+        self.dirty_tables.add("wallets")
+
+    def _apply_set_default_wallet(self, record):
+        self.default_wallet = record["name"]
+        self.dirty_tables.add("settings")
+
+    def _apply_add_transaction(self, record):
+        transaction = Transaction.from_dict(record["transaction"])
+        self._track_transaction(transaction)
+        self.transaction_id_counter = max(self.transaction_id_counter, transaction.id + 1)
+        self.dirty_tables.add("settings")
+
+    def _apply_edit_transaction(self, record):
+        transaction = self.get_transaction(record["id"])
+        if transaction is not None:
+            self._untrack_transaction(transaction)
+            for key, value in record["updates"].items():
+                if isinstance(value, str):
+                    value = sys.intern(value)
+                setattr(transaction, key, value)
+            self._track_transaction(transaction)
+
+    def _apply_delete_transaction(self, record):
+        transaction = self.get_transaction(record["id"])
+        if transaction is not None:
+            self._untrack_transaction(transaction)
+
+    def _track_transaction(self, transaction):
+        transaction.category_ref = self.categories.resolve(
+            transaction.transaction_type, transaction.category
+        )
+        if self._rows_loaded:
+            self._transactions.insert(self._index.add(transaction), transaction)
+        self._adjust_balance(transaction)
+        self.aggregates.add(transaction)
+        self.budgets.add(transaction)
+        self.dirty_segments.add(transaction_month(transaction))
+
+    def _untrack_transaction(self, transaction):
+        if self._rows_loaded:
+            del self._transactions[self._index.remove(transaction)]
+        self._adjust_balance(transaction, sign=-1)
+        self.aggregates.remove(transaction)
+        self.budgets.remove(transaction)
+        self.dirty_segments.add(transaction_month(transaction))
+
+    def _cell_transactions(self, key):
+        if not self._rows_loaded:
+            month = key[3]
+            rows = self.storage.select_transactions(
+                wallet_name=key[0],
+                start_date=month + "-01",
+                end_date=month + "-31",
+                transaction_type=key[1],
+                category=key[2].name,
+            )
+            for transaction in map(self._stored, rows):
+                if transaction.currency == key[4]:
+                    yield transaction
+            return
+        for transaction_id in self._index.by_category.get(key[2], ()):
+            transaction = self._index.by_id[transaction_id]
+            if cube_key(transaction) == key:
+                yield transaction
+
+    def _adjust_balance(self, transaction, sign=1):
+        amount = self.balances.add(transaction, sign)
+        wallet = self.wallets.get(transaction.wallet_name)
+        if wallet is not None:
+            wallet.balance += amount
+            self.dirty_tables.add("wallets")
+
+    def _apply_add_custom_category(self, record):
+        transaction_type = record["transaction_type"]
+        self.categories.add(transaction_type, record["category"])
+        self.available_tags[transaction_type][record["category"]] = record["tags"]
+        self.dirty_tables.update(("categories", "tags"))
+
+    def _apply_edit_custom_category(self, record):
+        transaction_type = record["transaction_type"]
+        old_category_name = record["old_category"]
+        new_category_name = record["new_category"]
+        # Transactions, the index and the cube all hold the Category itself.
+        self.categories.rename(transaction_type, old_category_name, new_category_name)
+        self.dirty_tables.update(("categories", "tags"))
+        category = self.categories.get(transaction_type, new_category_name)
+        if self._rows_loaded:
+            self._mark_segments(self._index.by_category.get(category, ()))
+
+        if old_category_name in self.available_tags[transaction_type]:
+            old_tags = self.available_tags[transaction_type][old_category_name]
+            del self.available_tags[transaction_type][old_category_name]
+            self.available_tags[transaction_type][new_category_name] = old_tags
+
+    def _apply_delete_custom_category(self, record):
+        transaction_type = record["transaction_type"]
+        category_name = record["category"]
+        category = self.categories.delete(transaction_type, category_name)
+        if "reassign_to" in record:
+            target = self.categories.get(transaction_type, record["reassign_to"])
+            if self._rows_loaded:
+                moved = self._index.merge_category(category, target)
+                transactions = [self._index.by_id[transaction_id] for transaction_id in moved]
+                self._mark_segments(moved)
+            elif len(self.budgets):
+                # The rows still carry the old name until the storage commits.
+                transactions = map(
+                    self._stored,
+                    self.storage.select_transactions(
+                        transaction_type=transaction_type, category=category_name
+                    ),
+                )
+            else:
+                transactions = ()
+            for transaction in transactions:
+                self.budgets.remove(transaction)
+                transaction.category_ref = target
+                self.budgets.add(transaction)
+            self.aggregates.merge_category(category, target)
+        self.dirty_tables.update(("categories", "tags"))
+
+        if category_name in self.available_tags[transaction_type]:
+            del self.available_tags[transaction_type][category_name]
+
+    def _apply_update_available_tags(self, record):
+        self.available_tags[record["transaction_type"]][record["category"]] = record["tags"]
+        self.dirty_tables.add("tags")
+
+    def _apply_set_budget(self, record):
+        info = record["budget"]
+        budget = Budget(
+            info["wallet_name"],
+            self.categories.resolve("expense", info["category"]),
+            info["month"],
+            info["limit"],
+            info["thresholds"],
+        )
+        self.budgets.set(budget, self.aggregates)
+        self.dirty_tables.add("budgets")
+
+    def _apply_delete_budget(self, record):
+        category = self.categories.resolve("expense", record["category"])
+        self.budgets.delete(record["wallet_name"], category, record["month"])
+        self.dirty_tables.add("budgets")
+
+    def _mark_segments(self, transaction_ids):
+        by_id = self._index.by_id
+        self.dirty_segments.update(
+            transaction_month(by_id[transaction_id]) for transaction_id in transaction_ids
+        )
+
+    def load_rates(self, path):
+        """Read exchange rates for base-currency reports from a CSV or JSON file."""
+        self.rates = RateTable.from_file(path)
+
+    def query_transactions(
+        self,
+        wallet_name=None,
+        start_date=None,
+        end_date=None,
+        after=None,
+        descending=False,
+        limit=None,
+    ):
+        """Iterate over transactions in (date, id) order, newest first if descending.
+
+        Dates are inclusive YYYY-MM-DD bounds. after is the (date, id) cursor
+        of the last transaction already seen, so the next page starts right
+        past it; limit caps how many are yielded. Transactions are produced
+        one at a time, so a page costs time proportional to its size.
+        """
+        if not self._rows_loaded:
+            transactions = self._stored_window(
+                wallet_name, start_date, end_date, after, descending, limit
+            )
+            return islice(transactions, limit)
+        start = start_date and date_ordinal(start_date)
+        end = end_date and date_ordinal(end_date)
+        if after is not None:
+            after = (date_ordinal(after[0]), after[1])
+        transactions = self._index.iter_window(wallet_name, start, end, after, descending)
+        return islice(transactions, limit)
+
+    PAGE_ROWS = 1000
+
+    def _stored_window(self, wallet_name, start_date, end_date, after, descending, limit):
+        """query_transactions() read from the storage, PAGE_ROWS rows at a time."""
+        page = min(limit or self.PAGE_ROWS, self.PAGE_ROWS)
+        start_date = start_date and iso_date(start_date)
+        end_date = end_date and iso_date(end_date)
+        if after is not None:
+            after = (iso_date(after[0]), after[1])
+        while True:
+            rows = self.storage.select_window(
+                wallet_name, start_date, end_date, after, descending, page
+            )
+            for info in rows:
+                yield self._stored(info)
+            if len(rows) < page:
+                return
+            after = (rows[-1]["transaction_data"]["date"], rows[-1]["id"])
 
     def list_transactions(self, wallet_name=None, start_date=None, end_date=None):
-        if start_date:
-            start_date = datetime.strptime(start_date, "%Y-%m-%d")
-        if end_date:
-            end_date = datetime.strptime(end_date, "%Y-%m-%d")
-        
-        filtered_transactions = []
-        for transaction in self.transactions:
-            transaction_date = datetime.strptime(transaction.date, "%Y-%m-%d")
-            if (not wallet_name or transaction.wallet_name == wallet_name) and \
-            (not start_date or transaction_date >= start_date) and \
-            (not end_date or transaction_date <= end_date):
-                filtered_transactions.append(transaction)
-
-        transactions_by_date = defaultdict(list)
-        for transaction in filtered_transactions:
-            transactions_by_date[transaction.date].append(transaction)
-
-        for date in sorted(transactions_by_date.keys()):
-            daily_transactions = sorted(transactions_by_date[date], key=lambda x: x.id)
-            total_amount = sum(t.amount for t in daily_transactions)
-            print(f"Date: {date}, Total Amount: ${total_amount:.2f}")
-            for transaction in daily_transactions:
-                print(f"  - Wallet: {transaction.wallet_name}, Category: {transaction.category}, Amount: ${transaction.amount:.2f}")
-
+        return list(self.query_transactions(wallet_name, start_date, end_date))
 
+    def get_transaction(self, transaction_id):
+        if self._rows_loaded:
+            return self._index.by_id.get(transaction_id)
+        info = self.storage.select_transaction(transaction_id)
+        return info and self._stored(info)
 
+    @synchronized
     def delete_transaction(self, transaction_id):
-        self.transactions = [t for t in self.transactions if t.id != transaction_id]
-        self.save_to_file()
+        if self.get_transaction(transaction_id) is not None:
+            self._commit({"op": "delete_transaction", "id": transaction_id})
 
+    @synchronized
     def edit_transaction(self, transaction_id, **updates):
-        for transaction in self.transactions:
-            if transaction.id == transaction_id:
-                for key, value in updates.items():
-                    setattr(transaction, key, value)
-                self.save_to_file()
-                return True
+        """Change fields of a transaction; invalid updates raise ValueError and change nothing."""
+        transaction = self.get_transaction(transaction_id)
+        if transaction is not None:
+            error = self._edit_error(transaction, updates)
+            if error:
+                raise ValueError(f"Transaction {transaction_id}: {error}")
+            if "amount" in updates:
+                updates["amount"] = float(updates["amount"])
+            if "tags" in updates:
+                updates["tags"] = list(updates["tags"] or [])
+            if "date" in updates:
+                updates["date"] = iso_date(updates["date"])
+            self._commit(
+                {"op": "edit_transaction", "id": transaction_id, "updates": updates}
+            )
+            return True
         return False
 
+    def _edit_error(self, transaction, updates):
+        # Checked before anything is untracked, since an edit cannot be
+        # undone halfway through.
+        unknown = set(updates) - set(self.TRANSACTION_FIELDS)
+        if unknown:
+            return f"cannot edit {', '.join(sorted(unknown))}"
+        for field in ("wallet_name", "transaction_type", "category", "currency", "date"):
+            if field in updates and not isinstance(updates[field], str):
+                return f"invalid {field} {updates[field]!r}"
+        if "tags" in updates and not all(
+            isinstance(tag, str) for tag in updates["tags"] or []
+        ):
+            return f"invalid tags {updates['tags']!r}"
+        if "wallet_name" in updates and updates["wallet_name"] not in self.wallets:
+            return f"wallet '{updates['wallet_name']}' does not exist"
+        if "transaction_type" in updates or "category" in updates:
+            # Only then, so orphaned transactions can still have other fields edited.
+            transaction_type = updates.get("transaction_type", transaction.transaction_type)
+            if transaction_type not in self.PREDEFINED_CATEGORIES:
+                return f"unknown transaction type '{transaction_type}'"
+            category = updates.get("category", transaction.category)
+            if self.categories.get(transaction_type, category) is None:
+                return f"category '{category}' not found in {transaction_type} categories"
+        if "amount" in updates:
+            try:
+                float(updates["amount"])
+            except (TypeError, ValueError):
+                return f"invalid amount {updates['amount']!r}"
+        if "date" in updates:
+            try:
+                datetime.strptime(updates["date"], "%Y-%m-%d")
+            except ValueError:
+                return f"invalid date {updates['date']!r}"
+        return None
+
+    @synchronized
     def set_default_wallet(self, name):
         if name in self.wallets:
-            self.default_wallet = name
-            self.save_to_file()
+            self._commit({"op": "set_default_wallet", "name": name})
             return True
         return False
 
+    def get_balance(self, wallet_name, as_of=None):
+        """Current balance of a wallet, or its balance at the end of as_of."""
+        wallet = self.wallets[wallet_name]
+        if as_of is None:
+            return round(wallet.balance, 4)
+        net = self.balances.net_as_of(wallet_name, date_ordinal(as_of))
+        return round(wallet.initial_balance + net, 4)
+
     def get_default_wallet_name(self):
         return getattr(self, "default_wallet", None)
 
+    def search_transactions(
+        self,
+        query,
+        transaction_type=None,
+        category=None,
+        start_date=None,
+        end_date=None,
+    ):
+        """Transactions whose tags match a tag query, in id order.
+
+        See tag_query for the syntax, e.g. 'groceries AND NOT organic' or
+        'movie* OR "live music"'. Dates are inclusive YYYY-MM-DD bounds. The
+        result is a read-through view over the matching ids.
+        """
+        return TagQuery(self.index).search(
+            query, transaction_type, category, start_date, end_date
+        )
+
     def search_expenses_by_tag(self, tag):
+        """transaction_data dicts of the expenses tagged tag, in id order."""
+        if not self._rows_loaded:
+            rows = self.storage.select_transactions(tag=tag, transaction_type="expense")
+            return [info["transaction_data"] for info in rows]
         return [
             transaction.to_dict()["transaction_data"]
-            for transaction in self.transactions
-            if tag in transaction.tags and transaction.transaction_type == "expense"
+            for transaction in self.index.tagged(tag)
+            if transaction.transaction_type == "expense"
         ]
 
     def list_categories(self, transaction_type):
-        combined_categories = {"expense": [], "income": []}
-
-        for category_type in ["expense", "income"]:
-            combined_categories[category_type] = (
-                self.PREDEFINED_CATEGORIES[category_type]
-                + self.custom_categories[category_type]
-            )
-        return combined_categories[transaction_type]
+        return self.categories.names(transaction_type)
 
     @property
     def get_available_tags(self):
         """Retrieve default tags."""
         return self.available_tags
 
+    @synchronized
     def update_available_tags(self, transaction_type, category, new_tags):
-        print(transaction_type, category, new_tags)
         """Update tags for a specific transaction type and category."""
         if transaction_type in self.available_tags:
-            self.available_tags[transaction_type][category] = new_tags
+            self._commit(
+                {
+                    "op": "update_available_tags",
+                    "transaction_type": transaction_type,
+                    "category": category,
+                    "tags": new_tags,
+                }
+            )
         else:
             raise ValueError("Transaction type or category does not exist.")
+
+    @synchronized
+    def set_budget(self, wallet_name, category, month, limit, thresholds=(1.0,)):
+        """Limit a wallet's spending on an expense category in one YYYY-MM month.
+
+        Listeners added with on_budget_alert() hear about every threshold,
+        a fraction of the limit, that a later change pushes spending across.
+        """
+        if wallet_name not in self.wallets:
+            raise ValueError(f"There is no wallet '{wallet_name}'.")
+        if self.categories.get("expense", category) is None:
+            raise ValueError(f"There is no expense category '{category}'.")
+        if limit <= 0 or not thresholds or min(thresholds) <= 0:
+            raise ValueError("A budget needs a positive limit and positive thresholds.")
+        self._commit(
+            {
+                "op": "set_budget",
+                "budget": {
+                    "wallet_name": wallet_name,
+                    "category": category,
+                    "month": normalize_month(month),
+                    "limit": limit,
+                    "thresholds": sorted(thresholds),
+                },
+            }
+        )
+
+    @synchronized
+    def delete_budget(self, wallet_name, category, month):
+        if self.get_budget(wallet_name, category, month) is not None:
+            self._commit(
+                {
+                    "op": "delete_budget",
+                    "wallet_name": wallet_name,
+                    "category": category,
+                    "month": normalize_month(month),
+                }
+            )
+            return True
+        return False
+
+    def get_budget(self, wallet_name, category, month):
+        category = self.categories.get("expense", category)
+        return category and self.budgets.get(wallet_name, category, normalize_month(month))
+
+    def list_budgets(self):
+        return sorted(
+            self.budgets, key=lambda budget: (budget.month, budget.wallet_name, budget.category)
+        )
+
+    def on_budget_alert(self, listener):
+        """Call listener(budget, threshold) whenever spending crosses a budget threshold."""
+        self.budgets.listeners.append(listener)
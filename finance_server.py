@@ -0,0 +1,186 @@
+"""A local JSON-lines RPC server in front of an AsyncFinanceManager.
+
+Each request is one line, {"id": 1, "method": "add_transaction", "params":
+{...}}, where params is an object of keyword arguments or an array of
+positional ones. Each response is one line, {"id": 1, "result": ...} or
+{"id": 1, "error": "..."}. Requests on a connection are handled
+concurrently, so responses can come back in a different order.
+"""
+import argparse
+import asyncio
+import json
+import os
+
+from async_manager import AsyncFinanceManager
+from finance_manager import FinanceManager
+from serializers import SERIALIZERS
+
+MUTATIONS = (
+    "add_wallet",
+    "add_transaction",
+    "edit_transaction",
+    "delete_transaction",
+    "set_default_wallet",
+    "add_custom_category",
+    "edit_custom_category",
+    "delete_custom_category",
+    "set_budget",
+    "delete_budget",
+)
+READS = (
+    "get_balance",
+    "get_transaction",
+    "query_transactions",
+    "search_transactions",
+    "list_categories",
+    "summarize",
+)
+
+
+def _jsonable(result):
+    if hasattr(result, "to_dict"):
+        return result.to_dict()
+    if isinstance(result, (str, int, float, bool, dict, list)) or result is None:
+        return result
+    return [_jsonable(item) for item in result]
+
+
+async def _dispatch(manager, request):
+    method = request.get("method")
+    if method not in MUTATIONS and method not in READS:
+        raise ValueError(f"Unknown method {method!r}.")
+    params = request.get("params") or {}
+    args, kwargs = (params, {}) if isinstance(params, list) else ((), params)
+    result = getattr(manager, method)(*args, **kwargs)
+    if method in MUTATIONS:
+        result = await result
+    return _jsonable(result)
+
+
+async def _respond(manager, request, writer):
+    try:
+        response = {"id": request.get("id"), "result": await _dispatch(manager, request)}
+    except Exception as error:
+        response = {"id": request.get("id"), "error": str(error)}
+    writer.write(json.dumps(response).encode() + b"\n")
+
+
+async def handle_client(manager, reader, writer):
+    pending = set()
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as error:
+                writer.write(json.dumps({"id": None, "error": str(error)}).encode() + b"\n")
+                continue
+            task = asyncio.create_task(_respond(manager, request, writer))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            await writer.drain()
+        if pending:
+            await asyncio.wait(pending)
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def serve(manager, host="127.0.0.1", port=8765):
+    """Start serving an already started AsyncFinanceManager."""
+    return await asyncio.start_server(
+        lambda reader, writer: handle_client(manager, reader, writer), host, port
+    )
+
+
+class FinanceClient:
+    """A pipelining client: calls can be awaited concurrently on one connection."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.next_id = 0
+        self.waiting = {}
+        self.receiver = asyncio.create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=8765):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def call(self, method, *args, **kwargs):
+        self.next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[self.next_id] = future
+        params = list(args) if args else kwargs
+        request = {"id": self.next_id, "method": method, "params": params}
+        self.writer.write(json.dumps(request).encode() + b"\n")
+        await self.writer.drain()
+        return await future
+
+    async def _receive(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            future = self.waiting.pop(response["id"])
+            if "error" in response:
+                future.set_exception(ValueError(response["error"]))
+            else:
+                future.set_result(response["result"])
+        for future in self.waiting.values():
+            future.set_exception(ConnectionError("The server closed the connection."))
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        await self.receiver
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a Finance Manager over local RPC")
+    parser.add_argument(
+        "--data_file",
+        help="Path to the data file",
+        default=os.getenv("FINANCE_MANAGER_DATA_FILE", "finance_data.json"),
+    )
+    parser.add_argument(
+        "--journal",
+        help="Append changes to a journal instead of rewriting the data file",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--format",
+        help="Snapshot format to write: pretty, compact, orjson or binary",
+        choices=sorted(SERIALIZERS),
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--max_delay",
+        type=float,
+        default=0.005,
+        help="Seconds a flush waits to group more writes",
+    )
+    parser.add_argument("--max_batch", type=int, default=1000, help="Most writes per flush")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    manager = FinanceManager(data_file=args.data_file, journal=args.journal, format=args.format)
+    async with AsyncFinanceManager(manager, args.max_delay, args.max_batch) as async_manager:
+        server = await serve(async_manager, args.host, args.port)
+        print(f"Serving {args.data_file} on {args.host}:{args.port}")
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -1,8 +1,28 @@
+"""Generate synthetic ledgers for the Finance Manager.
+
+Rows are drawn in bulk, block by block of BLOCK_DAYS days, from a generator
+seeded with --seed and the block number, so the same seed gives the same
+ledger whatever the number of --workers. A new or empty --output file is
+streamed straight from the drawn rows in the storage format; a ledger that
+already has transactions is extended through add_transactions().
+"""
 import argparse
+import os
 import random
-from datetime import datetime, timedelta
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from finance_manager import FinanceManager, Transaction
+from storage import FileStorage, SegmentedStorage
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
-from finance_manager import FinanceManager
+BLOCK_DAYS = 32
 
 
 def parse_args():
@@ -40,57 +60,250 @@ def parse_args():
     parser.add_argument(
         "--tags", nargs="*", help="List of tags for transactions", default=""
     )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument(
+        "--output",
+        help="Data file to write or extend",
+        default=os.getenv("FINANCE_MANAGER_DATA_FILE", "finance_data.json"),
+    )
+    parser.add_argument("--format", help="Snapshot format for a new output file")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes drawing date ranges in parallel (JSON formats only)",
+    )
     return parser.parse_args()
 
 
-def ensure_wallets_exist(finance_manager, wallet_names):
-    for name in wallet_names:
-        if name not in finance_manager.wallets:
-            finance_manager.add_wallet(name, initial_balance=random.uniform(1000, 5000))
+def ensure_wallets_exist(finance_manager, wallet_names, seed=0):
+    rng = random.Random(seed)
+    with finance_manager.batch():
+        for name in wallet_names:
+            initial_balance = round(rng.uniform(1000, 5000), 2)
+            if name not in finance_manager.wallets:
+                finance_manager.add_wallet(name, initial_balance=initial_balance)
 
 
-def generate_transactions(finance_manager, config):
-    min_transactions, max_transactions = map(
-        int, config["transactions_per_day"].split("-")
-    )
+def build_plan(finance_manager, config):
+    """Everything a worker needs to draw rows, as plain picklable values."""
+    min_count, max_count = map(int, config["transactions_per_day"].split("-"))
     min_amount, max_amount = map(float, config["amount_range"].split("-"))
-    start_date = datetime.strptime(config["start_date"], "%Y-%m-%d")
-    end_date = datetime.strptime(config["end_date"], "%Y-%m-%d")
-
-    if not config["categories"]:
-        config["categories"] = finance_manager.list_categories
-
-    current_date = start_date
-    while current_date <= end_date:
-        for wallet_name in config["wallet_names"]:
-            num_transactions = random.randint(min_transactions, max_transactions)
-            for _ in range(num_transactions):
-                transaction_type = random.choice(["expense", "income"])
-                category = random.choice(config["categories"](transaction_type))
-
-                tag_choices = (
-                    config["tags"]
-                    if config["tags"]
-                    else finance_manager.available_tags[transaction_type][category]
+    choices = []
+    for transaction_type in ("expense", "income"):
+        categories = finance_manager.list_categories(transaction_type)
+        if config["categories"]:
+            categories = [c for c in config["categories"] if c in categories]
+        if categories:
+            choices.append(
+                (
+                    transaction_type,
+                    [
+                        (
+                            category,
+                            list(
+                                config["tags"]
+                                or finance_manager.available_tags[transaction_type].get(
+                                    category, []
+                                )
+                            ),
+                        )
+                        for category in categories
+                    ],
                 )
-                tag = random.choice(tag_choices)
-                amount = random.uniform(min_amount, max_amount)
+            )
+    if not choices:
+        raise ValueError("None of the given categories exist.")
+    first_day = date.fromisoformat(config["start_date"]).toordinal()
+    last_day = date.fromisoformat(config["end_date"]).toordinal()
+    return {
+        "first_day": first_day,
+        "blocks": max(0, (last_day - first_day) // BLOCK_DAYS + 1),
+        "last_day": last_day,
+        "wallets": list(config["wallet_names"]),
+        "counts": (min_count, max_count),
+        "amounts": (min_amount, max_amount),
+        "choices": choices,
+    }
 
-                finance_manager.add_transaction(
-                    wallet_name,
-                    transaction_type,
-                    category,
-                    round(amount, 2),
-                    "USD",
-                    current_date.strftime("%Y-%m-%d"),
-                    [tag],
+
+def _block_days(plan, block):
+    first = plan["first_day"] + block * BLOCK_DAYS
+    return range(first, min(first + BLOCK_DAYS, plan["last_day"] + 1))
+
+
+def _draw(plan, seed, block, counts_only=False):
+    """Draw a block's per-(day, wallet) row counts and then its row values.
+
+    Returns plain lists: counts, type choices, amounts, and uniform [0, 1)
+    draws that pick each row's category and tag.
+    """
+    cells = len(_block_days(plan, block)) * len(plan["wallets"])
+    min_count, max_count = plan["counts"]
+    min_amount, max_amount = plan["amounts"]
+    if numpy is not None:
+        rng = numpy.random.default_rng([seed, block])
+        counts = rng.integers(min_count, max_count + 1, size=cells)
+        if counts_only:
+            return counts.tolist()
+        size = int(counts.sum())
+        return (
+            counts.tolist(),
+            rng.integers(0, len(plan["choices"]), size=size).tolist(),
+            rng.uniform(min_amount, max_amount, size=size).round(2).tolist(),
+            rng.random(size).tolist(),
+            rng.random(size).tolist(),
+        )
+    rng = random.Random(f"{seed}:{block}")
+    counts = [rng.randint(min_count, max_count) for _ in range(cells)]
+    if counts_only:
+        return counts
+    size = sum(counts)
+    types = len(plan["choices"])
+    uniform = rng.uniform
+    return (
+        counts,
+        [rng.randrange(types) for _ in range(size)],
+        [round(uniform(min_amount, max_amount), 2) for _ in range(size)],
+        [rng.random() for _ in range(size)],
+        [rng.random() for _ in range(size)],
+    )
+
+
+def block_size(plan, seed, block):
+    return sum(_draw(plan, seed, block, counts_only=True))
+
+
+def block_rows(plan, seed, block):
+    """Yield a block's rows in date order as add_transactions() tuples."""
+    counts, types, amounts, category_draws, tag_draws = _draw(plan, seed, block)
+    dates = [date.fromordinal(day).isoformat() for day in _block_days(plan, block)]
+    wallets = plan["wallets"]
+    choices = plan["choices"]
+    end = 0
+    for cell, count in enumerate(counts):
+        day = dates[cell // len(wallets)]
+        wallet_name = wallets[cell % len(wallets)]
+        start, end = end, end + count
+        for row in range(start, end):
+            transaction_type, categories = choices[types[row]]
+            category, tags = categories[int(category_draws[row] * len(categories))]
+            yield (
+                wallet_name,
+                transaction_type,
+                category,
+                amounts[row],
+                "USD",
+                day,
+                [tags[int(tag_draws[row] * len(tags))]] if tags else [],
+            )
+
+
+def generate_rows(finance_manager, config):
+    plan = build_plan(finance_manager, config)
+    seed = config.get("seed", 0)
+    for block in range(plan["blocks"]):
+        yield from block_rows(plan, seed, block)
+
+
+def generate_transactions(finance_manager, config):
+    return finance_manager.add_transactions(generate_rows(finance_manager, config))
+
+
+def _block_transactions(plan, seed, block, first_id):
+    for transaction_id, row in enumerate(block_rows(plan, seed, block), first_id):
+        yield Transaction(transaction_id, *row)
+
+
+def _write_fragment(serializer, plan, seed, block, first_id, path):
+    with open(path, "wb") as file:
+        serializer.dump_rows(_block_transactions(plan, seed, block, first_id), file)
+    return path
+
+
+def can_stream(finance_manager):
+    """Whether write_ledger() can fill the manager's data file directly."""
+    storage = finance_manager.storage
+    # A segmented directory has no single snapshot file to stream into.
+    return (
+        isinstance(storage, FileStorage)
+        and not isinstance(storage, SegmentedStorage)
+        and not finance_manager.transactions
+    )
+
+
+def write_ledger(finance_manager, config, workers=1):
+    """Stream a full snapshot of the generated rows over the manager's data file.
+
+    The manager supplies wallets, categories and tags and must not hold any
+    transactions yet. With several workers each block is encoded to its own
+    fragment file, and the fragments are joined into the snapshot in order.
+    """
+    if not can_stream(finance_manager):
+        raise ValueError("write_ledger needs an empty single-file ledger.")
+    storage = finance_manager.storage
+    serializer = storage.serializer
+    plan = build_plan(finance_manager, config)
+    seed = config.get("seed", 0)
+    sizes = [block_size(plan, seed, block) for block in range(plan["blocks"])]
+    first_ids = []
+    next_id = finance_manager.transaction_id_counter
+    for size in sizes:
+        first_ids.append(next_id)
+        next_id += size
+
+    data = {"journal_seq": storage.journal_seq}
+    data.update(finance_manager.to_dict(include_transactions=False))
+    data["transaction_id_counter"] = next_id
+    temporary_file = storage.data_file + ".tmp"
+    directory = os.path.dirname(os.path.abspath(storage.data_file))
+    try:
+        with open(temporary_file, "wb") as file:
+            if workers <= 1 or not hasattr(serializer, "dump_rows"):
+                transactions = (
+                    transaction
+                    for block in range(plan["blocks"])
+                    for transaction in _block_transactions(plan, seed, block, first_ids[block])
                 )
-        current_date += timedelta(days=1)
+                serializer.dump(data, transactions, file)
+            else:
+                file.write(serializer.header(data))
+                separator = b""
+                with tempfile.TemporaryDirectory(dir=directory) as fragments:
+                    names = [
+                        os.path.join(fragments, str(block)) for block in range(plan["blocks"])
+                    ]
+                    with ProcessPoolExecutor(workers) as pool:
+                        paths = pool.map(
+                            _write_fragment,
+                            [serializer] * plan["blocks"],
+                            [plan] * plan["blocks"],
+                            [seed] * plan["blocks"],
+                            range(plan["blocks"]),
+                            first_ids,
+                            names,
+                        )
+                        for block, path in enumerate(paths):
+                            if sizes[block]:
+                                file.write(separator)
+                                separator = b","
+                                with open(path, "rb") as fragment:
+                                    shutil.copyfileobj(fragment, file)
+                            os.remove(path)
+                file.write(b"]}")
+        os.replace(temporary_file, storage.data_file)
+    except BaseException:
+        if os.path.exists(temporary_file):
+            os.unlink(temporary_file)
+        raise
+    if storage.journal:
+        open(storage.journal_file, "w").close()
+    return next_id - finance_manager.transaction_id_counter
 
 
 def main():
     args = parse_args()
-    finance_manager = FinanceManager(data_file="finance_data.json")
+    finance_manager = FinanceManager(data_file=args.output, format=args.format)
     config = {
         "wallet_names": args.wallet_names,
         "categories": args.categories,
@@ -99,12 +312,15 @@ def main():
         "amount_range": args.amount_range,
         "start_date": args.start_date,
         "end_date": args.end_date,
+        "seed": args.seed,
     }
 
-    ensure_wallets_exist(finance_manager, config["wallet_names"])
-    generate_transactions(finance_manager, config)
-    finance_manager.save_to_file()
-    print("Test transactions generated and saved successfully.")
+    ensure_wallets_exist(finance_manager, config["wallet_names"], args.seed)
+    if can_stream(finance_manager):
+        count = write_ledger(finance_manager, config, args.workers)
+    else:
+        count = generate_transactions(finance_manager, config)
+    print(f"{count} test transactions generated and saved to {args.output}.")
 
 
 if __name__ == "__main__":
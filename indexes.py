@@ -0,0 +1,145 @@
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from datetime import date, datetime
+
+
+def date_ordinal(value):
+    try:
+        return date.fromisoformat(value).toordinal()
+    except ValueError:
+        return datetime.strptime(value, "%Y-%m-%d").toordinal()
+
+
+def iso_date(value):
+    """value as YYYY-MM-DD, padding dates such as "2024-1-5"."""
+    return date.fromordinal(date_ordinal(value)).isoformat()
+
+
+def date_key(transaction):
+    """Sort key that orders transactions by date, then by id."""
+    return (date_ordinal(transaction.date), transaction.id)
+
+
+class TransactionIndex:
+    """Secondary indexes over FinanceManager.transactions.
+
+    FinanceManager keeps its transactions list sorted by date_key, and
+    by_date holds the matching keys at the same positions so date windows
+    are found by bisection. by_id maps id -> transaction, by_wallet keeps
+    each wallet's keys sorted, and by_category maps each registry Category
+    (see categories) to the ids filed under it. by_tag is an inverted index of
+    tag -> sorted array of ids, with tag_names kept sorted for prefix lookups.
+    """
+
+    def __init__(self, transactions=()):
+        self.rebuild(transactions)
+
+    def rebuild(self, transactions):
+        """Index transactions that are already sorted by date_key."""
+        self.by_date = []
+        self.by_id = {}
+        self.by_wallet = defaultdict(list)
+        self.by_category = defaultdict(set)
+        postings = defaultdict(list)
+        for transaction in transactions:
+            key = date_key(transaction)
+            self.by_date.append(key)
+            self.by_wallet[transaction.wallet_name].append(key)
+            self._add_lookups(transaction)
+            for tag in dict.fromkeys(transaction.tags):
+                postings[tag].append(transaction.id)
+        self.by_tag = {tag: array("q", sorted(ids)) for tag, ids in postings.items()}
+        self.tag_names = sorted(self.by_tag)
+
+    def add(self, transaction):
+        """Index a transaction and return its position in date order."""
+        key = date_key(transaction)
+        position = bisect_left(self.by_date, key)
+        self.by_date.insert(position, key)
+        insort(self.by_wallet[transaction.wallet_name], key)
+        self._add_lookups(transaction)
+        for tag in dict.fromkeys(transaction.tags):
+            ids = self.by_tag.get(tag)
+            if ids is None:
+                self.by_tag[tag] = array("q", [transaction.id])
+                insort(self.tag_names, tag)
+            elif ids[-1] < transaction.id:
+                ids.append(transaction.id)
+            else:
+                insort(ids, transaction.id)
+        return position
+
+    def _add_lookups(self, transaction):
+        self.by_id[transaction.id] = transaction
+        self.by_category[transaction.category_ref].add(transaction.id)
+
+    def remove(self, transaction):
+        """Drop a transaction and return the position it had in date order."""
+        key = date_key(transaction)
+        position = bisect_left(self.by_date, key)
+        del self.by_date[position]
+        del self.by_id[transaction.id]
+        keys = self.by_wallet[transaction.wallet_name]
+        del keys[bisect_left(keys, key)]
+        for tag in dict.fromkeys(transaction.tags):
+            ids = self.by_tag[tag]
+            del ids[bisect_left(ids, transaction.id)]
+            if not ids:
+                del self.by_tag[tag]
+                del self.tag_names[bisect_left(self.tag_names, tag)]
+        self._discard(self.by_category, transaction.category_ref, transaction.id)
+        return position
+
+    def merge_category(self, source, target):
+        """File source's ids under target and return them."""
+        ids = self.by_category.pop(source, set())
+        if ids:
+            self.by_category[target] |= ids
+        return ids
+
+    def date_range(self, start=None, end=None):
+        """Slice bounds of the transactions dated between two ordinals."""
+        return self._bounds(self.by_date, start, end)
+
+    def iter_window(self, wallet_name=None, start=None, end=None, after=None, descending=False):
+        """Lazily yield transactions between two date ordinals in date order.
+
+        after is an (ordinal, id) key: only transactions past it in the
+        chosen direction are yielded. Positions are fixed when iteration
+        starts, so resume from a key rather than mutating mid-iteration.
+        """
+        keys = self.by_date if wallet_name is None else self.by_wallet.get(wallet_name, [])
+        low, high = self._bounds(keys, start, end)
+        if after is not None:
+            if descending:
+                high = min(high, bisect_left(keys, after))
+            else:
+                low = max(low, bisect_right(keys, after))
+        positions = range(high - 1, low - 1, -1) if descending else range(low, high)
+        for position in positions:
+            yield self.by_id[keys[position][1]]
+
+    def tagged(self, tag):
+        return [self.by_id[transaction_id] for transaction_id in self.by_tag.get(tag, ())]
+
+    def tags_with_prefix(self, prefix):
+        names = self.tag_names
+        position = bisect_left(names, prefix)
+        while position < len(names) and names[position].startswith(prefix):
+            yield names[position]
+            position += 1
+
+    @staticmethod
+    def _bounds(keys, start, end):
+        low = 0 if start is None else bisect_left(keys, (start,))
+        high = len(keys) if end is None else bisect_left(keys, (end + 1,))
+        return low, high
+
+    @staticmethod
+    def _discard(index, key, transaction_id):
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(transaction_id)
+            if not ids:
+                del index[key]
@@ -0,0 +1,118 @@
+"""Opt-in timing of FinanceManager's public methods.
+
+Set FINANCE_MANAGER_STATS=1 and every FinanceManager created afterwards
+records, per public method, the number of calls, their cumulative, p50 and
+p99 latency, the bytes its storage wrote and the rows involved. Times are
+inclusive: a method calling another instrumented method counts both.
+"""
+import inspect
+import os
+import threading
+import time
+from array import array
+from collections.abc import Sized
+from functools import wraps
+
+ENV_VAR = "FINANCE_MANAGER_STATS"
+
+
+def stats_enabled():
+    return os.getenv(ENV_VAR, "").lower() not in ("", "0", "false", "no")
+
+
+class MethodStats:
+    __slots__ = ("calls", "seconds", "latencies", "bytes_written", "rows")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.latencies = array("d")
+        self.bytes_written = 0
+        self.rows = 0
+
+    def percentile(self, fraction):
+        latencies = sorted(self.latencies)
+        return latencies[min(int(len(latencies) * fraction), len(latencies) - 1)]
+
+
+class Stats:
+    """MethodStats by method name, safe to update from several threads."""
+
+    def __init__(self):
+        self.methods = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, bytes_written=0, rows=0):
+        with self._lock:
+            method = self.methods.get(name)
+            if method is None:
+                method = self.methods[name] = MethodStats()
+            method.calls += 1
+            method.seconds += seconds
+            method.latencies.append(seconds)
+            method.bytes_written += bytes_written
+            method.rows += rows
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                name: {
+                    "calls": method.calls,
+                    "total_ms": method.seconds * 1000,
+                    "p50_ms": method.percentile(0.5) * 1000,
+                    "p99_ms": method.percentile(0.99) * 1000,
+                    "bytes_written": method.bytes_written,
+                    "rows": method.rows,
+                }
+                for name, method in self.methods.items()
+            }
+
+    def report(self):
+        """A table of every recorded method, slowest cumulative time first."""
+        rows = sorted(self.as_dict().items(), key=lambda item: -item[1]["total_ms"])
+        lines = [
+            f"{'method':<24}{'calls':>8}{'total ms':>12}{'p50 ms':>10}{'p99 ms':>10}"
+            f"{'bytes':>12}{'rows':>10}"
+        ]
+        for name, method in rows:
+            lines.append(
+                f"{name:<24}{method['calls']:>8}{method['total_ms']:>12.2f}"
+                f"{method['p50_ms']:>10.3f}{method['p99_ms']:>10.3f}"
+                f"{method['bytes_written']:>12}{method['rows']:>10}"
+            )
+        return "\n".join(lines)
+
+
+def instrument(manager, stats=None):
+    """Record every call to manager's public methods in stats and return it.
+
+    Rows are the length of what a call returns when that is a collection,
+    otherwise how many transactions it added or removed.
+    """
+    stats = stats or Stats()
+    for name, member in vars(type(manager)).items():
+        if not name.startswith("_") and inspect.isfunction(member):
+            setattr(manager, name, _timed(stats, manager, name, getattr(manager, name)))
+    manager.stats = stats
+    return stats
+
+
+def _timed(stats, manager, name, method):
+    @wraps(method)
+    def timed(*args, **kwargs):
+        written = manager.storage.bytes_written
+        count = manager.transaction_count
+        result = None
+        started = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            if isinstance(result, Sized) and not isinstance(result, str):
+                rows = len(result)
+            else:
+                rows = abs(manager.transaction_count - count)
+            stats.record(name, elapsed, manager.storage.bytes_written - written, rows)
+
+    return timed
@@ -0,0 +1,521 @@
+"""Read a binary ledger file in place through mmap.
+
+    ledger = MappedLedger("finance_data.bin")
+    ledger.get_transaction(42)
+    ledger.list_transactions("Cash", "2024-01-01", "2024-01-31")
+
+Opening maps the file and reads its header, metadata and string table, but
+no transaction records: a record is unpacked from the map only when a query,
+tag search or id lookup reaches it. The file is a BinarySerializer snapshot
+(save with format="binary"); its journal (data_file + ".journal") is the
+tail segment. Its change records are overlaid on the mapped rows, and
+append() adds new transactions to it. compact() folds the tail into a fresh
+snapshot through FinanceManager.
+
+Appends are not coordinated with other writers; use a FinanceManager with
+concurrent=True when several processes change the ledger.
+"""
+import json
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+from heapq import merge
+from itertools import islice
+from operator import itemgetter
+
+from categories import CategoryRegistry
+from finance_manager import FinanceManager, Transaction
+from indexes import date_key, date_ordinal
+from serializers import TRANSACTION_TYPES, BinarySerializer
+from tag_query import TagQuery
+
+
+class MappedIndex:
+    """The TransactionIndex attributes TagQuery reads, served from a MappedLedger."""
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self.by_id = MappedIds(ledger)
+        self.by_tag = MappedPostings(ledger)
+        self._by_category = None
+
+    def tags_with_prefix(self, prefix):
+        names = self.ledger.tag_names()
+        position = bisect_left(names, prefix)
+        while position < len(names) and names[position].startswith(prefix):
+            yield names[position]
+            position += 1
+
+    @property
+    def by_category(self):
+        if self._by_category is None:
+            self._by_category = self.ledger.ids_by_category()
+        return self._by_category
+
+
+class MappedIds:
+    """id -> Transaction, decoding on access."""
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+
+    def __getitem__(self, transaction_id):
+        transaction = self.ledger.get_transaction(transaction_id)
+        if transaction is None:
+            raise KeyError(transaction_id)
+        return transaction
+
+    def __contains__(self, transaction_id):
+        return self.ledger.get_transaction(transaction_id) is not None
+
+    def __iter__(self):
+        return iter(self.ledger.ids())
+
+
+class MappedPostings:
+    """tag -> sorted array of ids, found by scanning the mapped tag codes."""
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+
+    def get(self, tag, default=None):
+        ids = self.ledger.tagged_ids(tag)
+        return ids if ids else default
+
+    def __getitem__(self, tag):
+        return self.ledger.tagged_ids(tag)
+
+
+class MappedLedger:
+    """Read-mostly access to a binary ledger without loading it.
+
+    Rows are (date, id) ordered in the file, so date windows and cursors are
+    bisections over the record keys; ids are found through the file's id
+    index, and wallet filters compare the wallet code without unpacking the
+    rest of the row. Decoded Transactions are cached by row. Rows edited or
+    deleted in the tail are hidden, and their current versions live in the
+    tail, which is kept in date order and merged into every query.
+    """
+
+    RECORD = BinarySerializer.RECORD
+    ID_ENTRY = BinarySerializer.ID_ENTRY
+    # The id and the date ordinal lead every record; the other fields are
+    # read where they sit.
+    KEY = struct.Struct("<qi")
+    CODE = struct.Struct("<I")
+    WALLET_OFFSET = struct.calcsize("<qidB")
+    TAG_START_OFFSET = struct.calcsize("<qidBIII")
+
+    def __init__(self, data_file):
+        self.data_file = data_file
+        self.journal_file = data_file + ".journal"
+        self._stamp = None
+        self.refresh()
+
+    def refresh(self):
+        """Remap the file and reread the tail if either changed on disk."""
+        stamp = (self._file_stamp(self.data_file), self._file_stamp(self.journal_file))
+        if stamp == self._stamp:
+            return
+        with open(self.data_file, "rb") as file:
+            # The map stays valid after the file is closed.
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.layout = BinarySerializer.read_layout(self._map)
+        header = BinarySerializer.HEADER.unpack_from(self._map)
+        self._tags_offset, self._tag_count = header[5], header[6]
+        self._count = self.layout.record_count
+        self._records = self.layout.records_offset
+        self._rows = range(self._count)
+        self._codes = None
+        self._decoded = {}
+
+        metadata = self.layout.metadata
+        self.wallets = set(metadata.get("wallets", {}))
+        self.categories = CategoryRegistry(
+            FinanceManager.PREDEFINED_CATEGORIES, metadata.get("custom_categories")
+        )
+        # Row names are the names at snapshot time, which tail renames change.
+        self._snapshot_categories = {
+            (transaction_type, name): category
+            for transaction_type, names in self.categories.active.items()
+            for name, category in names.items()
+        }
+        self._moved = {}
+        self.tail = []
+        self._tail_by_id = {}
+        self.hidden = set()
+        self.journal_seq = metadata.get("journal_seq", 0)
+        last_id = self._id_entry(self._count - 1)[0] if self._count else 0
+        self.next_id = metadata.get("transaction_id_counter", last_id + 1)
+        self._read_tail()
+        self._changed()
+        self._stamp = (self._file_stamp(self.data_file), self._file_stamp(self.journal_file))
+
+    @staticmethod
+    def _file_stamp(path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def _read_tail(self):
+        try:
+            file = open(self.journal_file, "rb")
+        except FileNotFoundError:
+            return
+        with file:
+            valid_size = 0
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                valid_size += len(line)
+                # Records up to journal_seq are already in the snapshot.
+                if record["seq"] > self.journal_seq:
+                    self._apply(record)
+                    self.journal_seq = record["seq"]
+            torn = valid_size < os.fstat(file.fileno()).st_size
+        if torn:
+            # As FileStorage does, so appends start on a fresh line.
+            os.truncate(self.journal_file, valid_size)
+
+    def _apply(self, record):
+        op = record["op"]
+        if op == "batch":
+            for batched_record in record["records"]:
+                self._apply(batched_record)
+        elif op == "add_wallet":
+            self.wallets.add(record["wallet"]["name"])
+        elif op == "add_transaction":
+            transaction = Transaction.from_dict(record["transaction"])
+            self._track(transaction)
+            self.next_id = max(self.next_id, transaction.id + 1)
+        elif op == "edit_transaction":
+            transaction = self.get_transaction(record["id"])
+            if transaction is not None:
+                self._untrack(transaction)
+                for key, value in record["updates"].items():
+                    setattr(transaction, key, value)
+                self._track(transaction)
+        elif op == "delete_transaction":
+            transaction = self.get_transaction(record["id"])
+            if transaction is not None:
+                self._untrack(transaction)
+        elif op == "add_custom_category":
+            self.categories.add(record["transaction_type"], record["category"])
+        elif op == "edit_custom_category":
+            # Decoded rows hold the registry Category, so they follow the rename.
+            self.categories.rename(
+                record["transaction_type"], record["old_category"], record["new_category"]
+            )
+        elif op == "delete_custom_category":
+            transaction_type = record["transaction_type"]
+            category = self.categories.delete(transaction_type, record["category"])
+            if "reassign_to" in record:
+                target = self.categories.get(transaction_type, record["reassign_to"])
+                for source, moved_to in self._moved.items():
+                    if moved_to is category:
+                        self._moved[source] = target
+                self._moved[category] = target
+                for transaction in list(self._decoded.values()) + self.tail:
+                    if transaction.category_ref is category:
+                        transaction.category_ref = target
+
+    def _track(self, transaction):
+        transaction.category_ref = self.categories.resolve(
+            transaction.transaction_type, transaction.category
+        )
+        insort(self.tail, transaction, key=date_key)
+        self._tail_by_id[transaction.id] = transaction
+
+    def _untrack(self, transaction):
+        if self._tail_by_id.pop(transaction.id, None) is not None:
+            position = bisect_left(self.tail, date_key(transaction), key=date_key)
+            del self.tail[position]
+        if self._row_of(transaction.id) is not None:
+            self.hidden.add(transaction.id)
+
+    def _changed(self):
+        self._postings = {}
+        self._tag_names = None
+        self.index = MappedIndex(self)
+
+    def __len__(self):
+        return self._count - len(self.hidden) + len(self.tail)
+
+    def _code(self, value):
+        if self._codes is None:
+            self._codes = {string: code for code, string in enumerate(self.layout.strings)}
+        return self._codes.get(value)
+
+    def _offset(self, row):
+        return self._records + row * self.RECORD.size
+
+    def _key(self, row):
+        transaction_id, ordinal = self.KEY.unpack_from(self._map, self._offset(row))
+        return (ordinal, transaction_id)
+
+    def _id_entry(self, position):
+        return self.ID_ENTRY.unpack_from(
+            self._map, self.layout.id_index_offset + position * self.ID_ENTRY.size
+        )
+
+    def _row_of(self, transaction_id):
+        position = bisect_left(self._rows, transaction_id, key=lambda p: self._id_entry(p)[0])
+        if position < self._count:
+            entry_id, row = self._id_entry(position)
+            if entry_id == transaction_id:
+                return row
+        return None
+
+    def _transaction(self, row):
+        transaction = self._decoded.get(row)
+        if transaction is None:
+            record = self.RECORD.unpack_from(self._map, self._offset(row))
+            transaction_id, ordinal, amount, type_code, wallet, category, currency = record[:7]
+            tag_start, tag_count = record[7:]
+            strings = self.layout.strings
+            tags = self.layout.tag_codes[tag_start : tag_start + tag_count]
+            transaction_type = TRANSACTION_TYPES[type_code]
+            transaction = Transaction(
+                transaction_id,
+                strings[wallet],
+                transaction_type,
+                strings[category],
+                amount,
+                strings[currency],
+                date.fromordinal(ordinal).isoformat(),
+                [strings[code] for code in tags],
+            )
+            transaction.category_ref = self._category(transaction_type, strings[category])
+            self._decoded[row] = transaction
+        return transaction
+
+    def _category(self, transaction_type, name):
+        category = self._snapshot_categories.get((transaction_type, name))
+        if category is None:
+            category = self.categories.resolve(transaction_type, name)
+        return self._moved.get(category, category)
+
+    def get_transaction(self, transaction_id):
+        transaction = self._tail_by_id.get(transaction_id)
+        if transaction is not None or transaction_id in self.hidden:
+            return transaction
+        row = self._row_of(transaction_id)
+        return None if row is None else self._transaction(row)
+
+    def ids(self):
+        """Every current transaction id, ascending."""
+        hidden = self.hidden
+        mapped = (
+            entry_id
+            for entry_id, _ in self.ID_ENTRY.iter_unpack(self._id_index())
+            if entry_id not in hidden
+        )
+        return list(merge(mapped, sorted(self._tail_by_id)))
+
+    def _id_index(self):
+        start = self.layout.id_index_offset
+        return self.layout.view[start : start + self._count * self.ID_ENTRY.size]
+
+    def query_transactions(
+        self,
+        wallet_name=None,
+        start_date=None,
+        end_date=None,
+        after=None,
+        descending=False,
+        limit=None,
+    ):
+        """FinanceManager.query_transactions over the mapped rows and the tail."""
+        start = start_date and date_ordinal(start_date)
+        end = end_date and date_ordinal(end_date)
+        if after is not None:
+            after = (date_ordinal(after[0]), after[1])
+        keyed = merge(
+            self._mapped_window(wallet_name, start, end, after, descending),
+            self._tail_window(wallet_name, start, end, after, descending),
+            key=itemgetter(0),
+            reverse=descending,
+        )
+        transactions = (
+            item if isinstance(item, Transaction) else self._transaction(item)
+            for _, item in keyed
+        )
+        return islice(transactions, limit)
+
+    def _mapped_window(self, wallet_name, start, end, after, descending):
+        """(key, row) for the visible rows in the window, in key order."""
+        rows, key = self._rows, self._key
+        low = 0 if not start else bisect_left(rows, (start,), key=key)
+        high = self._count if not end else bisect_left(rows, (end + 1,), key=key)
+        if after is not None:
+            if descending:
+                high = min(high, bisect_left(rows, after, key=key))
+            else:
+                low = max(low, bisect_right(rows, after, key=key))
+        wallet = None
+        if wallet_name is not None:
+            wallet = self._code(wallet_name)
+            if wallet is None:
+                return
+        hidden = self.hidden
+        unpack_code = self.CODE.unpack_from
+        for row in range(high - 1, low - 1, -1) if descending else range(low, high):
+            row_key = key(row)
+            if row_key[1] in hidden:
+                continue
+            if wallet is not None:
+                if unpack_code(self._map, self._offset(row) + self.WALLET_OFFSET)[0] != wallet:
+                    continue
+            yield row_key, row
+
+    def _tail_window(self, wallet_name, start, end, after, descending):
+        for transaction in reversed(self.tail) if descending else self.tail:
+            key = date_key(transaction)
+            if start and key[0] < start or end and key[0] > end:
+                continue
+            if after is not None and (key <= after if not descending else key >= after):
+                continue
+            if wallet_name is None or transaction.wallet_name == wallet_name:
+                yield key, transaction
+
+    def list_transactions(self, wallet_name=None, start_date=None, end_date=None):
+        return list(self.query_transactions(wallet_name, start_date, end_date))
+
+    def tagged_ids(self, tag):
+        """Sorted array of the ids of the current transactions tagged tag.
+
+        The tag codes of every row are one contiguous array in the file, so
+        the rows are found by searching the map for the tag's code and
+        bisecting each hit back to the row whose tag slice holds it.
+        """
+        ids = self._postings.get(tag)
+        if ids is not None:
+            return ids
+        found = set()
+        code = self._code(tag)
+        if code is not None:
+            needle = self.CODE.pack(code)
+            start = self._tags_offset
+            end = start + self.CODE.size * self._tag_count
+            position = self._map.find(needle, start, end)
+            row = 0
+            while position != -1:
+                if (position - start) % self.CODE.size:
+                    # The bytes straddle two codes.
+                    position = self._map.find(needle, position + 1, end)
+                    continue
+                tag_position = (position - start) // self.CODE.size
+                # Hits come in row order, so each search starts at the last row.
+                row = bisect_right(self._rows, tag_position, row, key=self._tag_start) - 1
+                transaction_id = self._key(row)[1]
+                if transaction_id not in self.hidden:
+                    found.add(transaction_id)
+                position = self._map.find(needle, position + self.CODE.size, end)
+        found.update(t.id for t in self.tail if tag in t.tags)
+        ids = self._postings[tag] = array("q", sorted(found))
+        return ids
+
+    def _tag_start(self, row):
+        return self.CODE.unpack_from(self._map, self._offset(row) + self.TAG_START_OFFSET)[0]
+
+    def tag_names(self):
+        if self._tag_names is None:
+            strings = self.layout.strings
+            names = {strings[code] for code in set(self.layout.tag_codes)}
+            names.update(tag for transaction in self.tail for tag in transaction.tags)
+            self._tag_names = sorted(names)
+        return self._tag_names
+
+    def ids_by_category(self):
+        """{registry Category: set of ids}, read from every row."""
+        by_category = {}
+        categories = {}
+        strings = self.layout.strings
+        hidden = self.hidden
+        for record in self.layout.records():
+            if record[0] in hidden:
+                continue
+            key = (record[3], record[5])
+            category = categories.get(key)
+            if category is None:
+                category = categories[key] = self._category(
+                    TRANSACTION_TYPES[key[0]], strings[key[1]]
+                )
+            by_category.setdefault(category, set()).add(record[0])
+        for transaction in self.tail:
+            by_category.setdefault(transaction.category_ref, set()).add(transaction.id)
+        return by_category
+
+    def tagged(self, tag):
+        return [self.get_transaction(transaction_id) for transaction_id in self.tagged_ids(tag)]
+
+    def search_transactions(
+        self,
+        query,
+        transaction_type=None,
+        category=None,
+        start_date=None,
+        end_date=None,
+    ):
+        """FinanceManager.search_transactions over the mapped rows and the tail."""
+        return TagQuery(self.index).search(
+            query, transaction_type, category, start_date, end_date
+        )
+
+    def search_expenses_by_tag(self, tag):
+        return [
+            transaction.to_dict()["transaction_data"]
+            for transaction in self.tagged(tag)
+            if transaction.transaction_type == "expense"
+        ]
+
+    def append(
+        self,
+        wallet_name,
+        transaction_type,
+        category,
+        amount,
+        currency,
+        date=None,
+        tags=None,
+    ):
+        """Add a transaction to the tail and return its id.
+
+        Takes FinanceManager.add_transaction's arguments and, like it, adds
+        nothing (returning None) for an unknown wallet or category.
+        """
+        if wallet_name not in self.wallets:
+            return None
+        if self.categories.get(transaction_type, category) is None:
+            return None
+        transaction = Transaction(
+            self.next_id, wallet_name, transaction_type, category, amount, currency, date, tags
+        )
+        record = {
+            "op": "add_transaction",
+            "transaction": transaction.to_dict(),
+            "seq": self.journal_seq + 1,
+        }
+        with open(self.journal_file, "a") as file:
+            file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.journal_seq += 1
+        self.next_id += 1
+        self._track(transaction)
+        self._changed()
+        self._stamp = (self._stamp[0], self._file_stamp(self.journal_file))
+        return transaction.id
+
+    def compact(self):
+        """Fold the tail into a fresh binary snapshot and map that."""
+        manager = FinanceManager(data_file=self.data_file, journal=True, format="binary")
+        manager.save_to_file()
+        self.refresh()
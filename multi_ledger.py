@@ -0,0 +1,115 @@
+"""Month-end reporting across several ledgers at once.
+
+    python multi_ledger.py household.json business/ --workers 4 --group_by ledger,month
+
+Each ledger is loaded and aggregated in its own worker process, which sends
+back only its aggregate cells and tag counts; the parent merges them.
+"""
+import argparse
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from finance_manager import FinanceManager
+from reports import GROUP_FIELDS, group_cells, normalize_month
+
+LEDGER_FIELDS = ("ledger",) + GROUP_FIELDS
+
+
+def ledger_partial(data_file, journal=False):
+    """Load one ledger and reduce it to ({cell key: [total, count, min, max]}, {tag: count}).
+
+    Cell keys are (wallet, transaction_type, category, month, currency)
+    tuples of plain strings, so the partial pickles in a few kilobytes
+    however long the ledger is.
+    """
+    manager = FinanceManager(data_file=data_file, journal=journal)
+    cells = {
+        (key[0], key[1], key[2].name) + key[3:]: list(cell)
+        for key, cell in manager.aggregates.items()
+    }
+    tags = {tag: len(ids) for tag, ids in manager.index.by_tag.items()}
+    return cells, tags
+
+
+class LedgerAnalytics:
+    """Aggregates of several ledgers, merged cell by cell."""
+
+    def __init__(self):
+        self.cells = {}
+        self.tags = {}
+
+    def merge(self, ledger, partial):
+        cells, tags = partial
+        for key, cell in cells.items():
+            self.cells[(ledger,) + key] = cell
+        self.tags[ledger] = Counter(tags)
+
+    def summarize(self, group_by=("ledger", "category", "month"), start=None, end=None):
+        """Like reports.summarize, with "ledger" as one more field to group by."""
+        unknown = set(group_by) - set(LEDGER_FIELDS)
+        if unknown:
+            raise ValueError(f"Cannot group by {', '.join(sorted(unknown))}.")
+        start, end = normalize_month(start), normalize_month(end)
+        cells = [
+            (key, cell)
+            for key, cell in self.cells.items()
+            if not (start and key[4] < start) and not (end and key[4] > end)
+        ]
+        return group_cells(cells, group_by, LEDGER_FIELDS)
+
+    def tag_counts(self, ledger=None):
+        """Transactions per tag in one ledger, or in all of them."""
+        if ledger is not None:
+            return self.tags[ledger]
+        return sum(self.tags.values(), Counter())
+
+
+def analyze_ledgers(data_files, workers=None, journal=False):
+    """Aggregate every data file, on up to workers processes (1 runs in this one)."""
+    data_files = list(data_files)
+    if workers == 1 or len(data_files) < 2:
+        partials = [ledger_partial(data_file, journal) for data_file in data_files]
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            partials = list(
+                pool.map(ledger_partial, data_files, [journal] * len(data_files))
+            )
+    analytics = LedgerAnalytics()
+    for data_file, partial in zip(data_files, partials):
+        analytics.merge(data_file, partial)
+    return analytics
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize several Finance Manager ledgers")
+    parser.add_argument("data_files", nargs="+", help="Data files or segmented ledger directories")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--journal", action="store_true", help="The ledgers use journals")
+    parser.add_argument(
+        "--group_by",
+        default="ledger,category,month",
+        help=f"Comma-separated fields from {', '.join(LEDGER_FIELDS)}",
+    )
+    parser.add_argument("--start", help="First month (YYYY-MM)")
+    parser.add_argument("--end", help="Last month (YYYY-MM)")
+    parser.add_argument("--top_tags", type=int, default=10, help="How many tags to list")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    group_by = [field.strip() for field in args.group_by.split(",")]
+    analytics = analyze_ledgers(args.data_files, args.workers, args.journal)
+    for row in analytics.summarize(group_by, args.start, args.end):
+        group = " | ".join(str(row[field]) for field in group_by)
+        print(
+            f"{group}: Total {row['total']:.2f} | Count {row['count']} "
+            f"| Min {row['min']:.2f} | Max {row['max']:.2f}"
+        )
+    for tag, count in analytics.tag_counts().most_common(args.top_tags):
+        print(f"Tag {tag}: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Historical exchange rates and currency conversion.
+
+Rates are read from a CSV file with date,base,quote,rate columns (1 base
+buys rate quote) or from a JSON file shaped like
+{"base": "USD", "rates": {"2024-01-01": {"EUR": 0.91, ...}, ...}}. The rate
+for a date is the latest one published on or before it. Pairs without a
+direct or inverse series are converted through a currency both sides share.
+"""
+import csv
+import json
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import date
+from functools import lru_cache
+
+from indexes import date_ordinal
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+SYMBOLS = {"USD": "$"}
+
+
+def format_amount(amount, currency):
+    symbol = SYMBOLS.get(currency)
+    return f"{symbol}{amount:.2f}" if symbol else f"{amount:.2f} {currency}"
+
+
+class RateTable:
+    """Date-indexed rate series per currency pair, with cached lookups.
+
+    Each series keeps its dates as sorted ordinals next to the rates, so a
+    lookup is one bisection; rate() memoises (from, to, date) results in an
+    LRU cache of cache_size entries.
+    """
+
+    def __init__(self, rows=(), cache_size=65536):
+        pending = defaultdict(dict)
+        for day, base, quote, rate in rows:
+            ordinal = day if isinstance(day, int) else date_ordinal(day)
+            pending[(base.upper(), quote.upper())][ordinal] = float(rate)
+        self.series = {}
+        self.neighbours = defaultdict(set)
+        for (base, quote), rates in pending.items():
+            ordinals = sorted(rates)
+            self.series[(base, quote)] = (ordinals, [rates[day] for day in ordinals])
+            self.neighbours[base].add(quote)
+            self.neighbours[quote].add(base)
+        self.rate = lru_cache(maxsize=cache_size)(self._rate)
+
+    @classmethod
+    def from_file(cls, path, cache_size=65536):
+        with open(path, newline="") as file:
+            if path.endswith(".json"):
+                data = json.load(file)
+                base = data["base"]
+                rows = [
+                    (day, base, quote, rate)
+                    for day, quotes in data["rates"].items()
+                    for quote, rate in quotes.items()
+                ]
+            else:
+                rows = [
+                    (row["date"], row["base"], row["quote"], row["rate"])
+                    for row in csv.DictReader(file)
+                ]
+        return cls(rows, cache_size)
+
+    def _rate(self, from_currency, to_currency, day):
+        """How many to_currency one from_currency bought on day (YYYY-MM-DD)."""
+        ordinal = date_ordinal(day)
+        rate = 1.0
+        for pair in self._path(from_currency, to_currency):
+            rate *= self._lookup(pair, [ordinal])[0]
+        return rate
+
+    def convert(self, amount, from_currency, to_currency, day):
+        if from_currency == to_currency:
+            return amount
+        return amount * self.rate(from_currency, to_currency, day)
+
+    def convert_all(self, transactions, to_currency):
+        """Every transaction's amount in to_currency, in order.
+
+        Rows are grouped by currency and each group's dates are looked up in
+        one pass: with numpy a searchsorted over the whole group, otherwise
+        through the cached per-date rates.
+        """
+        transactions = list(transactions)
+        converted = [t.amount for t in transactions]
+        groups = defaultdict(list)
+        for position, transaction in enumerate(transactions):
+            if transaction.currency != to_currency:
+                groups[transaction.currency].append(position)
+        for currency, positions in groups.items():
+            if numpy is None:
+                rate = self.rate
+                for position in positions:
+                    converted[position] *= rate(
+                        currency, to_currency, transactions[position].date
+                    )
+                continue
+            ordinals = numpy.array([date_ordinal(transactions[p].date) for p in positions])
+            rates = numpy.ones(len(positions))
+            for pair in self._path(currency, to_currency):
+                rates *= self._lookup(pair, ordinals)
+            amounts = numpy.array([converted[p] for p in positions]) * rates
+            for position, amount in zip(positions, amounts.tolist()):
+                converted[position] = amount
+        return converted
+
+    def _path(self, from_currency, to_currency):
+        """The pairs to chain for a conversion: direct, inverse or via one other currency."""
+        if self._has_pair(from_currency, to_currency):
+            return [(from_currency, to_currency)]
+        for middle in sorted(self.neighbours[from_currency] & self.neighbours[to_currency]):
+            return [(from_currency, middle), (middle, to_currency)]
+        raise ValueError(f"No exchange rate from {from_currency} to {to_currency}.")
+
+    def _has_pair(self, base, quote):
+        return (base, quote) in self.series or (quote, base) in self.series
+
+    def _lookup(self, pair, ordinals):
+        """Rates of one pair in effect on each ordinal."""
+        inverse = pair not in self.series
+        days, rates = self.series[pair[::-1] if inverse else pair]
+        if numpy is not None and not isinstance(ordinals, list):
+            positions = numpy.searchsorted(days, ordinals, side="right") - 1
+            if (positions < 0).any():
+                self._missing(pair, int(ordinals[positions < 0][0]))
+            found = numpy.asarray(rates)[positions]
+            return 1.0 / found if inverse else found
+        found = []
+        for ordinal in ordinals:
+            position = bisect_right(days, ordinal) - 1
+            if position < 0:
+                self._missing(pair, ordinal)
+            found.append(1.0 / rates[position] if inverse else rates[position])
+        return found
+
+    @staticmethod
+    def _missing(pair, ordinal):
+        raise ValueError(
+            f"No {pair[0]} to {pair[1]} rate on or before {date.fromordinal(ordinal)}."
+        )
@@ -0,0 +1,154 @@
+from datetime import datetime
+
+from storage import transaction_month
+
+GROUP_FIELDS = ("wallet", "transaction_type", "category", "month", "currency")
+
+
+def cube_key(transaction):
+    return (
+        transaction.wallet_name,
+        transaction.transaction_type,
+        transaction.category_ref,
+        transaction_month(transaction),
+        transaction.currency,
+    )
+
+
+class AggregateCube:
+    """sum, count, min and max per (wallet, type, Category, YYYY-MM, currency) cell.
+
+    Adds update a cell in O(1). Removing a cell's current min or max marks
+    it stale, and the next read rescans only that cell's transactions via
+    cell_transactions(key).
+    """
+
+    def __init__(self, cell_transactions):
+        self.cells = {}
+        self.stale = set()
+        self.cell_transactions = cell_transactions
+
+    def add(self, transaction):
+        key = cube_key(transaction)
+        cell = self.cells.get(key)
+        amount = transaction.amount
+        if cell is None:
+            self.cells[key] = [amount, 1, amount, amount]
+        else:
+            cell[0] += amount
+            cell[1] += 1
+            cell[2] = min(cell[2], amount)
+            cell[3] = max(cell[3], amount)
+
+    def add_cell(self, key, total, count, minimum, maximum):
+        """Add a cell summed up elsewhere, e.g. by a storage that keeps rows on disk."""
+        self.cells[key] = [total, count, minimum, maximum]
+
+    def remove(self, transaction):
+        key = cube_key(transaction)
+        cell = self.cells[key]
+        if cell[1] == 1:
+            del self.cells[key]
+            self.stale.discard(key)
+            return
+        cell[0] -= transaction.amount
+        cell[1] -= 1
+        if transaction.amount in (cell[2], cell[3]):
+            self.stale.add(key)
+
+    def merge_category(self, source, target):
+        """Fold the cells of one category into another's."""
+        for key in [key for key in self.cells if key[2] is source]:
+            cell = self.cells.pop(key)
+            new_key = (key[0], key[1], target) + key[3:]
+            into = self.cells.get(new_key)
+            if into is None:
+                self.cells[new_key] = cell
+            else:
+                into[0] += cell[0]
+                into[1] += cell[1]
+                into[2] = min(into[2], cell[2])
+                into[3] = max(into[3], cell[3])
+            if key in self.stale:
+                self.stale.remove(key)
+                self.stale.add(new_key)
+
+    def items(self):
+        for key in self.stale:
+            amounts = [t.amount for t in self.cell_transactions(key)]
+            self.cells[key][2:] = [min(amounts), max(amounts)]
+        self.stale.clear()
+        return self.cells.items()
+
+
+def normalize_month(value):
+    return value and datetime.strptime(value, "%Y-%m").strftime("%Y-%m")
+
+
+def summarize(
+    manager,
+    group_by=("category", "month"),
+    start=None,
+    end=None,
+    wallet=None,
+    base_currency=None,
+):
+    """Aggregate a manager's ledger by any of GROUP_FIELDS.
+
+    start and end are inclusive months (YYYY-MM). Returns one dict per group,
+    sorted by the group fields, with total, count, min and max amounts. The
+    cost depends on the number of aggregate cells, not on the ledger size.
+
+    With base_currency every amount is converted at its own date's rate from
+    manager.rates; only cells in other currencies are rescanned for that.
+    """
+    unknown = set(group_by) - set(GROUP_FIELDS)
+    if unknown:
+        raise ValueError(f"Cannot group by {', '.join(sorted(unknown))}.")
+    if base_currency and manager.rates is None:
+        raise ValueError("No exchange rates are loaded.")
+    start, end = normalize_month(start), normalize_month(end)
+
+    cells = []
+    for key, cell in manager.aggregates.items():
+        if wallet and key[0] != wallet:
+            continue
+        if (start and key[3] < start) or (end and key[3] > end):
+            continue
+        if base_currency and key[4] != base_currency:
+            amounts = manager.rates.convert_all(
+                manager.aggregates.cell_transactions(key), base_currency
+            )
+            cell = (sum(amounts), cell[1], min(amounts), max(amounts))
+        cells.append(((key[0], key[1], key[2].name) + key[3:], cell))
+    return group_cells(cells, group_by)
+
+
+def group_cells(cells, group_by, fields=GROUP_FIELDS):
+    """Merge (key, (total, count, min, max)) pairs into summarize() rows.
+
+    Keys hold one value per field of fields; rows are grouped by group_by.
+    """
+    positions = [fields.index(field) for field in group_by]
+    groups = {}
+    for key, (total, count, minimum, maximum) in cells:
+        group_key = tuple(key[position] for position in positions)
+        group = groups.get(group_key)
+        if group is None:
+            groups[group_key] = [total, count, minimum, maximum]
+        else:
+            group[0] += total
+            group[1] += count
+            group[2] = min(group[2], minimum)
+            group[3] = max(group[3], maximum)
+
+    return [
+        dict(
+            zip(group_by, group_key),
+            total=round(total, 2),
+            count=count,
+            min=minimum,
+            max=maximum,
+        )
+        for group_key, (total, count, minimum, maximum) in sorted(groups.items())
+    ]
@@ -0,0 +1,395 @@
+import io
+import json
+import re
+import struct
+from array import array
+from datetime import date
+from json.encoder import encode_basestring_ascii
+
+from indexes import date_ordinal
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+TRANSACTION_TYPES = ("expense", "income")
+ROWS_PER_WRITE = 10_000
+
+
+class JSONStream:
+    """Pull one JSON value at a time out of a file without reading all of it."""
+
+    CHUNK_SIZE = 1 << 16
+    WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+    def __init__(self, file):
+        self.file = file
+        self.buffer = ""
+        self.position = 0
+        self.decoder = json.JSONDecoder()
+
+    def _read_more(self, size=None):
+        chunk = self.file.read(size or self.CHUNK_SIZE)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.position :] + chunk
+        self.position = 0
+        return True
+
+    def peek(self):
+        while True:
+            self.position = self.WHITESPACE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._read_more():
+                raise json.JSONDecodeError("Unexpected end of data", self.buffer, self.position)
+
+    def expect(self, *chars):
+        char = self.peek()
+        if char not in chars:
+            raise json.JSONDecodeError(
+                f"Expecting {' or '.join(map(repr, chars))}", self.buffer, self.position
+            )
+        self.position += 1
+        return char
+
+    def value(self):
+        self.peek()
+        size = self.CHUNK_SIZE
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if not self._read_more(size):
+                    raise
+                size *= 2
+                continue
+            # A number that ends the buffer may continue in the next chunk.
+            if end == len(self.buffer) and self._read_more(size):
+                continue
+            self.position = end
+            return value
+
+    def array_items(self):
+        self.expect("[")
+        if self.peek() == "]":
+            self.position += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(",", "]") == "]":
+                return
+
+
+class Serializer:
+    """Writes and reads a snapshot file.
+
+    dump() gets the snapshot without its transactions plus the transactions
+    themselves, so each format can encode rows straight from the objects.
+    load() yields transaction dicts one by one and fills data with the rest.
+    Both work on binary file objects.
+    """
+
+    def dump(self, data, transactions, file):
+        raise NotImplementedError
+
+    def load(self, file, data):
+        raise NotImplementedError
+
+
+class PrettyJSONSerializer(Serializer):
+    """The original indent=4 layout, built from Transaction.to_dict()."""
+
+    def dump(self, data, transactions, file):
+        data = dict(data, transactions=[t.to_dict() for t in transactions])
+        file.write(json.dumps(data, indent=4).encode())
+
+    def load(self, file, data):
+        stream = JSONStream(io.TextIOWrapper(file, encoding="utf-8"))
+        try:
+            stream.expect("{")
+        except json.JSONDecodeError:
+            # An empty or unreadable file starts a new ledger.
+            return
+        if stream.peek() == "}":
+            return
+        while True:
+            key = stream.value()
+            stream.expect(":")
+            if key == "transactions":
+                yield from stream.array_items()
+            else:
+                data[key] = stream.value()
+            if stream.expect(",", "}") == "}":
+                return
+
+
+class CompactJSONSerializer(PrettyJSONSerializer):
+    """Whitespace-free JSON with each row formatted directly from its Transaction."""
+
+    ROW = (
+        '{"id":%d,"transaction_data":{"wallet_name":%s,"transaction_type":%s,'
+        '"category":%s,"amount":%r,"currency":%s,"date":%s,"tags":[%s]}}'
+    )
+
+    def dump(self, data, transactions, file):
+        file.write(self.header(data))
+        self.dump_rows(transactions, file)
+        file.write(b"]}")
+
+    def dump_rows(self, transactions, file):
+        """Write the comma-separated rows of the transactions array, nothing else.
+
+        Fragments written separately can be joined with commas into one array.
+        """
+        # Wallet, category, currency, date and tag strings repeat across rows.
+        encoded = {}
+
+        def encode(value):
+            result = encoded.get(value)
+            if result is None:
+                result = encoded[value] = encode_basestring_ascii(value)
+            return result
+
+        rows = []
+        separator = b""
+        for transaction in transactions:
+            rows.append(
+                self.ROW
+                % (
+                    transaction.id,
+                    encode(transaction.wallet_name),
+                    encode(transaction.transaction_type),
+                    encode(transaction.category),
+                    transaction.amount,
+                    encode(transaction.currency),
+                    encode(transaction.date),
+                    ",".join(map(encode, transaction.tags)),
+                )
+            )
+            if len(rows) == ROWS_PER_WRITE:
+                file.write(separator + ",".join(rows).encode())
+                separator = b","
+                rows = []
+        if rows:
+            file.write(separator + ",".join(rows).encode())
+
+    @staticmethod
+    def header(data):
+        """Everything before the first row: the snapshot data and the array opener."""
+        header = json.dumps(data, separators=(",", ":"))[:-1]
+        return (header + (',"transactions":[' if data else '"transactions":[')).encode()
+
+
+class OrjsonSerializer(CompactJSONSerializer):
+    """Compact JSON encoded by orjson, a chunk of rows at a time.
+
+    The chunks hold the Transactions themselves: orjson calls the default
+    hook for each one as it reaches it, so a row's dict only lives while
+    that row is encoded.
+    """
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("The orjson format needs the orjson package installed.")
+
+    @staticmethod
+    def header(data):
+        header = orjson.dumps(data)[:-1]
+        return header + (b',"transactions":[' if data else b'"transactions":[')
+
+    @staticmethod
+    def _row(transaction):
+        return transaction.to_dict()
+
+    def dump_rows(self, transactions, file):
+        chunk = []
+        separator = b""
+        for transaction in transactions:
+            chunk.append(transaction)
+            if len(chunk) == ROWS_PER_WRITE:
+                file.write(separator + orjson.dumps(chunk, default=self._row)[1:-1])
+                separator = b","
+                chunk = []
+        if chunk:
+            file.write(separator + orjson.dumps(chunk, default=self._row)[1:-1])
+
+
+class BinarySerializer(Serializer):
+    """Fixed-width struct records plus shared string and tag tables.
+
+    Layout: HEADER, metadata (compact JSON of everything but transactions),
+    RECORD rows in ledger order, tag codes, string offsets and UTF-8 string
+    blob, and an id index of (id, row) pairs sorted by id. Records hold a
+    date ordinal, codes into the string table and a slice of the tag codes.
+    """
+
+    MAGIC = b"FMLEDGR1"
+    HEADER = struct.Struct("<8s10Q")
+    RECORD = struct.Struct("<qidBIIIIH")
+    ID_ENTRY = struct.Struct("<qI")
+
+    def dump(self, data, transactions, file):
+        start = file.tell()
+        file.write(bytes(self.HEADER.size))
+        metadata = json.dumps(data, separators=(",", ":")).encode()
+        file.write(metadata)
+        self._align(file, start)
+        records_offset = file.tell() - start
+
+        strings = {}
+        tag_codes = array("I")
+        ids = array("q")
+        pack = self.RECORD.pack
+
+        def code(value):
+            result = strings.get(value)
+            if result is None:
+                result = strings[value] = len(strings)
+            return result
+
+        rows = []
+        for transaction in transactions:
+            ids.append(transaction.id)
+            tag_start = len(tag_codes)
+            tag_codes.extend(map(code, transaction.tags))
+            rows.append(
+                pack(
+                    transaction.id,
+                    date_ordinal(transaction.date),
+                    transaction.amount,
+                    TRANSACTION_TYPES.index(transaction.transaction_type),
+                    code(transaction.wallet_name),
+                    code(transaction.category),
+                    code(transaction.currency),
+                    tag_start,
+                    len(transaction.tags),
+                )
+            )
+            if len(rows) == ROWS_PER_WRITE:
+                file.write(b"".join(rows))
+                rows = []
+        file.write(b"".join(rows))
+
+        self._align(file, start)
+        tags_offset = file.tell() - start
+        file.write(tag_codes.tobytes())
+        strings_offset = file.tell() - start
+        blobs = [value.encode() for value in strings]
+        offsets = array("I", [0])
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+        file.write(offsets.tobytes())
+        file.write(b"".join(blobs))
+        id_index_offset = file.tell() - start
+        for row in sorted(range(len(ids)), key=ids.__getitem__):
+            file.write(self.ID_ENTRY.pack(ids[row], row))
+        end = file.tell()
+
+        file.seek(start)
+        file.write(
+            self.HEADER.pack(
+                self.MAGIC,
+                len(ids),
+                self.HEADER.size,
+                len(metadata),
+                records_offset,
+                tags_offset,
+                len(tag_codes),
+                strings_offset,
+                len(strings),
+                id_index_offset,
+                0,
+            )
+        )
+        file.seek(end)
+
+    @staticmethod
+    def _align(file, start):
+        # Keep the array sections aligned so they can be cast in place.
+        file.write(bytes(-(file.tell() - start) % 8))
+
+    def load(self, file, data):
+        layout = self.read_layout(file.read())
+        data.update(layout.metadata)
+        strings = layout.strings
+        tag_codes = layout.tag_codes
+        for record in layout.records():
+            transaction_id, ordinal, amount, type_code, wallet, category, currency = record[:7]
+            tag_start, tag_count = record[7:]
+            tags = tag_codes[tag_start : tag_start + tag_count]
+            yield {
+                "id": transaction_id,
+                "transaction_data": {
+                    "wallet_name": strings[wallet],
+                    "transaction_type": TRANSACTION_TYPES[type_code],
+                    "category": strings[category],
+                    "amount": amount,
+                    "currency": strings[currency],
+                    "date": date.fromordinal(ordinal).isoformat(),
+                    "tags": [strings[code] for code in tags],
+                },
+            }
+
+    @classmethod
+    def read_layout(cls, buffer):
+        return BinaryLayout(cls, buffer)
+
+
+class BinaryLayout:
+    """Section views over a BinarySerializer file held in any buffer."""
+
+    def __init__(self, serializer, buffer):
+        view = memoryview(buffer)
+        (
+            magic,
+            self.record_count,
+            metadata_offset,
+            metadata_length,
+            self.records_offset,
+            tags_offset,
+            tag_count,
+            strings_offset,
+            string_count,
+            self.id_index_offset,
+            _,
+        ) = serializer.HEADER.unpack_from(view)
+        if magic != serializer.MAGIC:
+            raise ValueError("Not a binary ledger file.")
+        self.serializer = serializer
+        self.view = view
+        metadata_end = metadata_offset + metadata_length
+        self.metadata = json.loads(bytes(view[metadata_offset:metadata_end]))
+        self.tag_codes = view[tags_offset : tags_offset + 4 * tag_count].cast("I")
+        offsets = view[strings_offset : strings_offset + 4 * (string_count + 1)].cast("I")
+        blob = bytes(view[strings_offset + 4 * len(offsets) : self.id_index_offset])
+        self.strings = [
+            blob[offsets[code] : offsets[code + 1]].decode() for code in range(string_count)
+        ]
+
+    def records(self):
+        size = self.serializer.RECORD.size
+        end = self.records_offset + size * self.record_count
+        return self.serializer.RECORD.iter_unpack(self.view[self.records_offset : end])
+
+
+SERIALIZERS = {
+    "pretty": PrettyJSONSerializer,
+    "compact": CompactJSONSerializer,
+    "orjson": OrjsonSerializer,
+    "binary": BinarySerializer,
+}
+DEFAULT_FORMAT = "orjson" if orjson is not None else "compact"
+
+
+def get_serializer(name=None):
+    return SERIALIZERS[name or DEFAULT_FORMAT]()
+
+
+def serializer_for(file):
+    """Pick the serializer that can read an open binary file, by its first bytes."""
+    magic = file.peek(len(BinarySerializer.MAGIC))[: len(BinarySerializer.MAGIC)]
+    if magic == BinarySerializer.MAGIC:
+        return BinarySerializer()
+    return PrettyJSONSerializer()
@@ -0,0 +1,288 @@
+"""Stream bank statements into a FinanceManager.
+
+A statement is a CSV file with a header row or OFX-style XML. CSV files
+need date and amount columns and may add description, type, category,
+currency, wallet and tags (separated by ";"). In XML, each <STMTTRN>
+holds DTPOSTED, TRNAMT, NAME and MEMO. Rows flow through one generator
+per stage, so a statement is read a row at a time whatever its size:
+
+    parse -> normalize -> categorize -> validate -> deduplicate -> insert
+
+Negative amounts are expenses and positive ones income, unless a type
+column says otherwise. Rows without a category column take the category
+of the first rule whose pattern matches their description. Rules come from
+a CSV file of pattern,category[,transaction_type] rows, where a pattern is
+a case-insensitive regular expression.
+
+A row counts as a duplicate if the ledger already held a transaction with
+the same wallet, date, type, amount and currency. Each existing transaction
+can match only one row, so importing a statement twice adds nothing.
+Identical rows within one statement are still kept.
+"""
+import csv
+import re
+import time
+from collections import Counter
+from datetime import date, datetime
+from xml.etree.ElementTree import iterparse
+
+AMOUNT_NOISE = re.compile(r"[^\d.+-]")
+TYPE_NAMES = {
+    "expense": "expense",
+    "debit": "expense",
+    "income": "income",
+    "credit": "income",
+}
+
+
+def statement_format(path):
+    return "ofx" if path.lower().endswith((".ofx", ".xml")) else "csv"
+
+
+def read_csv(path):
+    """(source, fields) per row, with lower-cased column names."""
+    with open(path, newline="") as file:
+        reader = csv.DictReader(file)
+        for row in reader:
+            fields = {
+                key.strip().lower(): (value or "").strip()
+                for key, value in row.items()
+                # Values past the header's columns are filed under None.
+                if key is not None
+            }
+            yield f"{path}:{reader.line_num}", fields
+
+
+def read_ofx(path):
+    """(source, fields) per <STMTTRN>, under the CSV column names."""
+    currency = ""
+    number = 0
+    parents = []
+    for event, element in iterparse(path, events=("start", "end")):
+        if event == "start":
+            parents.append(element)
+            continue
+        parents.pop()
+        tag = element.tag.upper()
+        if tag == "CURDEF":
+            currency = (element.text or "").strip()
+        elif tag == "STMTTRN":
+            number += 1
+            values = {child.tag.upper(): (child.text or "").strip() for child in element}
+            posted = values.get("DTPOSTED", "")
+            yield f"{path}:#{number}", {
+                "date": f"{posted[:4]}-{posted[4:6]}-{posted[6:8]}" if posted else "",
+                "amount": values.get("TRNAMT", ""),
+                "description": " ".join(filter(None, (values.get("NAME"), values.get("MEMO")))),
+                "currency": currency,
+            }
+            # Detach the parsed transaction so the tree never grows.
+            if parents:
+                parents[-1].remove(element)
+
+
+def parse_amount(text):
+    """A signed float from text such as "-1,234.50", "$12" or "(12.00)"."""
+    negative = text.startswith("(") and text.endswith(")")
+    amount = float(AMOUNT_NOISE.sub("", text))
+    return -amount if negative else amount
+
+
+def load_rules(path):
+    """[(compiled pattern, transaction type or None, category)] from a rules CSV."""
+    with open(path, newline="") as file:
+        return [
+            (
+                re.compile(row["pattern"], re.IGNORECASE),
+                TYPE_NAMES.get((row.get("transaction_type") or "").strip().lower()),
+                row["category"].strip(),
+            )
+            for row in csv.DictReader(file)
+        ]
+
+
+class ImportReport:
+    """Row counts and timing of one import."""
+
+    MAX_ERRORS = 20
+
+    def __init__(self):
+        self.read = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.rejected = 0
+        # (source, reason) of the first MAX_ERRORS rejected rows.
+        self.errors = []
+        self.seconds = 0.0
+
+    def reject(self, row, reason):
+        self.rejected += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append((row["source"], reason))
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.seconds if self.seconds else 0.0
+
+
+class StatementImporter:
+    """Runs statements through the import pipeline into one manager.
+
+    Rejected rows are counted and skipped. All accepted rows are added in
+    one batch, so they are persisted once. If a statement cannot be read
+    to the end, the batch is rolled back and nothing is imported. The
+    duplicate index holds one key per existing transaction, so memory
+    follows the size of the ledger, not of the statements.
+    """
+
+    def __init__(
+        self,
+        manager,
+        wallet_name=None,
+        rules=(),
+        date_format="%Y-%m-%d",
+        currency=None,
+    ):
+        self.manager = manager
+        self.wallet_name = wallet_name or manager.get_default_wallet_name()
+        self.rules = rules
+        self.date_format = date_format
+        self.currency = currency
+        self.report = ImportReport()
+
+    def run(self, paths, format=None):
+        started = time.perf_counter()
+        rows = self.parse(paths, format)
+        rows = self.normalize(rows)
+        rows = self.categorize(rows)
+        rows = self.validate(rows)
+        rows = self.deduplicate(rows)
+        self.insert(rows)
+        self.report.seconds = time.perf_counter() - started
+        return self.report
+
+    def parse(self, paths, format=None):
+        for path in paths:
+            reader = read_ofx if (format or statement_format(path)) == "ofx" else read_csv
+            for source, fields in reader(path):
+                self.report.read += 1
+                fields["source"] = source
+                yield fields
+
+    def normalize(self, rows):
+        for row in rows:
+            try:
+                day = self._parse_date(row.get("date", ""))
+            except ValueError:
+                self.report.reject(row, f"bad date {row.get('date', '')!r}")
+                continue
+            try:
+                amount = parse_amount(row.get("amount", ""))
+            except ValueError:
+                self.report.reject(row, f"bad amount {row.get('amount', '')!r}")
+                continue
+            named_type = row.get("type", "").lower()
+            if named_type:
+                transaction_type = TYPE_NAMES.get(named_type)
+                if transaction_type is None:
+                    self.report.reject(row, f"unknown type {row['type']!r}")
+                    continue
+            else:
+                transaction_type = "expense" if amount < 0 else "income"
+            wallet_name = row.get("wallet") or self.wallet_name
+            yield {
+                "source": row["source"],
+                "description": row.get("description", ""),
+                "wallet_name": wallet_name,
+                "transaction_type": transaction_type,
+                "category": row.get("category", ""),
+                "amount": abs(amount),
+                "currency": (row.get("currency") or self._currency(wallet_name)).upper(),
+                "date": day,
+                "tags": [tag.strip() for tag in row.get("tags", "").split(";") if tag.strip()],
+            }
+
+    def _parse_date(self, value):
+        try:
+            return date.fromisoformat(value).isoformat()
+        except ValueError:
+            return datetime.strptime(value, self.date_format).date().isoformat()
+
+    def _currency(self, wallet_name):
+        if self.currency:
+            return self.currency
+        wallet = self.manager.wallets.get(wallet_name)
+        return wallet.currency if wallet is not None else "USD"
+
+    def categorize(self, rows):
+        for row in rows:
+            if not row["category"]:
+                for pattern, transaction_type, category in self.rules:
+                    if transaction_type in (None, row["transaction_type"]) and pattern.search(
+                        row["description"]
+                    ):
+                        row["category"] = category
+                        break
+                else:
+                    self.report.reject(row, f"no rule matches {row['description']!r}")
+                    continue
+            yield row
+
+    def validate(self, rows):
+        categories = {
+            transaction_type: set(self.manager.list_categories(transaction_type))
+            for transaction_type in self.manager.PREDEFINED_CATEGORIES
+        }
+        for row in rows:
+            if row["wallet_name"] is None:
+                self.report.reject(row, "no wallet given and no default wallet set")
+            elif row["wallet_name"] not in self.manager.wallets:
+                self.report.reject(row, f"wallet {row['wallet_name']!r} does not exist")
+            elif row["category"] not in categories[row["transaction_type"]]:
+                self.report.reject(
+                    row, f"{row['category']!r} is not an {row['transaction_type']} category"
+                )
+            elif not row["amount"]:
+                self.report.reject(row, "amount is zero")
+            else:
+                yield row
+
+    @staticmethod
+    def duplicate_key(wallet_name, transaction_type, amount, currency, day):
+        return (wallet_name, transaction_type, round(amount, 2), currency, day)
+
+    def deduplicate(self, rows):
+        key = self.duplicate_key
+        existing = Counter(
+            key(t.wallet_name, t.transaction_type, t.amount, t.currency, t.date)
+            # Paged from disk when the storage keeps its rows there.
+            for t in self.manager.query_transactions()
+        )
+        for row in rows:
+            row_key = key(
+                row["wallet_name"],
+                row["transaction_type"],
+                row["amount"],
+                row["currency"],
+                row["date"],
+            )
+            if existing[row_key]:
+                existing[row_key] -= 1
+                self.report.duplicates += 1
+            else:
+                yield row
+
+    def insert(self, rows):
+        manager = self.manager
+        with manager.batch():
+            for row in rows:
+                manager.add_transaction(
+                    row["wallet_name"],
+                    row["transaction_type"],
+                    row["category"],
+                    row["amount"],
+                    row["currency"],
+                    row["date"],
+                    row["tags"],
+                )
+                self.report.imported += 1
@@ -0,0 +1,829 @@
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import date
+from itertools import groupby
+
+from indexes import date_ordinal
+from serializers import get_serializer, serializer_for
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class Storage:
+    """Where a FinanceManager keeps its data.
+
+    load() returns the last snapshot (in the FinanceManager.to_dict() shape)
+    plus any change records that still have to be replayed on top of it.
+    The snapshot's "transactions" may be a one-shot iterator; the rest of
+    the snapshot and the records are only complete once it is exhausted.
+    commit() persists change records produced by the manager, and save()
+    writes a full snapshot.
+
+    A concurrent storage is shared with other processes: mutations run
+    inside locked(), and poll() returns what the others committed since.
+    bytes_written counts what save() and commit() have written to files.
+
+    A storage with rows_on_disk leaves the transactions out of load(). It
+    returns "daily" (wallet, date, net amount) rows and "cells" (wallet,
+    type, category, month, currency, total, count, min, max) rows instead,
+    and answers the select_*() queries from disk. stage() lets a batch
+    write its records as they are made, ahead of the commit() that ends it.
+    """
+
+    concurrent = False
+    rows_on_disk = False
+    bytes_written = 0
+
+    @contextmanager
+    def locked(self, shared=False):
+        yield
+
+    def poll(self):
+        """Records committed elsewhere since the last load or commit, or None
+        when the whole ledger has to be reloaded."""
+        return []
+
+    def load(self):
+        raise NotImplementedError
+
+    def save(self, manager):
+        raise NotImplementedError
+
+    def commit(self, manager, records):
+        raise NotImplementedError
+
+    def stage(self, manager, records):
+        """Write records of an open batch now, if the storage can; False if
+        they have to wait for the batch's commit()."""
+        return False
+
+    def rollback(self):
+        """Drop whatever stage() wrote since the last commit()."""
+
+    def select_transactions(
+        self,
+        wallet_name=None,
+        start_date=None,
+        end_date=None,
+        tag=None,
+        transaction_type=None,
+        category=None,
+    ):
+        """Return matching transactions as dicts in id order, or None to
+        filter in memory."""
+        return None
+
+
+class FileStorage(Storage):
+    """A snapshot file in any serializers format, plus an optional journal.
+
+    journal_seq is the ledger version: every commit bumps it, journal lines
+    carry it, and each snapshot records the last one it contains. Snapshots
+    are written to a temporary file and renamed over the old one.
+
+    In concurrent mode processes serialise on an fcntl lock on
+    data_file + ".lock", which also holds the latest journal_seq. poll()
+    compares that with its own; when they differ it reads just the journal
+    lines appended since, unless the snapshot it loaded (known by inode,
+    mtime and size) has been replaced, which needs a full reload.
+
+    stage() streams a batch's records to journal_file + ".batch", and the
+    commit() that ends the batch copies them into its single journal line,
+    so a large batch is not held in memory. Without a journal commit()
+    saves the whole manager, so staging has nothing to keep.
+    """
+
+    JOURNAL_MAX_BYTES = 1024 * 1024
+
+    def __init__(
+        self, data_file, journal=False, journal_max_bytes=None, format=None, concurrent=False
+    ):
+        if concurrent and fcntl is None:
+            raise ImportError("Concurrent mode needs fcntl, which this platform lacks.")
+        self.data_file = data_file
+        self.snapshot_file = data_file
+        self.journal = journal
+        self.journal_file = data_file + ".journal"
+        self._staging = None
+        self.journal_max_bytes = journal_max_bytes or self.JOURNAL_MAX_BYTES
+        self.journal_seq = 0
+        self.serializer = get_serializer(format)
+        self.concurrent = concurrent
+        self.lock_file = data_file + ".lock"
+        self._lock_depth = 0
+        self._lock_fd = None
+        self._snapshot_stamp = None
+        self._journal_offset = 0
+
+    @contextmanager
+    def locked(self, shared=False):
+        """Hold the inter-process lock; nested calls reuse the outer one."""
+        if not self.concurrent or self._lock_depth:
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+            return
+        if self._lock_fd is None:
+            self._lock_fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o666)
+        fcntl.flock(self._lock_fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        self._lock_depth = 1
+        try:
+            yield
+        finally:
+            self._lock_depth = 0
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def poll(self):
+        if self.concurrent:
+            version = self._shared_version()
+            if version == self.journal_seq:
+                return []
+        else:
+            version = None
+        if self._stamp(self.snapshot_file) != self._snapshot_stamp:
+            return None
+        if not self.journal:
+            # Every change rewrites the snapshot, so a newer version with the
+            # same stamp can only mean the stamp was reused.
+            return None if version is not None and version > self.journal_seq else []
+        try:
+            size = os.path.getsize(self.journal_file)
+        except FileNotFoundError:
+            size = 0
+        if size < self._journal_offset:
+            return None
+        records = self._read_journal(self._journal_offset) if size > self._journal_offset else []
+        if version is not None and self.journal_seq < version:
+            return None
+        return records
+
+    def _shared_version(self):
+        if self._lock_fd is None:
+            return 0
+        return int(os.pread(self._lock_fd, 20, 0).strip() or 0)
+
+    def _publish_version(self):
+        if self.concurrent and self._lock_depth:
+            os.pwrite(self._lock_fd, b"%-20d" % self.journal_seq, 0)
+
+    @staticmethod
+    def _stamp(path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def load(self):
+        self.journal_seq = 0
+        self._snapshot_stamp = None
+        self._journal_offset = 0
+        data = {}
+        data["transactions"] = self._stream_snapshot(data)
+        return data, self._journal_records()
+
+    def _stream_snapshot(self, data):
+        """Yield the snapshot's transactions one by one, filling data with the rest."""
+        try:
+            file = open(self.data_file, "rb")
+        except FileNotFoundError:
+            return
+        with file:
+            stat = os.fstat(file.fileno())
+            self._snapshot_stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            yield from serializer_for(file).load(file, data)
+        self.journal_seq = data.get("journal_seq", 0)
+
+    def _journal_records(self):
+        # Deferred until the snapshot, and with it journal_seq, has been read.
+        yield from self._read_journal()
+
+    def _read_journal(self, offset=0):
+        records = []
+        try:
+            file = open(self.journal_file, "rb")
+        except FileNotFoundError:
+            return records
+        with file:
+            file.seek(offset)
+            valid_size = offset
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                valid_size += len(line)
+                # Records up to journal_seq are already in the snapshot.
+                if record["seq"] > self.journal_seq:
+                    records.append(record)
+                    self.journal_seq = record["seq"]
+            torn = valid_size < os.fstat(file.fileno()).st_size
+        if torn:
+            # Drop a record cut short by a crash so later appends start on a fresh line.
+            os.truncate(self.journal_file, valid_size)
+        self._journal_offset = valid_size
+        return records
+
+    def save(self, manager):
+        data = {"journal_seq": self.journal_seq}
+        data.update(manager.to_dict(include_transactions=False))
+        directory, name = os.path.split(os.path.abspath(self.data_file))
+        descriptor, temporary_file = tempfile.mkstemp(prefix=name + ".", dir=directory)
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                self.serializer.dump(data, manager.transactions, file)
+            os.chmod(temporary_file, self._file_mode())
+            os.replace(temporary_file, self.data_file)
+        except BaseException:
+            os.unlink(temporary_file)
+            raise
+        self._snapshot_saved()
+        self.bytes_written += self._snapshot_stamp[2]
+
+    def _snapshot_saved(self):
+        self._snapshot_stamp = self._stamp(self.snapshot_file)
+        if self.journal:
+            # Every journaled record is now part of the snapshot.
+            open(self.journal_file, "w").close()
+            self._journal_offset = 0
+        self._publish_version()
+
+    def _file_mode(self):
+        # mkstemp creates files only the owner can read; keep the old file's mode.
+        try:
+            return os.stat(self.snapshot_file).st_mode & 0o777
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            return 0o666 & ~umask
+
+    def commit(self, manager, records):
+        if not self.journal:
+            self.journal_seq += 1
+            self.save(manager)
+            return
+        if self._staging is not None:
+            self.stage(manager, records)
+            records = []
+        if len(records) == 1:
+            record = records[0]
+        else:
+            # A single journal line keeps a batch all-or-nothing on replay.
+            record = {"op": "batch", "records": records}
+        self.journal_seq += 1
+        record["seq"] = self.journal_seq
+        line = json.dumps(record, separators=(",", ":")).encode() + b"\n"
+        with open(self.journal_file, "ab") as file:
+            start = file.tell()
+            if self._staging is None:
+                file.write(line)
+            else:
+                # Splice the staged records into the empty batch's list.
+                head, tail = line.split(b"[]", 1)
+                file.write(head + b"[")
+                self._staging.seek(0)
+                shutil.copyfileobj(self._staging, file)
+                file.write(b"]" + tail)
+            size = file.tell()
+        self.bytes_written += size - start
+        self._journal_offset = size
+        self.rollback()
+        self._publish_version()
+        if size > self.journal_max_bytes:
+            self.save(manager)
+
+
+    def stage(self, manager, records):
+        if not self.journal:
+            return True
+        if self._staging is None:
+            self._staging = open(self.journal_file + ".batch", "w+b")
+        for record in records:
+            if self._staging.tell():
+                self._staging.write(b",")
+            self._staging.write(json.dumps(record, separators=(",", ":")).encode())
+        return True
+
+    def rollback(self):
+        if self._staging is not None:
+            self._staging.close()
+            self._staging = None
+            os.unlink(self.journal_file + ".batch")
+
+
+def transaction_month(transaction):
+    """The YYYY-MM segment a transaction is stored in."""
+    value = transaction.date
+    if len(value) == 10:
+        return value[:7]
+    return date.fromordinal(date_ordinal(value)).strftime("%Y-%m")
+
+
+class SegmentedStorage(FileStorage):
+    """A directory with one transaction segment per month plus metadata tables.
+
+    manifest.json names the current file of every segment and of every
+    table in TABLES. save() rewrites only the months and tables the manager
+    marked dirty (all of them the first time), each into a new file, then
+    replaces the manifest and deletes the files it no longer names, so a
+    crash leaves the previous generation readable. Without a journal every
+    commit is such a save.
+    """
+
+    MANIFEST = "manifest.json"
+    TABLES = {
+        "wallets": ("wallets",),
+        "categories": ("custom_categories",),
+        "tags": ("available_tags",),
+        "budgets": ("budgets",),
+        "settings": ("default_wallet", "transaction_id_counter"),
+    }
+
+    def __init__(
+        self,
+        data_file,
+        journal=False,
+        journal_max_bytes=None,
+        format=None,
+        concurrent=False,
+    ):
+        os.makedirs(data_file, exist_ok=True)
+        super().__init__(data_file, journal, journal_max_bytes, format, concurrent)
+        self.snapshot_file = os.path.join(data_file, self.MANIFEST)
+        self.journal_file = os.path.join(data_file, "journal")
+        self.lock_file = os.path.join(data_file, "lock")
+        self.manifest = {"segments": {}, "tables": {}}
+
+    def load(self):
+        self.journal_seq = 0
+        self._journal_offset = 0
+        self._read_manifest()
+        self.journal_seq = self.manifest.get("journal_seq", 0)
+        data = {}
+        for name in self.manifest["tables"].values():
+            with open(os.path.join(self.data_file, name), "rb") as file:
+                data.update(json.load(file))
+        data["transactions"] = self._stream_segments(sorted(self.manifest["segments"]))
+        return data, self._journal_records()
+
+    def _read_manifest(self):
+        try:
+            file = open(self.snapshot_file, "rb")
+        except FileNotFoundError:
+            self._snapshot_stamp = None
+            self.manifest = {"segments": {}, "tables": {}}
+            return
+        with file:
+            stat = os.fstat(file.fileno())
+            self._snapshot_stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            self.manifest = json.load(file)
+
+    def _stream_segments(self, months):
+        # One segment at a time, in month order. Decoding holds the GIL, so a
+        # thread pool only slowed this down, and the manager reads every row.
+        for month in months:
+            yield from self._read_segment(self._segment_path(month))
+
+    def _segment_path(self, month):
+        return os.path.join(self.data_file, self.manifest["segments"][month])
+
+    @staticmethod
+    def _read_segment(path):
+        with open(path, "rb") as file:
+            return list(serializer_for(file).load(file, {}))
+
+    def save(self, manager):
+        # Dirty flags only describe what this directory is missing when the
+        # manager was loaded from it.
+        full = manager.storage is not self or self._snapshot_stamp is None
+        segments = dict(self.manifest["segments"])
+        tables = dict(self.manifest["tables"])
+        if full:
+            segments, tables = {}, {}
+            months = {}
+            for month, transactions in groupby(manager.transactions, key=transaction_month):
+                months.setdefault(month, []).extend(transactions)
+            dirty_tables = self.TABLES
+        else:
+            months = {
+                month: self._month_transactions(manager, month)
+                for month in manager.dirty_segments
+            }
+            dirty_tables = manager.dirty_tables
+
+        for month, transactions in months.items():
+            if transactions:
+                segments[month] = self._write_file(
+                    month, lambda file: self.serializer.dump({}, transactions, file)
+                )
+            else:
+                segments.pop(month, None)
+        data = manager.to_dict(include_transactions=False)
+        for table in dirty_tables:
+            content = json.dumps({key: data[key] for key in self.TABLES[table]}).encode()
+            tables[table] = self._write_file(table, lambda file: file.write(content))
+
+        manifest = {"journal_seq": self.journal_seq, "segments": segments, "tables": tables}
+        self._write_file(
+            self.MANIFEST, lambda file: file.write(json.dumps(manifest, indent=1).encode())
+        )
+        self.manifest = manifest
+        self._remove_unlisted()
+        self._snapshot_saved()
+        manager.dirty_segments.clear()
+        manager.dirty_tables.clear()
+
+    @staticmethod
+    def _month_transactions(manager, month):
+        first = date(int(month[:4]), int(month[5:7]), 1)
+        following = date(first.year + first.month // 12, first.month % 12 + 1, 1)
+        low, high = manager.index.date_range(first.toordinal(), following.toordinal() - 1)
+        return manager.transactions[low:high]
+
+    def _write_file(self, name, write):
+        """Write a new file for name and return its file name.
+
+        The manifest itself is renamed over the old one; every other file
+        gets a fresh name, so the current generation is never overwritten.
+        """
+        descriptor, temporary_file = tempfile.mkstemp(
+            prefix=name + ".", suffix=".part", dir=self.data_file
+        )
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                write(file)
+                self.bytes_written += file.tell()
+            os.chmod(temporary_file, self._file_mode())
+            if name == self.MANIFEST:
+                path = self.snapshot_file
+            else:
+                path = temporary_file[: -len(".part")]
+            os.replace(temporary_file, path)
+        except BaseException:
+            os.unlink(temporary_file)
+            raise
+        return os.path.basename(path)
+
+    def _remove_unlisted(self):
+        """Delete segment and table files of older generations or failed saves."""
+        keep = set(self.manifest["segments"].values()) | set(self.manifest["tables"].values())
+        for name in os.listdir(self.data_file):
+            prefix = name.partition(".")[0]
+            owned = prefix in self.TABLES or (
+                len(prefix) == 7 and prefix[4] == "-" and prefix.replace("-", "").isdigit()
+            )
+            if owned and name not in keep:
+                os.unlink(os.path.join(self.data_file, name))
+
+
+class SQLiteStorage(Storage):
+    """A SQLite database that keeps the transactions on disk.
+
+    Loading reads the wallets, the metadata and two grouped summaries of
+    the rows; the rows themselves are fetched by the select_*() queries,
+    which the indexes keep to the rows asked for. Dates are stored as
+    YYYY-MM-DD, so text order is date order, and rowid order within a date
+    is id order. Staged batch records run inside the connection's open
+    transaction, which the next commit() ends.
+    """
+
+    rows_on_disk = True
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS wallets (name TEXT PRIMARY KEY, data TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY,
+            wallet_name TEXT NOT NULL,
+            transaction_type TEXT NOT NULL,
+            category TEXT NOT NULL,
+            amount REAL NOT NULL,
+            currency TEXT NOT NULL,
+            date TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS transaction_tags (
+            transaction_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            tag TEXT NOT NULL,
+            PRIMARY KEY (transaction_id, position)
+        );
+        CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (date);
+        CREATE INDEX IF NOT EXISTS idx_transactions_wallet_date
+            ON transactions (wallet_name, date);
+        CREATE INDEX IF NOT EXISTS idx_transactions_type_category
+            ON transactions (transaction_type, category);
+        CREATE INDEX IF NOT EXISTS idx_transaction_tags_tag
+            ON transaction_tags (tag);
+    """
+    METADATA_KEYS = (
+        "custom_categories",
+        "default_wallet",
+        "available_tags",
+        "budgets",
+        "transaction_id_counter",
+    )
+    TRANSACTION_COLUMNS = (
+        "wallet_name",
+        "transaction_type",
+        "category",
+        "amount",
+        "currency",
+        "date",
+    )
+    SELECT_TRANSACTIONS = """
+        SELECT t.id, t.wallet_name, t.transaction_type, t.category, t.amount,
+               t.currency, t.date,
+               (SELECT json_group_array(tag) FROM (
+                    SELECT tag FROM transaction_tags
+                    WHERE transaction_id = t.id ORDER BY position))
+        FROM transactions AS t
+    """
+
+    def __init__(self, data_file):
+        self.data_file = data_file
+        # Lazy loads and async writers use the connection from other threads;
+        # the lock keeps them to one at a time.
+        self.connection = sqlite3.connect(data_file, check_same_thread=False)
+        self._lock = threading.RLock()
+        with self._lock:
+            self.connection.executescript(self.SCHEMA)
+
+    def load(self):
+        with self._lock:
+            data = {
+                key: json.loads(value)
+                for key, value in self.connection.execute("SELECT key, value FROM metadata")
+            }
+            data["wallets"] = {
+                name: json.loads(wallet)
+                for name, wallet in self.connection.execute("SELECT name, data FROM wallets")
+            }
+            data["daily"] = self.connection.execute(
+                "SELECT wallet_name, date, SUM(CASE transaction_type "
+                "WHEN 'income' THEN amount ELSE -amount END) "
+                "FROM transactions GROUP BY wallet_name, date"
+            ).fetchall()
+            data["cells"] = self.connection.execute(
+                "SELECT wallet_name, transaction_type, category, substr(date, 1, 7), currency, "
+                "SUM(amount), COUNT(*), MIN(amount), MAX(amount) "
+                "FROM transactions GROUP BY 1, 2, 3, 4, 5"
+            ).fetchall()
+            if "transaction_id_counter" not in data:
+                (last_id,) = self.connection.execute("SELECT MAX(id) FROM transactions").fetchone()
+                data["transaction_id_counter"] = (last_id or 0) + 1
+        return data, []
+
+    def save(self, manager):
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM wallets")
+            for wallet in manager.wallets.values():
+                self._write_wallet(wallet.to_dict())
+            # Every commit already wrote this manager's rows.
+            if manager.storage is not self:
+                self.connection.execute("DELETE FROM transactions")
+                self.connection.execute("DELETE FROM transaction_tags")
+                for transaction in manager.transactions:
+                    self._insert_transaction(transaction.to_dict())
+            self._write_metadata(manager)
+
+    def commit(self, manager, records):
+        with self._lock, self.connection:
+            for record in records:
+                self._execute(record)
+            self._write_metadata(manager)
+
+    def stage(self, manager, records):
+        with self._lock:
+            for record in records:
+                self._execute(record)
+        return True
+
+    def rollback(self):
+        with self._lock:
+            self.connection.rollback()
+
+    def _execute(self, record):
+        op = record["op"]
+        if op == "batch":
+            for batched_record in record["records"]:
+                self._execute(batched_record)
+        elif op == "add_wallet":
+            self._write_wallet(record["wallet"])
+        elif op == "add_transaction":
+            self._insert_transaction(record["transaction"])
+        elif op == "edit_transaction":
+            self._update_transaction(record["id"], record["updates"])
+        elif op == "delete_transaction":
+            self._delete_transaction(record["id"])
+        elif op == "edit_custom_category":
+            self.connection.execute(
+                "UPDATE transactions SET category = ? "
+                "WHERE transaction_type = ? AND category = ?",
+                (
+                    record["new_category"],
+                    record["transaction_type"],
+                    record["old_category"],
+                ),
+            )
+        elif op == "delete_custom_category" and "reassign_to" in record:
+            self.connection.execute(
+                "UPDATE transactions SET category = ? "
+                "WHERE transaction_type = ? AND category = ?",
+                (record["reassign_to"], record["transaction_type"], record["category"]),
+            )
+        # Every other op only touches the metadata written after each commit.
+
+    def _write_wallet(self, wallet):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO wallets (name, data) VALUES (?, ?)",
+            (wallet["name"], json.dumps(wallet)),
+        )
+
+    def _write_metadata(self, manager):
+        data = manager.to_dict(include_transactions=False)
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)",
+            [(key, json.dumps(data[key])) for key in self.METADATA_KEYS],
+        )
+
+    def _insert_transaction(self, info):
+        transaction_data = info["transaction_data"]
+        self.connection.execute(
+            "INSERT INTO transactions (id, %s) VALUES (?, ?, ?, ?, ?, ?, ?)"
+            % ", ".join(self.TRANSACTION_COLUMNS),
+            [info["id"]] + [transaction_data[column] for column in self.TRANSACTION_COLUMNS],
+        )
+        self._write_tags(info["id"], transaction_data["tags"])
+
+    def _update_transaction(self, transaction_id, updates):
+        columns = [column for column in self.TRANSACTION_COLUMNS if column in updates]
+        if columns:
+            self.connection.execute(
+                "UPDATE transactions SET %s WHERE id = ?"
+                % ", ".join(f"{column} = ?" for column in columns),
+                [updates[column] for column in columns] + [transaction_id],
+            )
+        if "tags" in updates:
+            self.connection.execute(
+                "DELETE FROM transaction_tags WHERE transaction_id = ?", (transaction_id,)
+            )
+            self._write_tags(transaction_id, updates["tags"])
+
+    def _delete_transaction(self, transaction_id):
+        self.connection.execute("DELETE FROM transactions WHERE id = ?", (transaction_id,))
+        self.connection.execute(
+            "DELETE FROM transaction_tags WHERE transaction_id = ?", (transaction_id,)
+        )
+
+    def _write_tags(self, transaction_id, tags):
+        self.connection.executemany(
+            "INSERT INTO transaction_tags (transaction_id, position, tag) VALUES (?, ?, ?)",
+            [(transaction_id, position, tag) for position, tag in enumerate(tags or [])],
+        )
+
+    def select_transactions(
+        self,
+        wallet_name=None,
+        start_date=None,
+        end_date=None,
+        tag=None,
+        transaction_type=None,
+        category=None,
+    ):
+        conditions = []
+        params = []
+        if wallet_name:
+            conditions.append("t.wallet_name = ?")
+            params.append(wallet_name)
+        if start_date:
+            conditions.append("t.date >= ?")
+            params.append(start_date)
+        if end_date:
+            conditions.append("t.date <= ?")
+            params.append(end_date)
+        if transaction_type:
+            conditions.append("t.transaction_type = ?")
+            params.append(transaction_type)
+        if category is not None:
+            conditions.append("t.category = ?")
+            params.append(category)
+        if tag is not None:
+            conditions.append(
+                "t.id IN (SELECT transaction_id FROM transaction_tags WHERE tag = ?)"
+            )
+            params.append(tag)
+        return self._select(self._where(conditions) + " ORDER BY t.id", params)
+
+    def select_window(
+        self,
+        wallet_name=None,
+        start_date=None,
+        end_date=None,
+        after=None,
+        descending=False,
+        limit=None,
+    ):
+        """Up to limit transactions as dicts in (date, id) order, past the
+        (date, id) key after in that direction."""
+        conditions = []
+        params = []
+        if wallet_name is not None:
+            conditions.append("t.wallet_name = ?")
+            params.append(wallet_name)
+        if start_date:
+            conditions.append("t.date >= ?")
+            params.append(start_date)
+        if end_date:
+            conditions.append("t.date <= ?")
+            params.append(end_date)
+        if after is not None:
+            conditions.append("(t.date, t.id) %s (?, ?)" % ("<" if descending else ">"))
+            params.extend(after)
+        order = " DESC" if descending else ""
+        query = self._where(conditions) + f" ORDER BY t.date{order}, t.id{order}"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return self._select(query, params)
+
+    def select_transaction(self, transaction_id):
+        rows = self._select(self.SELECT_TRANSACTIONS + " WHERE t.id = ?", (transaction_id,))
+        return rows[0] if rows else None
+
+    def _where(self, conditions):
+        if not conditions:
+            return self.SELECT_TRANSACTIONS
+        return self.SELECT_TRANSACTIONS + " WHERE " + " AND ".join(conditions)
+
+    def _select(self, query, params):
+        # Rows share a handful of tag lists, so each distinct one is parsed once.
+        parsed = {}
+        rows = []
+        with self._lock:
+            for id, wallet_name, transaction_type, category, amount, currency, day, tags in (
+                self.connection.execute(query, params)
+            ):
+                tag_list = parsed.get(tags)
+                if tag_list is None:
+                    tag_list = parsed[tags] = json.loads(tags)
+                rows.append(
+                    {
+                        "id": id,
+                        "transaction_data": {
+                            "wallet_name": wallet_name,
+                            "transaction_type": transaction_type,
+                            "category": category,
+                            "amount": amount,
+                            "currency": currency,
+                            "date": day,
+                            "tags": list(tag_list),
+                        },
+                    }
+                )
+        return rows
+
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+
+def open_storage(
+    data_file, journal=False, journal_max_bytes=None, format=None, concurrent=False
+):
+    if data_file.endswith(SQLITE_EXTENSIONS):
+        if concurrent:
+            # Ids are assigned from memory, so two writers would both pick
+            # the next one; the fcntl locking only covers file storages.
+            raise ValueError("Concurrent mode is not supported for SQLite data files.")
+        return SQLiteStorage(data_file)
+    if os.path.isdir(data_file) or data_file.endswith(os.sep):
+        return SegmentedStorage(
+            data_file,
+            journal=journal,
+            journal_max_bytes=journal_max_bytes,
+            format=format,
+            concurrent=concurrent,
+        )
+    return FileStorage(
+        data_file,
+        journal=journal,
+        journal_max_bytes=journal_max_bytes,
+        format=format,
+        concurrent=concurrent,
+    )
+
+
+def migrate(manager, destination, format=None):
+    """Copy everything loaded in manager into a new data file."""
+    storage = open_storage(destination, format=format)
+    storage.save(manager)
+    return storage
@@ -0,0 +1,244 @@
+"""Boolean tag queries answered from TransactionIndex posting lists.
+
+A query is a list of tags combined with AND, OR and NOT (upper case) and
+parentheses; NOT binds tightest, then AND, then OR, and terms written next
+to each other are ANDed. A trailing * matches every tag with that prefix,
+and double quotes keep a tag with spaces together:
+
+    groceries AND NOT organic
+    "live music" OR movie*
+    (commute OR long-distance) NOT "formal wear"
+"""
+import re
+from array import array
+from bisect import bisect_left
+
+from indexes import date_ordinal
+
+TOKEN = re.compile(r'\s*(?:(\()|(\))|"([^"]*)"(\*?)|([^\s()"]+))')
+OPERATORS = ("AND", "OR", "NOT")
+
+
+def tokenize(query):
+    tokens = []
+    position = 0
+    query = query.strip()
+    while position < len(query):
+        match = TOKEN.match(query, position)
+        if match is None:
+            raise ValueError(f"Unbalanced quote in tag query: {query!r}")
+        opening, closing, quoted, star, word = match.groups()
+        if opening or closing:
+            tokens.append(opening or closing)
+        elif quoted is not None:
+            tokens.append(("prefix" if star else "tag", quoted))
+        elif word in OPERATORS:
+            tokens.append(word)
+        elif word.endswith("*"):
+            tokens.append(("prefix", word[:-1]))
+        else:
+            tokens.append(("tag", word))
+        position = match.end()
+    return tokens
+
+
+def parse(query):
+    """Turn a query into nested ("and" | "or", left, right), ("not", node) and
+    ("tag" | "prefix", text) tuples."""
+    tokens = tokenize(query)
+    if not tokens:
+        raise ValueError("Empty tag query.")
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else None
+
+    def take():
+        nonlocal position
+        position += 1
+        return tokens[position - 1]
+
+    def parse_or():
+        node = parse_and()
+        while peek() == "OR":
+            take()
+            node = ("or", node, parse_and())
+        return node
+
+    def parse_and():
+        node = parse_not()
+        while peek() not in (None, "OR", ")"):
+            if peek() == "AND":
+                take()
+            node = ("and", node, parse_not())
+        return node
+
+    def parse_not():
+        token = peek()
+        if token == "NOT":
+            take()
+            return ("not", parse_not())
+        if token == "(":
+            take()
+            node = parse_or()
+            if peek() != ")":
+                raise ValueError(f"Missing ')' in tag query: {query!r}")
+            take()
+            return node
+        if isinstance(token, tuple):
+            return take()
+        raise ValueError(f"Expected a tag in tag query: {query!r}")
+
+    node = parse_or()
+    if peek() is not None:
+        raise ValueError(f"Unexpected {peek()!r} in tag query: {query!r}")
+    return node
+
+
+def intersect(left, right):
+    """Ids in both sorted sequences, probing the longer one by bisection."""
+    if len(left) > len(right):
+        left, right = right, left
+    result = array("q")
+    low = 0
+    for transaction_id in left:
+        low = bisect_left(right, transaction_id, low)
+        if low == len(right):
+            break
+        if right[low] == transaction_id:
+            result.append(transaction_id)
+    return result
+
+
+def union(*postings):
+    return array("q", sorted(set().union(*postings)))
+
+
+def difference(left, right):
+    excluded = set(right)
+    return array("q", [i for i in left if i not in excluded])
+
+
+class TransactionResults:
+    """Matching transactions in id order.
+
+    Holds only the id array; items are the manager's own Transaction
+    objects, looked up when they are accessed, so a view should be read
+    before the matching transactions are deleted.
+    """
+
+    __slots__ = ("ids", "_by_id")
+
+    def __init__(self, ids, by_id):
+        self.ids = ids
+        self._by_id = by_id
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return TransactionResults(self.ids[position], self._by_id)
+        return self._by_id[self.ids[position]]
+
+    def __iter__(self):
+        by_id = self._by_id
+        return (by_id[transaction_id] for transaction_id in self.ids)
+
+
+class TagQuery:
+    """Evaluates parsed queries against a TransactionIndex.
+
+    Each node evaluates to (negated, ids): a NOT keeps its operand's ids and
+    flips the flag, so the complement of a posting list is only built when
+    the whole query is negative, and then only within the filters.
+    """
+
+    def __init__(self, index):
+        self.index = index
+
+    def search(
+        self,
+        query,
+        transaction_type=None,
+        category=None,
+        start_date=None,
+        end_date=None,
+    ):
+        negated, ids = self.evaluate(parse(query))
+        if negated:
+            # The result can hold most of the ledger, so build the universe.
+            allowed = self._allowed(transaction_type, category)
+            universe = sorted(self.index.by_id) if allowed is None else sorted(allowed)
+            ids = difference(universe, ids)
+        elif transaction_type is not None or category is not None:
+            # Check just the matches, not every transaction of the type.
+            by_id = self.index.by_id
+            ids = array(
+                "q",
+                [
+                    i
+                    for i in ids
+                    if transaction_type in (None, by_id[i].transaction_type)
+                    and category in (None, by_id[i].category)
+                ],
+            )
+        if start_date or end_date:
+            start = date_ordinal(start_date) if start_date else None
+            end = date_ordinal(end_date) if end_date else None
+            by_id = self.index.by_id
+            ids = array(
+                "q",
+                [
+                    i
+                    for i in ids
+                    if (start is None or date_ordinal(by_id[i].date) >= start)
+                    and (end is None or date_ordinal(by_id[i].date) <= end)
+                ],
+            )
+        return TransactionResults(ids, self.index.by_id)
+
+    def evaluate(self, node):
+        kind = node[0]
+        if kind == "tag":
+            # A copy, so results do not change with later edits to the ledger.
+            return False, array("q", self.index.by_tag.get(node[1], ()))
+        if kind == "prefix":
+            by_tag = self.index.by_tag
+            return False, union(
+                *(by_tag[tag] for tag in self.index.tags_with_prefix(node[1]))
+            )
+        if kind == "not":
+            negated, ids = self.evaluate(node[1])
+            return not negated, ids
+        left_negated, left = self.evaluate(node[1])
+        right_negated, right = self.evaluate(node[2])
+        if kind == "or":
+            # not a or not b == not (a and b), and a or not b == not (b - a).
+            if left_negated and right_negated:
+                return True, intersect(left, right)
+            if left_negated:
+                return True, difference(left, right)
+            if right_negated:
+                return True, difference(right, left)
+            return False, union(left, right)
+        if left_negated and right_negated:
+            return True, union(left, right)
+        if left_negated:
+            return False, difference(right, left)
+        if right_negated:
+            return False, difference(left, right)
+        return False, intersect(left, right)
+
+    def _allowed(self, transaction_type, category):
+        """Ids of the filtered type and category, or None when unfiltered."""
+        if transaction_type is None and category is None:
+            return None
+        allowed = set()
+        for key, ids in self.index.by_category.items():
+            if transaction_type not in (None, key.transaction_type):
+                continue
+            if category not in (None, key.name):
+                continue
+            allowed |= ids
+        return allowed
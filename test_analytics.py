@@ -0,0 +1,85 @@
+import pytest
+
+from analytics import AnalyticsEngine
+from finance_manager import FinanceManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = FinanceManager(data_file=str(tmp_path / "finance_data.json"))
+    manager.add_wallet("Cash", 100.0, "USD")
+    manager.add_wallet("Card", 0.0, "USD")
+    manager.add_transactions(
+        [
+            ("Cash", "expense", "food", 10.0, "USD", "2024-01-01", []),
+            ("Card", "expense", "food", 20.0, "USD", "2024-01-03", []),
+            ("Cash", "expense", "health", 5.0, "USD", "2024-01-09", []),
+            ("Cash", "income", "salary", 100.0, "USD", "2024-01-31", []),
+            ("Card", "expense", "food", 40.0, "USD", "2024-02-02", []),
+        ]
+    )
+    return manager
+
+
+def test_group_sum(manager):
+    engine = AnalyticsEngine(manager, use_numpy=False)
+
+    assert engine.group_sum(["category"], transaction_type="expense") == {
+        ("food",): 70.0,
+        ("health",): 5.0,
+    }
+    assert engine.group_sum(["wallet", "month"]) == {
+        ("Card", "2024-01"): 20.0,
+        ("Card", "2024-02"): 40.0,
+        ("Cash", "2024-01"): 115.0,
+    }
+    with pytest.raises(ValueError):
+        engine.group_sum(["tags"])
+
+
+def test_rolling_spend_and_burn(manager):
+    engine = AnalyticsEngine(manager, use_numpy=False)
+
+    rolling = dict(engine.rolling_spend(7))
+    assert [rolling[f"2024-01-0{day}"] for day in (1, 7, 8, 9)] == [10.0, 30.0, 20.0, 25.0]
+    assert rolling["2024-01-11"] == 5.0
+    assert len(rolling) == 33
+    assert dict(engine.rolling_spend(30, wallet="Card"))["2024-02-01"] == 20.0
+    assert engine.monthly_burn() == {"2024-01": -65.0, "2024-02": 40.0}
+    assert engine.monthly_burn(wallet="Cash") == {"2024-01": -85.0}
+
+
+def test_category_percentiles(manager):
+    engine = AnalyticsEngine(manager, use_numpy=False)
+
+    assert engine.category_percentiles((0, 50, 100)) == {
+        "food": {0: 10.0, 50: 20.0, 100: 40.0},
+        "health": {0: 5.0, 50: 5.0, 100: 5.0},
+    }
+    assert engine.category_percentiles((25,))["food"][25] == 15.0
+
+
+def test_columns_are_cached_until_a_mutation(manager):
+    engine = AnalyticsEngine(manager, use_numpy=False)
+    columns = engine.columns()
+
+    assert engine.columns() is columns
+    manager.edit_transaction(1, amount=12.0)
+    assert engine.columns() is not columns
+    assert engine.group_sum(["category"], "expense")[("food",)] == 72.0
+
+
+def test_numpy_matches_fallback(manager):
+    pytest.importorskip("numpy")
+    vectorized = AnalyticsEngine(manager, use_numpy=True)
+    loops = AnalyticsEngine(manager, use_numpy=False)
+
+    for by in (["category"], ["wallet", "transaction_type", "month"]):
+        assert vectorized.group_sum(by) == pytest.approx(loops.group_sum(by))
+    for days, wallet in ((7, None), (30, "Card")):
+        expected = loops.rolling_spend(days, wallet)
+        actual = vectorized.rolling_spend(days, wallet)
+        assert [day for day, _ in actual] == [day for day, _ in expected]
+        assert [total for _, total in actual] == pytest.approx([total for _, total in expected])
+    assert vectorized.monthly_burn() == pytest.approx(loops.monthly_burn())
+    assert vectorized.category_percentiles() == loops.category_percentiles()
@@ -0,0 +1,131 @@
+import asyncio
+import threading
+
+import pytest
+
+from async_manager import AsyncFinanceManager
+from finance_manager import FinanceManager
+from finance_server import FinanceClient, serve
+
+
+@pytest.fixture(params=["finance_data.json", "finance_data.db"])
+def manager(tmp_path, request):
+    # SQLite is flushed from a worker thread, not the one that opened it.
+    manager = FinanceManager(data_file=str(tmp_path / request.param), journal=True)
+    manager.add_wallet("Cash", 100.0, "USD")
+    return manager
+
+
+def test_concurrent_adds_share_one_flush(manager, monkeypatch):
+    commits = []
+    commit = manager.storage.commit
+    monkeypatch.setattr(
+        manager.storage, "commit", lambda *args: commits.append(1) or commit(*args)
+    )
+
+    async def scenario():
+        async with AsyncFinanceManager(manager, max_delay=0.05) as async_manager:
+            ids = await asyncio.gather(
+                *(
+                    async_manager.add_transaction(
+                        "Cash", "expense", "food", 1.0, "USD", "2024-01-01"
+                    )
+                    for _ in range(50)
+                )
+            )
+            assert async_manager.get_balance("Cash") == 50.0
+            return ids, async_manager.flushes
+
+    ids, flushes = asyncio.run(scenario())
+
+    assert sorted(ids) == list(range(1, 51))
+    assert flushes == len(commits) == 1
+    reloaded = FinanceManager(data_file=manager.data_file, journal=True)
+    assert len(reloaded.transactions) == 50
+
+
+def test_failing_call_does_not_affect_its_group(manager):
+    async def scenario():
+        async with AsyncFinanceManager(manager, max_delay=0.05) as async_manager:
+            return await asyncio.gather(
+                async_manager.add_transaction("Cash", "expense", "food", 1.0, "USD"),
+                async_manager.add_transaction("Nowhere", "expense", "food", 1.0, "USD"),
+                async_manager.delete_custom_category("expense", "missing"),
+                async_manager.add_transaction("Cash", "income", "salary", 5.0, "USD"),
+                return_exceptions=True,
+            )
+
+    first, invalid, missing, second = asyncio.run(scenario())
+
+    assert (first, second) == (1, 2)
+    assert isinstance(invalid, ValueError) and "wallet 'Nowhere'" in str(invalid)
+    assert isinstance(missing, ValueError)
+    reloaded = FinanceManager(data_file=manager.data_file, journal=True)
+    assert reloaded.get_balance("Cash") == 104.0
+
+
+@pytest.mark.parametrize("concurrent", [False, True])
+def test_failed_flush_runs_off_the_loop_and_reloads_once(tmp_path, monkeypatch, concurrent):
+    manager = FinanceManager(
+        data_file=str(tmp_path / "finance_data.json"), journal=True, concurrent=concurrent
+    )
+    manager.add_wallet("Cash", 100.0, "USD")
+    threads, reloads = [], []
+    load_from_file = manager.load_from_file
+
+    def failing_commit(*args):
+        threads.append(threading.get_ident())
+        raise OSError("disk full")
+
+    monkeypatch.setattr(manager.storage, "commit", failing_commit)
+    monkeypatch.setattr(
+        manager, "load_from_file", lambda: reloads.append(1) or load_from_file()
+    )
+
+    async def scenario():
+        async with AsyncFinanceManager(manager) as async_manager:
+            with pytest.raises(OSError):
+                await async_manager.add_transaction("Cash", "expense", "food", 1.0, "USD")
+            return async_manager.get_balance("Cash")
+
+    assert asyncio.run(scenario()) == 100.0
+    assert threads and threads[0] != threading.get_ident()
+    assert len(reloads) == 1
+
+
+def test_server_round_trip(manager):
+    async def scenario():
+        async with AsyncFinanceManager(manager) as async_manager:
+            server = await serve(async_manager, port=0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                clients = [await FinanceClient.connect(port=port) for _ in range(3)]
+                await asyncio.gather(
+                    *(
+                        client.call(
+                            "add_transaction",
+                            wallet_name="Cash",
+                            transaction_type="expense",
+                            category="food",
+                            amount=2.0,
+                            currency="USD",
+                            tags=["groceries"],
+                        )
+                        for client in clients
+                        for _ in range(10)
+                    )
+                )
+                balance = await clients[0].call("get_balance", "Cash")
+                found = await clients[1].call("search_transactions", "groceries")
+                page = await clients[2].call("query_transactions", after=["2000-01-01", 0], limit=5)
+                with pytest.raises(ValueError):
+                    await clients[2].call("drop_everything")
+                for client in clients:
+                    await client.close()
+        return balance, found, page
+
+    balance, found, page = asyncio.run(scenario())
+
+    assert balance == 40.0
+    assert [t["id"] for t in found] == list(range(1, 31))
+    assert [t["id"] for t in page] == list(range(1, 6))
@@ -0,0 +1,112 @@
+import pytest
+
+from cli_application import FinanceCLI
+from finance_manager import FinanceManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = FinanceManager(data_file=str(tmp_path / "finance_data.json"), journal=True)
+    manager.add_wallet("Cash", 500.0, "USD")
+    manager.add_custom_category("expense", "snacks", [])
+    manager.add_transaction("Cash", "expense", "snacks", 30.0, "USD", "2024-01-02")
+    return manager
+
+
+def record_alerts(manager):
+    alerts = []
+    manager.on_budget_alert(lambda budget, threshold: alerts.append((budget.category, threshold)))
+    return alerts
+
+
+def test_counters_follow_every_change(manager):
+    manager.set_budget("Cash", "snacks", "2024-01", 100.0)
+    budget = manager.get_budget("Cash", "snacks", "2024-01")
+    assert budget.spent == 30.0
+
+    manager.add_transaction("Cash", "expense", "snacks", 20.0, "USD", "2024-01-05")
+    manager.add_transaction("Cash", "expense", "snacks", 99.0, "USD", "2024-02-05")
+    manager.add_transaction("Cash", "income", "salary", 99.0, "USD", "2024-01-05")
+    assert budget.spent == 50.0
+    manager.edit_transaction(2, amount=25.0)
+    manager.edit_transaction(1, date="2024-02-01")
+    assert budget.spent == 25.0
+    manager.delete_transaction(2)
+    assert budget.spent == 0.0
+
+    manager.add_transaction("Cash", "expense", "snacks", 7.0, "USD", "2024-01-09")
+    manager.edit_custom_category("expense", "snacks", "treats")
+    assert manager.get_budget("Cash", "treats", "2024-01") is budget
+    assert budget.spent == 7.0
+
+    manager.set_budget("Cash", "food", "2024-01", 50.0)
+    manager.delete_custom_category("expense", "treats", reassign_to="food")
+    assert manager.get_budget("Cash", "food", "2024-01").spent == 7.0
+    assert budget.spent == 0.0
+
+
+def test_alerts_fire_once_per_crossing(manager):
+    alerts = record_alerts(manager)
+    manager.set_budget("Cash", "snacks", "2024-01", 100.0, thresholds=[0.5, 1.0])
+    assert alerts == []
+
+    manager.add_transaction("Cash", "expense", "snacks", 25.0, "USD", "2024-01-03")
+    assert alerts == [("snacks", 0.5)]
+    manager.edit_transaction(2, amount=30.0)
+    assert alerts == [("snacks", 0.5)]
+    with manager.batch():
+        manager.add_transaction("Cash", "expense", "snacks", 40.0, "USD", "2024-01-04")
+        manager.add_transaction("Cash", "expense", "snacks", 1.0, "USD", "2024-01-04")
+    assert alerts == [("snacks", 0.5), ("snacks", 1.0)]
+
+    manager.load_from_file()
+    assert alerts == [("snacks", 0.5), ("snacks", 1.0)]
+
+
+@pytest.mark.parametrize("data_file", ["finance_data.json", "finance_data.db", "ledger/"])
+def test_budgets_are_persisted(tmp_path, data_file):
+    data_file = str(tmp_path / data_file)
+    manager = FinanceManager(data_file=data_file)
+    manager.add_wallet("Cash", 500.0, "USD")
+    manager.add_transaction("Cash", "expense", "food", 30.0, "USD", "2024-01-02")
+    manager.set_budget("Cash", "food", "2024-01", 100.0, [0.8, 1.0])
+    manager.set_budget("Cash", "health", "2024-01", 10.0)
+    manager.delete_budget("Cash", "health", "2024-01")
+    manager.save_to_file()
+
+    reloaded = FinanceManager(data_file=data_file)
+    assert [budget.to_dict() for budget in reloaded.list_budgets()] == [
+        {
+            "wallet_name": "Cash",
+            "category": "food",
+            "month": "2024-01",
+            "limit": 100.0,
+            "thresholds": [0.8, 1.0],
+        }
+    ]
+    assert reloaded.get_budget("Cash", "food", "2024-01").spent == 30.0
+
+
+def test_invalid_budgets_are_rejected(manager):
+    with pytest.raises(ValueError):
+        manager.set_budget("Nowhere", "snacks", "2024-01", 10.0)
+    with pytest.raises(ValueError):
+        manager.set_budget("Cash", "salary", "2024-01", 10.0)
+    with pytest.raises(ValueError):
+        manager.set_budget("Cash", "snacks", "2024-01", 0.0)
+    assert manager.list_budgets() == []
+
+
+def test_cli_sets_shows_and_alerts(manager, monkeypatch, capsys):
+    replies = iter(["Cash", "snacks", "2024-01", "40", "50, 100"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(replies))
+    cli = FinanceCLI(manager)
+
+    cli.set_budget()
+    cli.show_budgets()
+    manager.add_transaction("Cash", "expense", "snacks", 15.0, "USD", "2024-01-10")
+
+    assert capsys.readouterr().out.splitlines() == [
+        "2024-01 | Cash | snacks: Spent 30.00 of 40.00 (75%)",
+        "Budget alert: Cash spent 45.00 on snacks in 2024-01, 100% of its 40.00 limit reached.",
+    ]
@@ -0,0 +1,73 @@
+import pytest
+
+from cli_application import FinanceCLI
+from finance_manager import FinanceManager
+
+
+@pytest.fixture
+def cli(tmp_path):
+    manager = FinanceManager(data_file=str(tmp_path / "finance_data.json"))
+    manager.add_wallet("Cash", 100.0, "USD")
+    manager.add_wallet("Card", 0.0, "USD")
+    return FinanceCLI(manager)
+
+
+def answer(monkeypatch, *replies):
+    replies = iter(replies)
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(replies))
+
+
+def test_list_groups_by_day(cli, monkeypatch, capsys):
+    cli.manager.add_transactions(
+        [
+            ("Cash", "expense", "food", 1.0, "USD", "2024-02-01", []),
+            ("Card", "expense", "food", 2.0, "USD", "2024-01-15", []),
+            ("Cash", "expense", "food", 4.0, "USD", "2024-01-15", []),
+        ]
+    )
+    answer(monkeypatch, "Cash", "2024-01-10", "")
+
+    cli.list_wallet_transactions()
+    cli.list_all_transactions()
+
+    assert capsys.readouterr().out.splitlines() == [
+        "Date: 2024-01-15, Total Amount: $4.00",
+        "  - Wallet: Cash, Category: food, Amount: $4.00",
+        "Date: 2024-02-01, Total Amount: $1.00",
+        "  - Wallet: Cash, Category: food, Amount: $1.00",
+        "Date: 2024-01-15, Total Amount: $6.00",
+        "  - Wallet: Card, Category: food, Amount: $2.00",
+        "  - Wallet: Cash, Category: food, Amount: $4.00",
+        "Date: 2024-02-01, Total Amount: $1.00",
+        "  - Wallet: Cash, Category: food, Amount: $1.00",
+    ]
+
+
+def test_list_pages_until_stopped(cli, monkeypatch, capsys):
+    cli.PAGE_SIZE = 2
+    cli.manager.add_transactions(
+        [("Cash", "expense", "food", 1.0, "USD", "2024-01-01", []) for _ in range(5)]
+    )
+    prompts = []
+    replies = iter(["", "q"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": prompts.append(prompt) or next(replies))
+
+    cli.list_all_transactions()
+
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == "Date: 2024-01-01, Total Amount: $5.00"
+    assert len(lines) == 1 + 4
+    assert len(prompts) == 2
+
+
+def test_parse_args_needs_no_manager(monkeypatch):
+    monkeypatch.setattr(FinanceManager, "__init__", lambda *args, **kwargs: pytest.fail())
+
+    args = FinanceCLI.parse_args(["--lazy", "import", "statement.csv", "--wallet", "Cash"])
+
+    assert (args.lazy, args.command, args.statements, args.wallet) == (
+        True,
+        "import",
+        ["statement.csv"],
+        "Cash",
+    )
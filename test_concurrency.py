@@ -0,0 +1,102 @@
+import multiprocessing
+import os
+
+import pytest
+
+from finance_manager import FinanceManager
+
+WRITERS = 8
+TRANSACTIONS_PER_WRITER = 25
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    return str(tmp_path / "finance_data.json")
+
+
+def open_manager(data_file, journal=True, **options):
+    return FinanceManager(data_file=data_file, journal=journal, concurrent=True, **options)
+
+
+def test_stale_manager_catches_up_from_the_journal(data_file, monkeypatch):
+    first = open_manager(data_file)
+    second = open_manager(data_file)
+    first.add_wallet("Cash", 100.0, "USD")
+    first.add_transaction("Cash", "expense", "food", 10.0, "USD", "2024-01-01")
+
+    def full_reload():
+        raise AssertionError("only the journal delta should be read")
+
+    monkeypatch.setattr(second, "load_from_file", full_reload)
+    second.add_transaction("Cash", "expense", "food", 5.0, "USD", "2024-01-02")
+
+    assert [t.id for t in second.transactions] == [1, 2]
+    assert second.get_balance("Cash") == 85.0
+    first.refresh()
+    assert [t.id for t in first.transactions] == [1, 2]
+
+
+def test_sqlite_rejects_concurrent_mode(tmp_path):
+    with pytest.raises(ValueError):
+        FinanceManager(data_file=str(tmp_path / "finance_data.db"), concurrent=True)
+
+
+def test_rewritten_snapshot_forces_a_full_reload(data_file):
+    first = open_manager(data_file, journal_max_bytes=1)
+    second = open_manager(data_file)
+    first.add_wallet("Cash", 100.0, "USD")
+    first.add_transaction("Cash", "income", "salary", 50.0, "USD", "2024-01-01")
+    assert os.path.getsize(data_file + ".journal") == 0
+
+    second.delete_transaction(1)
+
+    assert second.transactions == []
+    first.refresh()
+    assert first.transactions == []
+    assert first.get_balance("Cash") == 100.0
+
+
+def test_save_replaces_the_file_atomically(data_file):
+    manager = open_manager(data_file, journal=False)
+    manager.add_wallet("Cash", 100.0, "USD")
+    os.chmod(data_file, 0o640)
+
+    manager.save_to_file()
+
+    assert os.stat(data_file).st_mode & 0o777 == 0o640
+    assert sorted(os.listdir(os.path.dirname(data_file))) == [
+        "finance_data.json",
+        "finance_data.json.lock",
+    ]
+
+
+def write_transactions(data_file, journal, writer):
+    manager = open_manager(data_file, journal=journal, journal_max_bytes=2048)
+    for number in range(TRANSACTIONS_PER_WRITER):
+        manager.add_transaction(
+            "Cash", "expense", "food", 1.0, "USD", "2024-01-01", [f"writer-{writer}"]
+        )
+        if number % 10 == 0:
+            manager.edit_transaction(manager.transactions[-1].id, amount=1.0)
+
+
+@pytest.mark.parametrize("journal", [True, False])
+def test_concurrent_writers_lose_nothing(data_file, journal):
+    open_manager(data_file, journal=journal).add_wallet("Cash", 0.0, "USD")
+    context = multiprocessing.get_context("fork")
+    writers = [
+        context.Process(target=write_transactions, args=(data_file, journal, writer))
+        for writer in range(WRITERS)
+    ]
+    for process in writers:
+        process.start()
+    for process in writers:
+        process.join()
+    assert [process.exitcode for process in writers] == [0] * WRITERS
+
+    manager = FinanceManager(data_file=data_file, journal=journal)
+    ids = [t.id for t in manager.transactions]
+    assert sorted(ids) == list(range(1, WRITERS * TRANSACTIONS_PER_WRITER + 1))
+    for writer in range(WRITERS):
+        assert len(manager.search_transactions(f"writer-{writer}")) == TRANSACTIONS_PER_WRITER
+    assert manager.get_balance("Cash") == -WRITERS * TRANSACTIONS_PER_WRITER
@@ -1,14 +1,22 @@
+import os
+
 import pytest
 
+from balances import RunningTotals
 from finance_manager import FinanceManager
 
 
 @pytest.fixture
-def finance_manager():
-    manager = FinanceManager(data_file="test_data_file.json")
+def finance_manager(tmp_path):
+    manager = FinanceManager(data_file=str(tmp_path / "test_data_file.json"))
     return manager
 
 
+@pytest.fixture
+def journal_file(tmp_path):
+    return str(tmp_path / "journaled.json")
+
+
 def test_add_wallet(finance_manager):
     finance_manager.add_wallet("Test Wallet", 100.0, "USD")
     assert "Test Wallet" in finance_manager.wallets
@@ -49,5 +57,347 @@ def test_delete_custom_category(finance_manager):
     assert "snacks" not in finance_manager.available_tags["expense"]
 
 
+def test_rename_keeps_category_id_and_transactions(finance_manager):
+    finance_manager.add_wallet("Cash", 0.0, "USD")
+    finance_manager.add_custom_category("expense", "snacks", [])
+    finance_manager.add_transaction("Cash", "expense", "snacks", 2.0, "USD", "2024-01-01")
+    category = finance_manager.categories.get("expense", "snacks")
+
+    finance_manager.edit_custom_category("expense", "snacks", "treats")
+
+    assert finance_manager.categories.get("expense", "treats") is category
+    assert finance_manager.transactions[0].category_ref is category
+    assert finance_manager.transactions[0].category == "treats"
+    with pytest.raises(ValueError):
+        finance_manager.edit_custom_category("expense", "treats", "food")
+    finance_manager.add_transaction("Cash", "expense", "snacks", 1.0, "USD")
+    assert len(finance_manager.transactions) == 1
+
+
+def test_delete_category_reassigns_or_flags_transactions(journal_file):
+    manager = FinanceManager(data_file=journal_file, journal=True)
+    manager.add_wallet("Cash", 0.0, "USD")
+    manager.add_custom_category("expense", "snacks", [])
+    manager.add_custom_category("expense", "drinks", [])
+    manager.add_transaction("Cash", "expense", "snacks", 2.0, "USD", "2024-01-01")
+    manager.add_transaction("Cash", "expense", "drinks", 3.0, "USD", "2024-01-01")
+    manager.add_transaction("Cash", "expense", "food", 4.0, "USD", "2024-01-01")
+
+    manager.delete_custom_category("expense", "snacks", reassign_to="food")
+    manager.delete_custom_category("expense", "drinks")
+
+    for loaded in (manager, FinanceManager(data_file=journal_file, journal=True)):
+        assert [t.category for t in loaded.transactions] == ["food", "drinks", "food"]
+        assert [t.id for t in loaded.orphaned_transactions()] == [2]
+        assert loaded.custom_categories["expense"] == []
+        assert loaded.categories.get("expense", "drinks") is None
+    with pytest.raises(ValueError):
+        manager.delete_custom_category("expense", "food")
+
+
+def test_journal_appends_without_rewriting_snapshot(journal_file):
+    manager = FinanceManager(data_file=journal_file, journal=True)
+    manager.add_wallet("Test Wallet", 100.0, "USD")
+    manager.add_transaction("Test Wallet", "expense", "food", 20.0, "USD", "2024-01-01")
+    manager.edit_transaction(1, amount=25.0)
+
+    with open(manager.storage.journal_file) as file:
+        assert len(file.readlines()) == 3
+    with pytest.raises(FileNotFoundError):
+        open(journal_file)
+
+    reloaded = FinanceManager(data_file=journal_file, journal=True)
+    assert reloaded.wallets["Test Wallet"].initial_balance == 100.0
+    assert reloaded.wallets["Test Wallet"].balance == 75.0
+    assert [t.amount for t in reloaded.transactions] == [25.0]
+    assert reloaded.transaction_id_counter == 2
+
+
+def test_journal_compacts_past_threshold(journal_file):
+    manager = FinanceManager(data_file=journal_file, journal=True, journal_max_bytes=512)
+    manager.add_wallet("Test Wallet", 100.0, "USD")
+    for _ in range(10):
+        manager.add_transaction("Test Wallet", "expense", "food", 5.0, "USD")
+
+    with open(manager.storage.journal_file) as file:
+        assert len(file.readlines()) < 10
+    reloaded = FinanceManager(data_file=journal_file, journal=True)
+    assert [t.id for t in reloaded.transactions] == list(range(1, 11))
+
+
+def test_journal_ignores_torn_tail_record(journal_file):
+    manager = FinanceManager(data_file=journal_file, journal=True)
+    manager.add_wallet("Test Wallet", 100.0, "USD")
+    with open(manager.storage.journal_file, "a") as file:
+        file.write('{"op":"add_wallet","wallet":{"na')
+
+    reloaded = FinanceManager(data_file=journal_file, journal=True)
+    reloaded.add_wallet("Other Wallet")
+    assert set(FinanceManager(data_file=journal_file).wallets) == {
+        "Test Wallet",
+        "Other Wallet",
+    }
+
+
+def test_batch_persists_once(finance_manager, monkeypatch):
+    finance_manager.add_wallet("Test Wallet", 100.0, "USD")
+    saves = []
+    monkeypatch.setattr(finance_manager.storage, "save", saves.append)
+
+    with finance_manager.batch():
+        for _ in range(5):
+            finance_manager.add_transaction("Test Wallet", "expense", "food", 1.0, "USD")
+        assert saves == []
+    assert saves == [finance_manager]
+
+
+def test_batch_rolls_back_on_error(finance_manager):
+    finance_manager.add_wallet("Test Wallet", 100.0, "USD")
+
+    with pytest.raises(RuntimeError):
+        with finance_manager.batch():
+            finance_manager.add_transaction("Test Wallet", "expense", "food", 1.0, "USD")
+            raise RuntimeError("import aborted")
+
+    assert finance_manager.transactions == []
+    assert finance_manager.transaction_id_counter == 1
+
+
+def test_add_transactions_validates_every_row(finance_manager):
+    finance_manager.add_wallet("Test Wallet", 100.0, "USD")
+    rows = [
+        ("Test Wallet", "expense", "food", 10.0, "USD", "2024-01-01", ["groceries"]),
+        {"wallet_name": "Test Wallet", "transaction_type": "income",
+         "category": "salary", "amount": 900.0, "currency": "USD"},
+        ("Test Wallet", "expense", "yachts", 10.0, "USD"),
+    ]
+
+    with pytest.raises(ValueError, match="Row 2"):
+        finance_manager.add_transactions(rows)
+    assert finance_manager.transactions == []
+
+    assert finance_manager.add_transactions(rows[:2]) == 2
+    assert [t.category for t in finance_manager.transactions] == ["food", "salary"]
+
+
+def test_journaled_batch_is_one_record(journal_file):
+    manager = FinanceManager(data_file=journal_file, journal=True)
+    manager.add_wallet("Test Wallet", 100.0, "USD")
+    manager.add_transactions(
+        [("Test Wallet", "expense", "food", 1.0, "USD")] * 3
+    )
+
+    with open(manager.storage.journal_file) as file:
+        assert len(file.readlines()) == 2
+    assert len(FinanceManager(data_file=journal_file).transactions) == 3
+
+
+def test_journaled_batch_streams_its_records(journal_file):
+    manager = FinanceManager(data_file=journal_file, journal=True)
+    manager.add_wallet("Test Wallet", 100.0, "USD")
+    staging = manager.storage.journal_file + ".batch"
+
+    with manager.batch():
+        manager.add_transaction("Test Wallet", "expense", "food", 1.0, "USD")
+        manager.add_transaction("Test Wallet", "income", "salary", 5.0, "USD")
+        assert manager._pending_records == []
+        assert os.path.exists(staging) and manager.storage._staging.tell() > 0
+    with pytest.raises(RuntimeError):
+        with manager.batch():
+            manager.add_transaction("Test Wallet", "expense", "food", 2.0, "USD")
+            raise RuntimeError
+
+    assert not os.path.exists(staging)
+    with open(manager.storage.journal_file) as file:
+        assert len(file.readlines()) == 2
+    reloaded = FinanceManager(data_file=journal_file, journal=True)
+    assert [t.amount for t in reloaded.transactions] == [1.0, 5.0]
+
+
+def test_rejected_edit_changes_nothing(finance_manager):
+    finance_manager.add_wallet("Cash", 100.0, "USD")
+    finance_manager.add_transaction("Cash", "expense", "food", 20.0, "USD", "2024-01-02")
+    before = finance_manager.get_transaction(1).to_dict()
+
+    for updates in (
+        {"date": "01/02/2024"},
+        {"note": "x"},
+        {"amount": "lots"},
+        {"category": "rockets"},
+        {"transaction_type": "refund"},
+        {"wallet_name": "Nowhere"},
+        {"amount": 5.0, "tags": [1]},
+    ):
+        with pytest.raises(ValueError):
+            finance_manager.edit_transaction(1, **updates)
+
+    assert finance_manager.get_transaction(1).to_dict() == before
+    assert finance_manager.list_transactions() == [finance_manager.get_transaction(1)]
+    assert finance_manager.get_balance("Cash") == 80.0
+    finance_manager.add_transaction("Cash", "income", "salary", 5.0, "USD", "2024-01-03")
+    reloaded = FinanceManager(data_file=finance_manager.data_file)
+    assert [t.id for t in reloaded.transactions] == [1, 2]
+
+    assert finance_manager.edit_transaction(1, amount="25", date="2024-01-05")
+    assert finance_manager.get_transaction(1).amount == 25.0
+    assert finance_manager.get_balance("Cash") == 80.0
+
+
+@pytest.mark.parametrize("name", ["finance_data.json", "finance_data.db"])
+def test_failed_commit_leaves_memory_unchanged(tmp_path, monkeypatch, name):
+    manager = FinanceManager(data_file=str(tmp_path / name))
+    manager.add_wallet("Cash", 100.0, "USD")
+    manager.add_transaction("Cash", "expense", "food", 20.0, "USD", "2024-01-02")
+
+    def fail(manager, records):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(manager.storage, "commit", fail)
+    with pytest.raises(OSError):
+        manager.add_transaction("Cash", "expense", "food", 5.0, "USD", "2024-01-03")
+    with pytest.raises(OSError):
+        with manager.batch():
+            manager.add_transaction("Cash", "expense", "food", 5.0, "USD", "2024-01-03")
+    assert [t.id for t in manager.transactions] == [1]
+    assert manager.get_balance("Cash") == 80.0
+
+    monkeypatch.undo()
+    manager.add_transaction("Cash", "expense", "food", 5.0, "USD", "2024-01-03")
+    assert [t.id for t in FinanceManager(data_file=manager.data_file).transactions] == [1, 2]
+
+
+def test_indexes_follow_mutations(finance_manager):
+    finance_manager.add_wallet("Cash", 100.0, "USD")
+    finance_manager.add_wallet("Card", 0.0, "USD")
+    finance_manager.add_custom_category("expense", "snacks", ["sweet"])
+    finance_manager.add_transactions(
+        [
+            ("Cash", "expense", "snacks", 3.0, "USD", "2024-01-02", ["sweet"]),
+            ("Cash", "expense", "food", 9.0, "USD", "2024-01-01", ["groceries"]),
+            ("Card", "expense", "snacks", 4.0, "USD", "2024-01-03", ["sweet"]),
+        ]
+    )
+    index = finance_manager.index
+
+    finance_manager.edit_transaction(1, wallet_name="Card", tags=["salty"])
+    finance_manager.delete_transaction(2)
+    finance_manager.edit_custom_category("expense", "snacks", "treats")
+
+    assert finance_manager.get_transaction(2) is None
+    assert [t.id for t in index.iter_window("Card")] == [1, 3]
+    assert list(index.iter_window("Cash")) == []
+    assert {tag: list(ids) for tag, ids in index.by_tag.items()} == {
+        "salty": [1],
+        "sweet": [3],
+    }
+    assert index.tag_names == ["salty", "sweet"]
+    assert {(c.transaction_type, c.name): ids for c, ids in index.by_category.items()} == {
+        ("expense", "treats"): {1, 3}
+    }
+    assert {t.category for t in finance_manager.transactions} == {"treats"}
+
+
+def test_list_wallet_transactions_in_date_window(finance_manager):
+    finance_manager.add_wallet("Cash", 100.0, "USD")
+    finance_manager.add_transactions(
+        [
+            ("Cash", "expense", "food", amount, "USD", date, [])
+            for amount, date in [(1.0, "2024-01-03"), (2.0, "2024-01-01"), (4.0, "2024-01-02")]
+        ]
+    )
+
+    window = finance_manager.list_transactions("Cash", "2024-01-02", "2024-01-03")
+
+    assert [(t.date, t.amount) for t in window] == [("2024-01-02", 4.0), ("2024-01-03", 1.0)]
+
+
+def test_transactions_stay_in_date_order(finance_manager):
+    finance_manager.add_wallet("Cash", 100.0, "USD")
+    finance_manager.add_wallet("Card", 0.0, "USD")
+    finance_manager.add_transactions(
+        [
+            ("Cash", "expense", "food", 1.0, "USD", "2024-02-01", []),
+            ("Card", "expense", "food", 2.0, "USD", "2024-01-15", []),
+            ("Cash", "expense", "food", 4.0, "USD", "2024-01-15", []),
+            ("Card", "expense", "food", 8.0, "USD", "2024-03-01", []),
+        ]
+    )
+    finance_manager.edit_transaction(4, date="2024-01-01")
+
+    assert [t.id for t in finance_manager.transactions] == [4, 2, 3, 1]
+    reloaded = FinanceManager(data_file=finance_manager.data_file)
+    assert [t.id for t in reloaded.transactions] == [4, 2, 3, 1]
+
+    window = finance_manager.list_transactions(start_date="2024-01-10", end_date="2024-01-31")
+    assert [t.id for t in window] == [2, 3]
+
+
+def test_query_transactions_pages_with_a_cursor(finance_manager):
+    finance_manager.add_wallet("Cash", 100.0, "USD")
+    finance_manager.add_wallet("Card", 0.0, "USD")
+    finance_manager.add_transactions(
+        [
+            ("Card" if day % 3 else "Cash", "expense", "food", 1.0, "USD", f"2024-01-{day:02d}", [])
+            for day in range(1, 11)
+            for _ in range(2)
+        ]
+    )
+    query = finance_manager.query_transactions
+
+    pages, after = [], None
+    while True:
+        page = list(query(limit=3, after=after))
+        if not page:
+            break
+        pages.append([t.id for t in page])
+        after = (page[-1].date, page[-1].id)
+    assert sum(pages, []) == [t.id for t in finance_manager.transactions]
+    assert [len(page) for page in pages] == [3] * 6 + [2]
+
+    newest = list(query("Cash", descending=True, limit=2))
+    assert [(t.date, t.id) for t in newest] == [("2024-01-09", 18), ("2024-01-09", 17)]
+    older = query("Cash", "2024-01-03", descending=True, after=(newest[-1].date, newest[-1].id))
+    assert [t.id for t in older] == [12, 11, 6, 5]
+
+
+def test_balances_follow_transactions(finance_manager):
+    finance_manager.add_wallet("Cash", 100.0, "USD")
+    finance_manager.add_transactions(
+        [
+            ("Cash", "income", "salary", 500.0, "USD", "2024-01-01", []),
+            ("Cash", "expense", "food", 20.0, "USD", "2024-01-03", []),
+            ("Cash", "expense", "food", 30.0, "USD", "2023-12-15", []),
+            ("Cash", "expense", "health", 5.0, "USD", "2024-06-01", []),
+        ]
+    )
+    finance_manager.edit_transaction(2, amount=25.0)
+    finance_manager.delete_transaction(4)
+
+    assert finance_manager.get_balance("Cash") == 545.0
+    assert finance_manager.get_balance("Cash", as_of="2023-12-01") == 100.0
+    assert finance_manager.get_balance("Cash", as_of="2024-01-02") == 570.0
+    assert finance_manager.get_balance("Cash", as_of="2030-01-01") == 545.0
+
+    reloaded = FinanceManager(data_file=finance_manager.data_file)
+    assert reloaded.wallets["Cash"].balance == 545.0
+    assert reloaded.get_balance("Cash", as_of="2024-01-02") == 570.0
+
+
+def test_running_totals_grow_geometrically(monkeypatch):
+    rebuilds = []
+    rebuild = RunningTotals._rebuild
+    monkeypatch.setattr(RunningTotals, "_rebuild", lambda self: rebuilds.append(rebuild(self)))
+    totals = RunningTotals()
+
+    # Newest first, as a bank statement lists them.
+    for day in range(10_000, 0, -1):
+        totals.add(day, 1.0)
+
+    assert len(rebuilds) < 15
+    assert totals.total_as_of(0) == 0.0
+    assert totals.total_as_of(2_500) == 2_500.0
+    assert totals.total_as_of(20_000) == 10_000.0
+
+
 if __name__ == "__main__":
     pytest.main()
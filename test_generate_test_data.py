@@ -0,0 +1,91 @@
+import os
+import sys
+
+import pytest
+
+from finance_manager import FinanceManager
+from generate_test_data import ensure_wallets_exist, generate_transactions, main, write_ledger
+
+
+def make_config(**overrides):
+    config = {
+        "wallet_names": ["Cash", "Card"],
+        "categories": "",
+        "transactions_per_day": "1-3",
+        "tags": "",
+        "amount_range": "10-100",
+        "start_date": "2023-01-01",
+        "end_date": "2023-04-15",
+        "seed": 7,
+    }
+    config.update(overrides)
+    return config
+
+
+def generate_file(path, workers, format="compact", config=None):
+    manager = FinanceManager(data_file=str(path), format=format)
+    config = config or make_config()
+    ensure_wallets_exist(manager, config["wallet_names"], config["seed"])
+    return write_ledger(manager, config, workers)
+
+
+@pytest.mark.parametrize("format", ["compact", "orjson"])
+def test_workers_write_identical_ledgers(tmp_path, format):
+    single = generate_file(tmp_path / "single.json", 1, format)
+    parallel = generate_file(tmp_path / "parallel.json", 3, format)
+    assert single == parallel
+    assert (tmp_path / "single.json").read_bytes() == (tmp_path / "parallel.json").read_bytes()
+
+
+@pytest.mark.parametrize("format", ["pretty", "compact", "binary"])
+def test_written_ledger_loads(tmp_path, format):
+    path = tmp_path / "finance_data.json"
+    count = generate_file(path, 2, format)
+    manager = FinanceManager(data_file=str(path))
+    assert len(manager.transactions) == count
+    # Two wallets, one to three rows a day, 105 days.
+    assert 210 <= count <= 630
+    assert manager.transaction_id_counter == count + 1
+    assert [t.id for t in manager.transactions] == list(range(1, count + 1))
+    assert manager.transactions[0].date == "2023-01-01"
+    assert manager.transactions[-1].date == "2023-04-15"
+    for transaction in manager.transactions:
+        assert transaction.category in manager.list_categories(transaction.transaction_type)
+        assert 10 <= transaction.amount <= 100
+    assert manager.wallets["Cash"].initial_balance >= 1000
+
+
+def test_seed_changes_rows(tmp_path):
+    generate_file(tmp_path / "a.json", 1)
+    generate_file(tmp_path / "b.json", 1, config=make_config(seed=8))
+    assert (tmp_path / "a.json").read_bytes() != (tmp_path / "b.json").read_bytes()
+
+
+def test_generate_transactions_extends_existing_ledger(tmp_path):
+    manager = FinanceManager(data_file=str(tmp_path / "finance_data.json"))
+    manager.add_wallet("Cash", 10)
+    manager.add_transaction("Cash", "income", "salary", 5, "USD", "2022-12-31", [])
+    config = make_config(wallet_names=["Cash"], categories=["food", "salary"], tags=["x"])
+
+    count = generate_transactions(manager, config)
+
+    reloaded = FinanceManager(data_file=str(tmp_path / "finance_data.json"))
+    assert len(reloaded.transactions) == count + 1
+    assert {t.category for t in reloaded.transactions} == {"food", "salary"}
+    assert {tuple(t.tags) for t in reloaded.transactions[1:]} == {("x",)}
+
+
+@pytest.mark.parametrize("output", ["ledger", "ledger" + os.sep])
+def test_main_fills_a_segmented_directory(tmp_path, monkeypatch, output):
+    data_file = str(tmp_path / output)
+    if not output.endswith(os.sep):
+        os.mkdir(data_file)
+    argv = ["generate_test_data.py", "--start_date", "2023-01-01", "--end_date", "2023-02-15"]
+    monkeypatch.setattr(sys, "argv", argv + ["--output", data_file, "--workers", "2"])
+    main()
+
+    manager = FinanceManager(data_file=data_file)
+    assert 46 <= len(manager.transactions) <= 138
+    assert not any(name.endswith(".tmp") for name in os.listdir(tmp_path))
+    with pytest.raises(ValueError):
+        write_ledger(FinanceManager(data_file=str(tmp_path / "other") + os.sep), make_config())
@@ -0,0 +1,49 @@
+import pytest
+
+from finance_manager import FinanceManager
+from instrumentation import ENV_VAR, Stats
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    return str(tmp_path / "finance_data.json")
+
+
+def test_stats_are_off_by_default(data_file, monkeypatch):
+    monkeypatch.delenv(ENV_VAR, raising=False)
+
+    assert FinanceManager(data_file=data_file).stats is None
+
+
+def test_public_methods_are_recorded(data_file, monkeypatch):
+    monkeypatch.setenv(ENV_VAR, "1")
+    manager = FinanceManager(data_file=data_file, journal=True)
+    manager.add_wallet("Cash", 100.0, "USD")
+    manager.add_transactions(
+        [("Cash", "expense", "food", 1.0, "USD", "2024-01-01", []) for _ in range(3)]
+    )
+    manager.list_transactions()
+    manager.list_transactions("Cash")
+
+    stats = manager.stats.as_dict()
+
+    assert stats["load_from_file"]["calls"] == 1
+    assert stats["add_transactions"]["rows"] == 3
+    assert stats["add_transactions"]["bytes_written"] > 0
+    assert stats["list_transactions"]["calls"] == 2
+    assert stats["list_transactions"]["rows"] == 6
+    assert stats["list_transactions"]["bytes_written"] == 0
+    assert "list_transactions" in manager.stats.report()
+
+
+def test_percentiles():
+    stats = Stats()
+    for milliseconds in range(1, 101):
+        stats.record("get_balance", milliseconds / 1000)
+
+    method = stats.as_dict()["get_balance"]
+
+    assert method["calls"] == 100
+    assert method["total_ms"] == pytest.approx(5050)
+    assert method["p50_ms"] == pytest.approx(51)
+    assert method["p99_ms"] == pytest.approx(100)
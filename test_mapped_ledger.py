@@ -0,0 +1,108 @@
+import pytest
+
+from finance_manager import FinanceManager
+from mapped_ledger import MappedLedger
+
+
+def transaction_data(transactions):
+    return [transaction.to_dict() for transaction in transactions]
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    data_file = str(tmp_path / "finance_data.bin")
+    manager = FinanceManager(data_file=data_file, journal=True, format="binary")
+    manager.add_wallet("Cash", 100.0, "USD")
+    manager.add_wallet("Card", 0.0, "EUR")
+    manager.add_custom_category("expense", "snacks", [])
+    manager.add_transactions(
+        [
+            ("Cash", "expense", "food", 10.0, "USD", "2024-01-03", ["groceries"]),
+            ("Card", "expense", "snacks", 4.5, "EUR", "2024-01-01", ["chips", "organic"]),
+            ("Cash", "income", "salary", 900.0, "USD", "2024-01-31", []),
+            ("Card", "expense", "food", 20.0, "EUR", "2024-01-03", ["groceries", "organic"]),
+            ("Cash", "expense", "health", 7.0, "USD", "2024-02-10", ["pharmacy"]),
+        ]
+    )
+    manager.compact()
+    return data_file
+
+
+def test_reads_match_the_manager(data_file):
+    manager = FinanceManager(data_file=data_file)
+    ledger = MappedLedger(data_file)
+
+    assert len(ledger) == 5
+    assert transaction_data(ledger.list_transactions()) == transaction_data(
+        manager.list_transactions()
+    )
+    for wallet, start, end in (("Card", None, None), (None, "2024-01-03", "2024-01-31")):
+        assert transaction_data(ledger.list_transactions(wallet, start, end)) == transaction_data(
+            manager.list_transactions(wallet, start, end)
+        )
+    for after, descending in ((("2024-01-03", 1), False), (("2024-01-31", 3), True)):
+        assert transaction_data(
+            ledger.query_transactions(after=after, descending=descending, limit=2)
+        ) == transaction_data(
+            manager.query_transactions(after=after, descending=descending, limit=2)
+        )
+    assert ledger.get_transaction(4).to_dict() == manager.get_transaction(4).to_dict()
+    assert ledger.get_transaction(99) is None
+    assert ledger.search_expenses_by_tag("organic") == manager.search_expenses_by_tag("organic")
+    for query, category in (("groceries AND NOT organic", None), ("org* OR chips", "snacks")):
+        assert transaction_data(
+            ledger.search_transactions(query, category=category)
+        ) == transaction_data(manager.search_transactions(query, category=category))
+
+
+def test_only_touched_records_are_decoded(data_file):
+    ledger = MappedLedger(data_file)
+    assert ledger._decoded == {}
+
+    ledger.get_transaction(3)
+    assert len(ledger._decoded) == 1
+    assert ledger.search_expenses_by_tag("pharmacy")[0]["amount"] == 7.0
+    assert len(ledger._decoded) == 2
+
+
+def test_tail_changes_are_overlaid(data_file):
+    manager = FinanceManager(data_file=data_file, journal=True, format="binary")
+    manager.edit_transaction(1, date="2024-03-01", tags=["takeaway"])
+    manager.delete_transaction(3)
+    manager.edit_custom_category("expense", "snacks", "treats")
+    manager.add_transaction("Cash", "expense", "food", 3.0, "USD", "2024-01-02", ["organic"])
+    ledger = MappedLedger(data_file)
+
+    assert len(ledger) == 5
+    assert transaction_data(ledger.list_transactions()) == transaction_data(
+        manager.list_transactions()
+    )
+    assert [t.id for t in ledger.search_transactions("organic OR takeaway")] == [1, 2, 4, 6]
+    assert ledger.search_transactions("organic", category="treats").ids.tolist() == [2]
+
+    manager.delete_custom_category("expense", "treats", reassign_to="food")
+    ledger.refresh()
+    assert [t.category for t in ledger.list_transactions(end_date="2024-01-03")] == ["food"] * 3
+    assert ledger.search_transactions("organic", category="food").ids.tolist() == [2, 4, 6]
+
+
+def test_append_then_compact(data_file):
+    ledger = MappedLedger(data_file)
+
+    assert ledger.append("Card", "expense", "snacks", 2.0, "EUR", "2024-01-02", ["chips"]) == 6
+    assert ledger.append("Nowhere", "expense", "snacks", 2.0, "EUR") is None
+    assert ledger.append("Card", "expense", "rockets", 2.0, "EUR") is None
+    assert [t.id for t in ledger.list_transactions("Card")] == [2, 6, 4]
+    assert ledger.search_transactions("chips").ids.tolist() == [2, 6]
+
+    manager = FinanceManager(data_file=data_file, journal=True)
+    assert transaction_data(manager.list_transactions()) == transaction_data(
+        ledger.list_transactions()
+    )
+    ledger.compact()
+    assert ledger.tail == []
+    assert ledger.append("Cash", "income", "salary", 1.0, "USD", "2024-03-01") == 7
+    assert [t.id for t in MappedLedger(data_file).list_transactions(start_date="2024-02-01")] == [
+        5,
+        7,
+    ]
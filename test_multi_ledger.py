@@ -0,0 +1,63 @@
+import pytest
+
+from finance_manager import FinanceManager
+from multi_ledger import analyze_ledgers, main
+from reports import summarize
+
+
+@pytest.fixture
+def data_files(tmp_path):
+    data_files = []
+    for number in range(3):
+        data_file = str(tmp_path / f"ledger{number}.json")
+        manager = FinanceManager(data_file=data_file)
+        manager.add_wallet("Cash", 0.0, "USD")
+        manager.add_transactions(
+            [
+                (
+                    "Cash",
+                    "expense",
+                    "food",
+                    1.0 + day + number,
+                    "USD",
+                    f"2024-0{1 + day % 3}-0{1 + day}",
+                    ["groceries"],
+                )
+                for day in range(6)
+            ]
+            + [("Cash", "income", "salary", 100.0 * (number + 1), "USD", "2024-01-31", [])]
+        )
+        data_files.append(data_file)
+    return data_files
+
+
+def test_parallel_matches_sequential(data_files):
+    sequential = analyze_ledgers(data_files, workers=1)
+    parallel = analyze_ledgers(data_files, workers=3)
+
+    for group_by in (["ledger", "category", "month"], ["month"], ["transaction_type"]):
+        assert parallel.summarize(group_by) == sequential.summarize(group_by)
+    assert parallel.tag_counts() == sequential.tag_counts() == {"groceries": 18}
+
+
+def test_merged_totals_match_each_ledger(data_files):
+    analytics = analyze_ledgers(data_files, workers=2)
+
+    for data_file in data_files:
+        own = summarize(FinanceManager(data_file=data_file), ["category", "month"])
+        rows = analytics.summarize(["ledger", "category", "month"], start="2024-01")
+        assert [dict(row, ledger=data_file) for row in own] == [
+            row for row in rows if row["ledger"] == data_file
+        ]
+    salary = analytics.summarize(["category"], end="2024-01")[-1]
+    assert salary == {"category": "salary", "total": 600.0, "count": 3, "min": 100.0, "max": 300.0}
+
+
+def test_main_prints_rows_and_tags(data_files, capsys):
+    main(data_files + ["--workers", "2", "--group_by", "transaction_type"])
+
+    assert capsys.readouterr().out.splitlines() == [
+        "expense: Total 81.00 | Count 18 | Min 1.00 | Max 8.00",
+        "income: Total 600.00 | Count 3 | Min 100.00 | Max 300.00",
+        "Tag groceries: 18",
+    ]
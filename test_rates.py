@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+from cli_application import FinanceCLI
+from finance_manager import FinanceManager
+from rates import RateTable
+from reports import summarize
+
+
+@pytest.fixture
+def rates_file(tmp_path):
+    path = tmp_path / "rates.csv"
+    path.write_text(
+        "date,base,quote,rate\n"
+        "2024-01-01,EUR,USD,1.10\n"
+        "2024-02-01,EUR,USD,1.20\n"
+        "2024-01-01,GBP,USD,1.25\n"
+    )
+    return str(path)
+
+
+@pytest.fixture
+def manager(tmp_path, rates_file):
+    manager = FinanceManager(data_file=str(tmp_path / "finance_data.json"))
+    manager.load_rates(rates_file)
+    manager.add_wallet("Cash", 0.0, "USD")
+    manager.add_wallet("Euro", 0.0, "EUR")
+    manager.add_transactions(
+        [
+            ("Cash", "expense", "food", 4.0, "USD", "2024-01-15", []),
+            ("Euro", "expense", "food", 10.0, "EUR", "2024-01-15", []),
+            ("Euro", "expense", "food", 10.0, "EUR", "2024-02-10", []),
+        ]
+    )
+    return manager
+
+
+def test_lookup_uses_latest_rate_inverse_and_cross_rates(rates_file):
+    rates = RateTable.from_file(rates_file)
+
+    assert rates.rate("EUR", "USD", "2024-01-31") == 1.10
+    assert rates.rate("EUR", "USD", "2024-03-01") == 1.20
+    assert rates.rate("USD", "EUR", "2024-02-01") == pytest.approx(1 / 1.20)
+    assert rates.rate("EUR", "GBP", "2024-01-02") == pytest.approx(1.10 / 1.25)
+    assert rates.convert(5.0, "USD", "USD", "1999-01-01") == 5.0
+    with pytest.raises(ValueError):
+        rates.rate("EUR", "USD", "2023-12-31")
+    with pytest.raises(ValueError):
+        rates.rate("EUR", "JPY", "2024-01-02")
+
+
+def test_json_rates_match_csv(tmp_path, rates_file):
+    path = tmp_path / "rates.json"
+    path.write_text(
+        json.dumps({"base": "USD", "rates": {"2024-01-01": {"EUR": 0.5, "GBP": 0.8}}})
+    )
+    rates = RateTable.from_file(str(path))
+
+    assert rates.rate("EUR", "USD", "2024-06-01") == 2.0
+    assert rates.rate("GBP", "EUR", "2024-06-01") == pytest.approx(0.625)
+
+
+def test_convert_all_matches_single_conversions(manager):
+    converted = manager.rates.convert_all(manager.transactions, "USD")
+
+    assert converted == pytest.approx([4.0, 11.0, 12.0])
+    assert converted == pytest.approx(
+        [manager.rates.convert(t.amount, t.currency, "USD", t.date) for t in manager.transactions]
+    )
+
+
+def test_list_transactions_in_base_currency(manager, monkeypatch, capsys):
+    replies = iter(["", "usd"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(replies))
+    cli = FinanceCLI(manager)
+
+    cli.list_all_transactions()
+    mixed = capsys.readouterr().out.splitlines()
+    cli.list_all_transactions()
+    converted = capsys.readouterr().out.splitlines()
+
+    assert mixed[0] == "Date: 2024-01-15, Total Amount: $4.00 + 10.00 EUR"
+    assert converted[0] == "Date: 2024-01-15, Total Amount: $15.00"
+    assert converted[-1] == "  - Wallet: Euro, Category: food, Amount: $12.00"
+
+
+def test_summarize_in_base_currency(manager):
+    assert summarize(manager, ["currency"]) == [
+        {"currency": "EUR", "total": 20.0, "count": 2, "min": 10.0, "max": 10.0},
+        {"currency": "USD", "total": 4.0, "count": 1, "min": 4.0, "max": 4.0},
+    ]
+    assert summarize(manager, ["month"], base_currency="USD") == [
+        {"month": "2024-01", "total": 15.0, "count": 2, "min": 4.0, "max": 11.0},
+        {"month": "2024-02", "total": 12.0, "count": 1, "min": 12.0, "max": 12.0},
+    ]
+    manager.rates = None
+    with pytest.raises(ValueError):
+        summarize(manager, ["month"], base_currency="USD")
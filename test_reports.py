@@ -0,0 +1,75 @@
+import pytest
+
+from finance_manager import FinanceManager, Transaction
+from reports import cube_key, summarize
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = FinanceManager(data_file=str(tmp_path / "finance_data.json"))
+    manager.add_wallet("Cash", 100.0, "USD")
+    manager.add_wallet("Card", 0.0, "USD")
+    manager.add_custom_category("expense", "snacks", [])
+    manager.add_transactions(
+        [
+            ("Cash", "expense", "food", 10.0, "USD", "2024-01-05", []),
+            ("Cash", "expense", "food", 30.0, "USD", "2024-01-20", []),
+            ("Card", "expense", "food", 5.0, "USD", "2024-02-02", []),
+            ("Card", "expense", "snacks", 2.0, "USD", "2024-02-03", []),
+            ("Cash", "income", "salary", 900.0, "USD", "2024-02-01", []),
+        ]
+    )
+    return manager
+
+
+def named_cells(manager):
+    return {
+        (wallet, transaction_type, category.name, month, currency): cell
+        for (wallet, transaction_type, category, month, currency), cell
+        in manager.aggregates.items()
+    }
+
+
+def test_summarize_groups_and_filters(manager):
+    assert summarize(manager, ["transaction_type", "month"]) == [
+        {"transaction_type": "expense", "month": "2024-01", "total": 40.0, "count": 2, "min": 10.0, "max": 30.0},
+        {"transaction_type": "expense", "month": "2024-02", "total": 7.0, "count": 2, "min": 2.0, "max": 5.0},
+        {"transaction_type": "income", "month": "2024-02", "total": 900.0, "count": 1, "min": 900.0, "max": 900.0},
+    ]
+    assert summarize(manager, ["category"], start="2024-02", wallet="Card") == [
+        {"category": "food", "total": 5.0, "count": 1, "min": 5.0, "max": 5.0},
+        {"category": "snacks", "total": 2.0, "count": 1, "min": 2.0, "max": 2.0},
+    ]
+    with pytest.raises(ValueError):
+        summarize(manager, ["year"])
+
+
+def test_aggregates_follow_mutations(manager):
+    manager.delete_transaction(2)
+    manager.edit_transaction(3, date="2024-01-31", wallet_name="Cash")
+    manager.edit_custom_category("expense", "snacks", "treats")
+
+    assert summarize(manager, ["wallet", "category", "month"], end="2024-01") == [
+        {"wallet": "Cash", "category": "food", "month": "2024-01", "total": 15.0, "count": 2, "min": 5.0, "max": 10.0},
+    ]
+    assert summarize(manager, ["category"], start="2024-02")[-1]["category"] == "treats"
+    reloaded = FinanceManager(data_file=manager.data_file)
+    assert named_cells(manager) == named_cells(reloaded)
+
+
+def test_unpadded_dates_are_filed_under_their_month(manager):
+    manager.add_transaction("Cash", "expense", "food", 4.0, "USD", "2024-1-7")
+    manager.edit_transaction(1, date="2024-2-9")
+
+    assert [t.date for t in manager.list_transactions(start_date="2024-01-07")][:2] == [
+        "2024-01-07",
+        "2024-01-20",
+    ]
+    assert summarize(manager, ["month"], wallet="Cash") == [
+        {"month": "2024-01", "total": 34.0, "count": 2, "min": 4.0, "max": 30.0},
+        {"month": "2024-02", "total": 910.0, "count": 2, "min": 10.0, "max": 900.0},
+    ]
+    reloaded = FinanceManager(data_file=manager.data_file)
+    assert named_cells(manager) == named_cells(reloaded)
+    # Ledgers saved before dates were padded still file them by month.
+    assert cube_key(Transaction(9, "Cash", "expense", "food", 1.0, "USD", "2024-1-5"))[3] == "2024-01"
@@ -0,0 +1,64 @@
+import io
+import json
+
+import pytest
+
+import serializers
+from finance_manager import FinanceManager
+from serializers import SERIALIZERS, BinarySerializer, get_serializer, orjson
+
+FORMATS = [name for name in SERIALIZERS if name != "orjson" or orjson is not None]
+
+
+def build_ledger(path, format):
+    manager = FinanceManager(data_file=str(path), format=format)
+    manager.add_wallet("Cash", 100.0, "USD")
+    manager.add_wallet("Épargne", 10.0, "EUR")
+    manager.add_custom_category("expense", "café ☕", ["crème", ""])
+    manager.add_transactions(
+        [
+            ("Cash", "expense", "food", 12.5, "USD", "2024-01-01", ["groceries"]),
+            ("Épargne", "expense", "café ☕", 0.1, "EUR", "2023-12-31", ["crème", ""]),
+            ("Cash", "income", "salary", 1e6 / 3, "USD", "2024-01-05", []),
+        ]
+    )
+    manager.set_default_wallet("Épargne")
+    return manager
+
+
+@pytest.mark.parametrize("rows_per_write", [1, 2, 10_000])
+@pytest.mark.parametrize("format", FORMATS)
+def test_round_trip(tmp_path, monkeypatch, format, rows_per_write):
+    monkeypatch.setattr(serializers, "ROWS_PER_WRITE", rows_per_write)
+    manager = build_ledger(tmp_path / "finance_data", format)
+
+    reloaded = FinanceManager(data_file=manager.data_file)
+
+    assert reloaded.to_dict() == manager.to_dict()
+    assert reloaded.wallets["Épargne"].balance == manager.wallets["Épargne"].balance
+
+
+@pytest.mark.parametrize("format", [name for name in FORMATS if name != "binary"])
+def test_json_formats_match_pretty_output(tmp_path, format):
+    manager = build_ledger(tmp_path / "finance_data", "pretty")
+    data = manager.to_dict(include_transactions=False)
+    outputs = {}
+    for name in ("pretty", format):
+        file = io.BytesIO()
+        get_serializer(name).dump(data, manager.transactions, file)
+        outputs[name] = json.loads(file.getvalue())
+
+    assert outputs[format] == outputs["pretty"]
+
+
+def test_binary_layout_has_id_index(tmp_path):
+    manager = build_ledger(tmp_path / "finance_data", "binary")
+    with open(manager.data_file, "rb") as file:
+        layout = BinarySerializer.read_layout(file.read())
+
+    assert layout.record_count == 3
+    assert [record[0] for record in layout.records()] == [2, 1, 3]
+    entries = BinarySerializer.ID_ENTRY.iter_unpack(
+        layout.view[layout.id_index_offset : layout.id_index_offset + 3 * BinarySerializer.ID_ENTRY.size]
+    )
+    assert list(entries) == [(1, 1), (2, 0), (3, 2)]
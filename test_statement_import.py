@@ -0,0 +1,133 @@
+import pytest
+
+from cli_application import import_statements
+from finance_manager import FinanceManager
+from statement_import import StatementImporter, load_rules, parse_amount
+
+STATEMENT = """Date,Description,Amount,Tags
+2024-01-02,TESCO STORES 123,-12.50,groceries
+2024-01-02,TESCO STORES 123,-12.50,groceries
+2024-01-03,ACME PAYROLL,"1,500.00",
+2024-01-04,UNKNOWN SHOP,-3.00,
+2024-13-01,TESCO STORES 124,-1.00,
+2024-01-05,PHARMACY PLUS,oops,
+"""
+
+OFX = """<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS>
+<CURDEF>EUR</CURDEF>
+<BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT</TRNTYPE><DTPOSTED>20240210120000</DTPOSTED>
+<TRNAMT>-7.25</TRNAMT><NAME>Pharmacy Plus</NAME><MEMO>card 1234</MEMO></STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT</TRNTYPE><DTPOSTED>20240211</DTPOSTED>
+<TRNAMT>40.00</TRNAMT><NAME>Dividend</NAME></STMTTRN>
+</BANKTRANLIST>
+</STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+RULES = """pattern,category,transaction_type
+tesco|sainsbury,food,expense
+payroll,salary,
+pharmacy,health,
+dividend,investment income,income
+"""
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = FinanceManager(data_file=str(tmp_path / "finance_data.json"), journal=True)
+    manager.add_wallet("Cash", 100.0, "GBP")
+    manager.set_default_wallet("Cash")
+    return manager
+
+
+@pytest.fixture
+def files(tmp_path):
+    paths = {}
+    for name, text in (("statement.csv", STATEMENT), ("statement.ofx", OFX), ("rules.csv", RULES)):
+        paths[name] = str(tmp_path / name)
+        with open(paths[name], "w") as file:
+            file.write(text)
+    return paths
+
+
+def test_parse_amount():
+    assert parse_amount("-1,234.50") == -1234.5
+    assert parse_amount("$12") == 12.0
+    assert parse_amount("(12.00)") == -12.0
+    with pytest.raises(ValueError):
+        parse_amount("")
+
+
+def test_pipeline_imports_valid_rows_once(manager, files):
+    journal_lines = len(open(manager.storage.journal_file).readlines())
+    importer = StatementImporter(manager, rules=load_rules(files["rules.csv"]))
+    report = importer.run([files["statement.csv"], files["statement.ofx"]])
+
+    assert (report.read, report.imported, report.duplicates, report.rejected) == (8, 5, 0, 3)
+    assert [reason for _, reason in report.errors] == [
+        "no rule matches 'UNKNOWN SHOP'",
+        "bad date '2024-13-01'",
+        "bad amount 'oops'",
+    ]
+    assert report.errors[0][0] == files["statement.csv"] + ":5"
+    assert [
+        (t.transaction_type, t.category, t.amount, t.currency, t.date, t.tags)
+        for t in manager.list_transactions()
+    ] == [
+        ("expense", "food", 12.5, "GBP", "2024-01-02", ["groceries"]),
+        ("expense", "food", 12.5, "GBP", "2024-01-02", ["groceries"]),
+        ("income", "salary", 1500.0, "GBP", "2024-01-03", []),
+        ("expense", "health", 7.25, "EUR", "2024-02-10", []),
+        ("income", "investment income", 40.0, "EUR", "2024-02-11", []),
+    ]
+    # All rows were persisted as one journal record.
+    assert len(open(manager.storage.journal_file).readlines()) == journal_lines + 1
+
+    again = StatementImporter(manager, rules=load_rules(files["rules.csv"]))
+    report = again.run([files["statement.csv"], files["statement.ofx"]])
+    assert (report.imported, report.duplicates, report.rejected) == (0, 5, 3)
+    assert len(FinanceManager(data_file=manager.storage.data_file).transactions) == 5
+
+
+def test_validation_uses_the_ledger(manager, files, tmp_path):
+    statement = str(tmp_path / "other.csv")
+    with open(statement, "w") as file:
+        file.write(
+            "date,amount,type,category,wallet\n"
+            "05/01/2024,9.99,debit,snacks,Cash\n"
+            "06/01/2024,5.00,expense,food,Savings\n"
+            "07/01/2024,0,expense,food,Cash\n"
+            "08/01/2024,4.00,refund,food,Cash\n"
+        )
+    report = StatementImporter(manager, date_format="%d/%m/%Y").run([statement])
+    assert [reason for _, reason in report.errors] == [
+        "'snacks' is not an expense category",
+        "wallet 'Savings' does not exist",
+        "amount is zero",
+        "unknown type 'refund'",
+    ]
+
+    manager.add_custom_category("expense", "snacks", [])
+    report = StatementImporter(manager, date_format="%d/%m/%Y").run([statement])
+    assert report.imported == 1
+    assert manager.get_transaction(1).date == "2024-01-05"
+
+
+def test_unreadable_statement_imports_nothing(manager, files, tmp_path):
+    broken = str(tmp_path / "broken.xml")
+    with open(broken, "w") as file:
+        file.write(OFX[: OFX.index("</BANKTRANLIST>")])
+
+    importer = StatementImporter(manager, rules=load_rules(files["rules.csv"]))
+    with pytest.raises(SyntaxError):
+        importer.run([files["statement.csv"], broken])
+    assert manager.list_transactions() == []
+
+
+def test_cli_reports_rows(manager, files, capsys):
+    import_statements(manager, [files["statement.ofx"]], rules=files["rules.csv"])
+
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 1
+    assert lines[0].startswith("Imported 2 of 2 rows (0 duplicates, 0 rejected) in ")
+    assert lines[0].endswith(" rows/s.")
@@ -0,0 +1,273 @@
+import json
+import os
+
+import pytest
+
+from finance_manager import FinanceManager
+from reports import summarize
+from serializers import JSONStream
+from storage import SegmentedStorage, SQLiteStorage, migrate
+
+
+@pytest.fixture
+def sqlite_manager(tmp_path):
+    manager = FinanceManager(data_file=str(tmp_path / "finance_data.db"))
+    manager.add_wallet("Cash", 100.0, "USD")
+    manager.add_wallet("Card", 0.0, "EUR")
+    manager.add_transactions(
+        [
+            ("Cash", "expense", "food", 12.5, "USD", "2024-01-01", ["groceries"]),
+            ("Card", "expense", "food", 40.0, "EUR", "2024-01-03", ["organic", "groceries"]),
+            ("Cash", "income", "salary", 900.0, "USD", "2024-01-05", ["regular salary"]),
+        ]
+    )
+    return manager
+
+
+def test_sqlite_round_trip(sqlite_manager):
+    assert isinstance(sqlite_manager.storage, SQLiteStorage)
+    sqlite_manager.edit_transaction(2, amount=45.0, tags=["organic"])
+    sqlite_manager.delete_transaction(1)
+    sqlite_manager.add_custom_category("expense", "snacks", ["sweet"])
+    sqlite_manager.set_default_wallet("Card")
+
+    reloaded = FinanceManager(data_file=sqlite_manager.data_file)
+    assert set(reloaded.wallets) == {"Cash", "Card"}
+    assert [t.to_dict() for t in reloaded.transactions] == [
+        t.to_dict() for t in sqlite_manager.transactions
+    ]
+    assert reloaded.custom_categories["expense"] == ["snacks"]
+    assert reloaded.default_wallet == "Card"
+    assert reloaded.transaction_id_counter == 4
+
+
+def test_sqlite_filters_in_sql(sqlite_manager):
+    storage = sqlite_manager.storage
+    window = storage.select_transactions(
+        wallet_name="Cash", start_date="2024-01-02", end_date="2024-01-31"
+    )
+    assert [row["id"] for row in window] == [3]
+
+    assert [t["amount"] for t in sqlite_manager.search_expenses_by_tag("groceries")] == [
+        12.5,
+        40.0,
+    ]
+    assert sqlite_manager.search_expenses_by_tag("regular salary") == []
+
+
+def test_sqlite_category_rename_updates_rows(sqlite_manager):
+    sqlite_manager.add_custom_category("expense", "snacks", [])
+    sqlite_manager.add_transaction("Cash", "expense", "snacks", 3.0, "USD", "2024-01-06")
+    sqlite_manager.edit_custom_category("expense", "snacks", "treats")
+
+    rows = sqlite_manager.storage.select_transactions(transaction_type="expense")
+    assert [row["transaction_data"]["category"] for row in rows] == ["food", "food", "treats"]
+
+    sqlite_manager.delete_custom_category("expense", "treats", reassign_to="food")
+    rows = sqlite_manager.storage.select_transactions(transaction_type="expense")
+    assert [row["transaction_data"]["category"] for row in rows] == ["food", "food", "food"]
+
+
+def test_sqlite_queries_leave_rows_on_disk(sqlite_manager, monkeypatch):
+    monkeypatch.setattr(FinanceManager, "PAGE_ROWS", 2)
+    manager = FinanceManager(data_file=sqlite_manager.data_file)
+    manager.set_budget("Cash", "food", "2024-01", 20.0)
+    alerts = []
+    manager.on_budget_alert(lambda budget, threshold: alerts.append(budget.spent))
+
+    assert manager.get_balance("Cash") == 987.5
+    assert manager.get_balance("Cash", as_of="2024-01-04") == 87.5
+    assert manager.transaction_count == 3
+    assert [t.id for t in manager.list_transactions()] == [1, 2, 3]
+    assert [t.id for t in manager.list_transactions("Cash", "2024-01-02")] == [3]
+    assert [t.id for t in manager.query_transactions(after=["2024-01-01", 1], limit=1)] == [2]
+    assert [t.id for t in manager.query_transactions(descending=True)] == [3, 2, 1]
+    assert manager.get_transaction(2).tags == ["organic", "groceries"]
+    assert [t["amount"] for t in manager.search_expenses_by_tag("groceries")] == [12.5, 40.0]
+
+    manager.add_transaction("Cash", "expense", "food", 9.5, "USD", "2024-01-09")
+    assert alerts == [22.0]
+    manager.edit_transaction(1, amount=2.5, date="2024-1-2")
+    manager.delete_transaction(3)
+    assert manager.get_balance("Cash") == 88.0
+    assert manager.get_transaction(3) is None
+    assert [(t.id, t.date) for t in manager.list_transactions("Cash")] == [
+        (1, "2024-01-02"),
+        (4, "2024-01-09"),
+    ]
+    assert manager.get_budget("Cash", "food", "2024-01").spent == 12.0
+    assert summarize(manager, ["wallet"]) == [
+        {"wallet": "Card", "total": 40.0, "count": 1, "min": 40.0, "max": 40.0},
+        {"wallet": "Cash", "total": 12.0, "count": 2, "min": 2.5, "max": 9.5},
+    ]
+    assert not manager._rows_loaded
+
+    # A tag query needs every row; from then on the queries run in memory.
+    assert [t.id for t in manager.search_transactions("groceries")] == [1, 2]
+    assert manager._rows_loaded
+    reloaded = FinanceManager(data_file=manager.data_file)
+    assert [t.to_dict() for t in reloaded.transactions] == [
+        t.to_dict() for t in manager.transactions
+    ]
+
+
+def test_sqlite_batch_reads_its_own_writes(sqlite_manager):
+    manager = FinanceManager(data_file=sqlite_manager.data_file)
+    with manager.batch():
+        manager.add_transaction("Cash", "expense", "food", 5.0, "USD", "2024-01-07")
+        manager.edit_transaction(4, amount=6.0)
+        assert manager.get_transaction(4).amount == 6.0
+    with pytest.raises(RuntimeError):
+        with manager.batch():
+            manager.delete_transaction(4)
+            manager.add_custom_category("expense", "snacks", [])
+            manager.delete_custom_category("expense", "snacks")
+            raise RuntimeError
+
+    assert manager.get_transaction(4).amount == 6.0
+    assert manager.get_balance("Cash") == 981.5
+    reloaded = FinanceManager(data_file=manager.data_file)
+    assert [t.id for t in reloaded.list_transactions()] == [1, 2, 3, 4]
+    assert reloaded.custom_categories["expense"] == []
+
+
+def test_migrate_json_to_sqlite(tmp_path):
+    source = FinanceManager(data_file=str(tmp_path / "finance_data.json"))
+    source.add_wallet("Cash", 100.0, "USD")
+    source.add_transaction("Cash", "expense", "food", 12.5, "USD", "2024-01-01", ["groceries"])
+
+    migrate(source, str(tmp_path / "finance_data.db"))
+
+    migrated = FinanceManager(data_file=str(tmp_path / "finance_data.db"))
+    assert migrated.to_dict() == source.to_dict()
+
+
+def test_json_stream_reads_values_across_chunks(tmp_path, monkeypatch):
+    path = tmp_path / "finance_data.json"
+    data = {
+        "wallets": {"Cash": {"name": "Cash", "balance": 100.0, "currency": "USD"}},
+        "transactions": [
+            {
+                "id": id,
+                "transaction_data": {
+                    "wallet_name": "Cash",
+                    "transaction_type": "expense",
+                    "category": "food",
+                    "amount": 1234567.125 + id,
+                    "currency": "USD",
+                    "date": "2024-01-%02d" % id,
+                    "tags": ["groceries"],
+                },
+            }
+            for id in range(1, 21)
+        ],
+        "custom_categories": {"expense": ["snacks"], "income": []},
+        "default_wallet": "Cash",
+    }
+    path.write_text(json.dumps(data, indent=4))
+    monkeypatch.setattr(JSONStream, "CHUNK_SIZE", 7)
+
+    manager = FinanceManager(data_file=str(path))
+
+    assert [t.to_dict() for t in manager.transactions] == data["transactions"]
+    assert manager.custom_categories == data["custom_categories"]
+    assert manager.default_wallet == "Cash"
+    assert manager.transaction_id_counter == 21
+
+
+@pytest.mark.parametrize("data_file", ["finance_data.json", "finance_data.db"])
+def test_lazy_load_finishes_in_background(tmp_path, data_file):
+    path = str(tmp_path / data_file)
+    source = FinanceManager(data_file=path)
+    source.add_wallet("Cash", 100.0, "USD")
+    source.add_transaction("Cash", "expense", "food", 12.5, "USD", "2024-01-01")
+
+    lazy = FinanceManager(data_file=path, lazy=True)
+    lazy.wait_until_loaded()
+
+    assert lazy.to_dict() == source.to_dict()
+    lazy.add_transaction("Cash", "income", "salary", 2.0, "USD", "2024-01-02")
+    assert len(FinanceManager(data_file=path).transactions) == 2
+
+
+def test_lazy_load_reports_errors(tmp_path):
+    path = tmp_path / "finance_data.json"
+    path.write_text('{"transactions": [{"id": 1, ')
+
+    lazy = FinanceManager(data_file=str(path), lazy=True)
+    with pytest.raises(json.JSONDecodeError):
+        lazy.wait_until_loaded()
+
+
+@pytest.fixture
+def segmented_manager(tmp_path):
+    manager = FinanceManager(data_file=str(tmp_path / "ledger") + "/")
+    manager.add_wallet("Cash", 100.0, "USD")
+    manager.add_custom_category("expense", "snacks", ["sweet"])
+    manager.add_transactions(
+        [
+            ("Cash", "expense", "food", 10.0, "USD", "2024-01-05", ["groceries"]),
+            ("Cash", "expense", "snacks", 2.0, "USD", "2024-02-03", ["sweet"]),
+            ("Cash", "income", "salary", 900.0, "USD", "2024-03-01", []),
+        ]
+    )
+    return manager
+
+
+def segment_files(manager):
+    return dict(manager.storage.manifest["segments"])
+
+
+def test_segmented_round_trip(segmented_manager):
+    assert isinstance(segmented_manager.storage, SegmentedStorage)
+    assert sorted(segment_files(segmented_manager)) == ["2024-01", "2024-02", "2024-03"]
+
+    reloaded = FinanceManager(data_file=segmented_manager.data_file)
+    assert [t.to_dict() for t in reloaded.transactions] == [
+        t.to_dict() for t in segmented_manager.transactions
+    ]
+    assert reloaded.get_balance("Cash") == segmented_manager.get_balance("Cash")
+    assert reloaded.custom_categories["expense"] == ["snacks"]
+
+
+def test_segmented_save_rewrites_only_dirty_files(segmented_manager):
+    storage = segmented_manager.storage
+    segments = segment_files(segmented_manager)
+    tables = dict(storage.manifest["tables"])
+
+    segmented_manager.set_default_wallet("Cash")
+    assert segment_files(segmented_manager) == segments
+    changed = {name for name in tables if storage.manifest["tables"][name] != tables[name]}
+    assert changed == {"settings"}
+
+    segmented_manager.edit_transaction(2, amount=3.0)
+    rewritten = {
+        month for month, name in segment_files(segmented_manager).items() if segments[month] != name
+    }
+    assert rewritten == {"2024-02"}
+
+    segmented_manager.edit_transaction(3, date="2024-01-31")
+    segmented_manager.edit_custom_category("expense", "snacks", "treats")
+    assert sorted(segment_files(segmented_manager)) == ["2024-01", "2024-02"]
+    reloaded = FinanceManager(data_file=segmented_manager.data_file)
+    assert [(t.date, t.category, t.amount) for t in reloaded.transactions] == [
+        ("2024-01-05", "food", 10.0),
+        ("2024-01-31", "salary", 900.0),
+        ("2024-02-03", "treats", 3.0),
+    ]
+    listed = set(segment_files(reloaded).values()) | set(storage.manifest["tables"].values())
+    assert set(os.listdir(segmented_manager.data_file)) == listed | {"manifest.json"}
+
+
+def test_segmented_journal_replays_and_compacts(tmp_path):
+    data_file = str(tmp_path / "ledger") + "/"
+    migrate(FinanceManager(data_file=str(tmp_path / "finance_data.json")), data_file)
+    manager = FinanceManager(data_file=data_file, journal=True, journal_max_bytes=200)
+    manager.add_wallet("Cash", 0.0, "USD")
+    for day in range(1, 6):
+        manager.add_transaction("Cash", "income", "salary", 1.0, "USD", f"2024-0{day}-01")
+
+    reloaded = FinanceManager(data_file=data_file, journal=True)
+    assert len(reloaded.transactions) == 5
+    assert reloaded.storage._journal_offset < 200
+    assert len(segment_files(reloaded)) >= 1
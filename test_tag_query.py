@@ -0,0 +1,80 @@
+import pytest
+
+from finance_manager import FinanceManager
+from tag_query import parse
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = FinanceManager(data_file=str(tmp_path / "finance_data.json"))
+    manager.add_wallet("Cash", 100.0, "USD")
+    manager.add_transactions(
+        [
+            ("Cash", "expense", "food", 10.0, "USD", "2024-01-05", ["groceries", "organic"]),
+            ("Cash", "expense", "food", 20.0, "USD", "2024-01-06", ["groceries"]),
+            ("Cash", "expense", "entertainment", 30.0, "USD", "2024-02-01", ["movies"]),
+            ("Cash", "expense", "entertainment", 40.0, "USD", "2024-02-02", ["live music"]),
+            ("Cash", "income", "salary", 900.0, "USD", "2024-02-03", ["regular salary"]),
+        ]
+    )
+    return manager
+
+
+def ids(results):
+    return [transaction.id for transaction in results]
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("groceries", [1, 2]),
+        ("groceries AND organic", [1]),
+        ("groceries organic", [1]),
+        ("groceries AND NOT organic", [2]),
+        ("organic OR movies", [1, 3]),
+        ('"live music" OR movies', [3, 4]),
+        ("groc* OR mov*", [1, 2, 3]),
+        ('"regular "*', [5]),
+        ("NOT groceries", [3, 4, 5]),
+        ("NOT organic OR movies", [2, 3, 4, 5]),
+        ("NOT (groceries OR movies)", [4, 5]),
+        ("(groceries OR movies) AND NOT organic", [2, 3]),
+        ("unknown", []),
+    ],
+)
+def test_boolean_and_prefix_queries(manager, query, expected):
+    assert ids(manager.search_transactions(query)) == expected
+
+
+def test_filters_narrow_results(manager):
+    assert ids(manager.search_transactions("NOT organic", transaction_type="expense")) == [
+        2,
+        3,
+        4,
+    ]
+    assert ids(manager.search_transactions("NOT movies", category="food")) == [1, 2]
+    assert ids(manager.search_transactions("groceries OR movies", category="food")) == [1, 2]
+    assert ids(manager.search_transactions("regular*", transaction_type="expense")) == []
+    assert ids(manager.search_transactions("regular*", transaction_type="income")) == [5]
+    assert ids(
+        manager.search_transactions("groceries OR movies", start_date="2024-01-06")
+    ) == [2, 3]
+    assert ids(manager.search_transactions("NOT organic", end_date="2024-01-31")) == [2]
+
+
+def test_results_are_views_of_live_transactions(manager):
+    results = manager.search_transactions("groceries")
+    assert len(results) == 2
+    assert results[0] is manager.get_transaction(1)
+    assert ids(results[1:]) == [2]
+
+    manager.edit_transaction(2, tags=["organic"])
+    manager.delete_transaction(1)
+    assert ids(manager.search_transactions("groceries")) == []
+    assert ids(manager.search_transactions("organic")) == [2]
+
+
+@pytest.mark.parametrize("query", ["", "AND groceries", "(groceries", 'groceries "organic'])
+def test_malformed_queries_raise(query):
+    with pytest.raises(ValueError):
+        parse(query)
@@ -0,0 +1,42 @@
+from finance_manager import Transaction
+from transaction_store import TransactionStore
+
+
+def make_transactions():
+    return [
+        Transaction(1, "Cash", "expense", "food", 12.5, "USD", "2024-01-01", ["groceries"]),
+        Transaction(2, "Card", "income", "salary", 900.0, "EUR", "2024-01-05", []),
+        Transaction(3, "Cash", "expense", "food", 3.0, "USD", "2024-01-02", ["organic", "groceries"]),
+    ]
+
+
+def test_store_views_match_transactions():
+    transactions = make_transactions()
+    store = TransactionStore(transactions)
+
+    assert len(store) == 3
+    assert [view.to_dict() for view in store] == [t.to_dict() for t in transactions]
+    assert store[-1].tags == ["organic", "groceries"]
+    assert len(store.strings) == 8
+
+
+def test_store_views_write_back():
+    store = TransactionStore(make_transactions())
+    view = store.get(3)
+
+    view.category = "health"
+    view.amount = 4
+    view.date = "2024-02-29"
+    view.tags = ["pharmacy"]
+
+    assert store.get(3).to_dict()["transaction_data"] == {
+        "wallet_name": "Cash",
+        "transaction_type": "expense",
+        "category": "health",
+        "amount": 4.0,
+        "currency": "USD",
+        "date": "2024-02-29",
+        "tags": ["pharmacy"],
+    }
+    assert store.get(1).tags == ["groceries"]
+    assert store.get(99) is None
@@ -0,0 +1,181 @@
+from array import array
+from datetime import date
+
+from indexes import date_ordinal
+
+TRANSACTION_TYPES = ("expense", "income")
+
+
+class StringTable:
+    """Maps repeated strings to small integer codes and back."""
+
+    def __init__(self):
+        self.strings = []
+        self.codes = {}
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.strings)
+            self.strings.append(value)
+        return code
+
+    def __getitem__(self, code):
+        return self.strings[code]
+
+    def __len__(self):
+        return len(self.strings)
+
+
+class TransactionStore:
+    """Columnar transaction storage for large, read-mostly ledgers.
+
+    Each field lives in its own typed array: amounts as doubles, dates as
+    day ordinals and wallet/category/currency/tag strings as codes into a
+    shared StringTable. Rows are handed out as TransactionView objects that
+    read like Transaction instances.
+    """
+
+    def __init__(self, transactions=()):
+        self.strings = StringTable()
+        self.ids = array("q")
+        self.amounts = array("d")
+        self.dates = array("i")
+        self.type_codes = array("B")
+        self.wallet_codes = array("I")
+        self.category_codes = array("I")
+        self.currency_codes = array("I")
+        self.tag_starts = array("I")
+        self.tag_counts = array("H")
+        self.tag_codes = array("I")
+        self._rows_by_id = None
+        for transaction in transactions:
+            self.append(transaction)
+
+    def append(self, transaction):
+        row = len(self.ids)
+        if self._rows_by_id is not None:
+            self._rows_by_id[transaction.id] = row
+        self.ids.append(transaction.id)
+        self.amounts.append(transaction.amount)
+        self.dates.append(date_ordinal(transaction.date))
+        self.type_codes.append(TRANSACTION_TYPES.index(transaction.transaction_type))
+        self.wallet_codes.append(self.strings.code(transaction.wallet_name))
+        self.category_codes.append(self.strings.code(transaction.category))
+        self.currency_codes.append(self.strings.code(transaction.currency))
+        self.tag_starts.append(0)
+        self.tag_counts.append(0)
+        self._write_tags(row, transaction.tags)
+        return self[row]
+
+    def _write_tags(self, row, tags):
+        # Tag lists are append-only; replacing one leaves the old codes unused.
+        self.tag_starts[row] = len(self.tag_codes)
+        self.tag_counts[row] = len(tags)
+        self.tag_codes.extend(self.strings.code(tag) for tag in tags)
+
+    def get(self, transaction_id):
+        if self._rows_by_id is None:
+            # Built on first lookup; a dict per row would outweigh the columns.
+            self._rows_by_id = {transaction_id: row for row, transaction_id in enumerate(self.ids)}
+        row = self._rows_by_id.get(transaction_id)
+        return None if row is None else self[row]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, row):
+        if not -len(self.ids) <= row < len(self.ids):
+            raise IndexError("transaction row out of range")
+        return TransactionView(self, row % len(self.ids))
+
+    def __iter__(self):
+        for row in range(len(self.ids)):
+            yield TransactionView(self, row)
+
+
+class TransactionView:
+    """A Transaction-like window onto one row of a TransactionStore."""
+
+    __slots__ = ("store", "row")
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    @property
+    def id(self):
+        return self.store.ids[self.row]
+
+    @property
+    def wallet_name(self):
+        return self.store.strings[self.store.wallet_codes[self.row]]
+
+    @wallet_name.setter
+    def wallet_name(self, value):
+        self.store.wallet_codes[self.row] = self.store.strings.code(value)
+
+    @property
+    def transaction_type(self):
+        return TRANSACTION_TYPES[self.store.type_codes[self.row]]
+
+    @transaction_type.setter
+    def transaction_type(self, value):
+        self.store.type_codes[self.row] = TRANSACTION_TYPES.index(value)
+
+    @property
+    def category(self):
+        return self.store.strings[self.store.category_codes[self.row]]
+
+    @category.setter
+    def category(self, value):
+        self.store.category_codes[self.row] = self.store.strings.code(value)
+
+    @property
+    def amount(self):
+        return self.store.amounts[self.row]
+
+    @amount.setter
+    def amount(self, value):
+        self.store.amounts[self.row] = float(value)
+
+    @property
+    def currency(self):
+        return self.store.strings[self.store.currency_codes[self.row]]
+
+    @currency.setter
+    def currency(self, value):
+        self.store.currency_codes[self.row] = self.store.strings.code(value)
+
+    @property
+    def date(self):
+        return date.fromordinal(self.store.dates[self.row]).isoformat()
+
+    @date.setter
+    def date(self, value):
+        self.store.dates[self.row] = date_ordinal(value)
+
+    @property
+    def tags(self):
+        store = self.store
+        start = store.tag_starts[self.row]
+        codes = store.tag_codes[start : start + store.tag_counts[self.row]]
+        return [store.strings[code] for code in codes]
+
+    @tags.setter
+    def tags(self, value):
+        self.store._write_tags(self.row, value)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "transaction_data": {
+                "wallet_name": self.wallet_name,
+                "transaction_type": self.transaction_type,
+                "category": self.category,
+                "amount": self.amount,
+                "currency": self.currency,
+                "date": self.date,
+                "tags": self.tags,
+            },
+        }